@@ -0,0 +1,107 @@
+"""
+Title: Campus index benchmark
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Times nearest-location and point-in-shape queries on campus_index.CampusIndex
+against a linear scan over every location, on synthetic campus maps.
+Run from the repository root: python benchmarks/bench_campus_index.py
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+import synthetic  # noqa: E402
+from campus_index import SHAPE  # noqa: E402
+from location_scraper import LocationScraper  # noqa: E402
+
+
+def scan_nearest(index, lon, lat, k=1):
+    """
+    Nearest locations found by measuring the distance to every location
+    """
+    x, y = index.project(lon, lat)
+    found = sorted((index._distance(i, x, y), i) for i in range(len(index.locations)))
+    return [(index.locations[i], distance) for distance, i in found[:k]]
+
+
+def scan_at(index, lon, lat):
+    """
+    Smallest shape containing a coordinate, found by testing every shape
+    """
+    x, y = index.project(lon, lat)
+    hits = []
+    for i, location in enumerate(index.locations):
+        if location.kind == SHAPE and index._contains(i, x, y):
+            x1, y1, x2, y2 = index.boxes[i]
+            hits.append(((x2 - x1) * (y2 - y1), i))
+    return index.locations[min(hits)[1]] if hits else None
+
+
+def queries(index, n, seed=0):
+    """
+    Coordinates spread over the map, half of them inside shapes
+
+    returns:
+        list((float, float))
+    """
+    rng = random.Random(seed)
+    shapes = [l for l in index.locations if l.kind == SHAPE]
+    lons = [lon for l in index.locations for lon, _ in l.coordinates]
+    lats = [lat for l in index.locations for _, lat in l.coordinates]
+    points = []
+    for i in range(n):
+        if i % 2 and shapes:
+            # Just inside the first corner of a shape
+            (lon1, lat1), (lon2, lat2) = rng.choice(shapes).coordinates[:2]
+            points.append((lon1 + (lon2 - lon1) * 0.9, lat1 + 1e-6))
+        else:
+            points.append((rng.uniform(min(lons), max(lons)), rng.uniform(min(lats), max(lats))))
+    return points
+
+
+def timed(function, points):
+    start = time.perf_counter()
+    results = [function(lon, lat) for lon, lat in points]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10],
+                        help='Map size multipliers; 1x has 300 placemarks (default 1 10)')
+    parser.add_argument('--queries', type=int, default=2000, help='Queries of each kind per scale')
+    args = parser.parse_args()
+
+    print(f'{"locations":>9} {"build ms":>9} {"query":>8} {"index q/s":>10} {"scan q/s":>9} {"speedup":>8}  agree')
+    for scale in args.scale:
+        (kmz, _), = synthetic.location_pages(scale).values()
+        start = time.perf_counter()
+        index = LocationScraper().build_index(kmz)
+        build = time.perf_counter() - start
+        points = queries(index, args.queries)
+        for name, fast, slow in (
+                ('nearest', lambda lon, lat: index.nearest(lon, lat, k=3),
+                 lambda lon, lat: scan_nearest(index, lon, lat, k=3)),
+                ('at', index.at, lambda lon, lat: scan_at(index, lon, lat))):
+            expected, scan_time = timed(slow, points)
+            results, index_time = timed(fast, points)
+            if name == 'nearest':
+                # Locations at the same distance may come back in either order
+                agree = all([round(d, 6) for _, d in a] == [round(d, 6) for _, d in b]
+                            for a, b in zip(results, expected))
+            else:
+                agree = results == expected
+            print(f'{len(index.locations):>9} {build * 1000:>9.1f} {name:>8} {len(points) / index_time:>10.0f} '
+                  f'{len(points) / scan_time:>9.0f} {scan_time / index_time:>7.1f}x  {agree}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Title: Club parser benchmark
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Times ClubScraper.iter_clubs against the span list state machine that
+ClubScraper used before it, on a synthetic club directory listing or saved listing
+pages, and compares their peak memory.
+Run from the repository root: python benchmarks/bench_clubs.py
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+from io import BytesIO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import synthetic  # noqa: E402
+from barometer import barometer  # noqa: E402
+from club_scraper import ClubScraper  # noqa: E402
+
+
+def legacy_parse_clubs(content, info_entry_pairs):
+    """
+    The state machine formerly in ClubScraper.parse_clubs, without its logging,
+    including building the soup it took
+
+    returns:
+        list(dict): One record per club
+    """
+    top = BeautifulSoup(content, 'lxml')
+    raw = [l.text.strip() for l in top.find_all('span')]
+    info = [x for x in raw if x and x != "Website" and x != "Homepage:"]
+    info.pop(0)
+
+    current_club = None
+    info_len = len(info)
+    club_info = dict()
+    scraped_clubs = []
+    i = 0
+    while i < info_len:
+        line = info[i]
+        if line in info_entry_pairs:
+            next_line = info[i+1]
+            entry_name = info_entry_pairs[line]
+            if next_line.endswith(':'):
+                club_info[entry_name] = 'NA'
+                i += 1
+            else:
+                club_info[entry_name] = next_line
+                i += 2
+        elif line == "Contact Email:":
+            next_line = info[i+1]
+            try:
+                bool(club_info['CONTACT_EMAIL'])
+            except KeyError:
+                if next_line.endswith(':'):
+                    club_info['CONTACT_EMAIL'] = 'NA'
+                    i += 1
+                else:
+                    club_info['CONTACT_EMAIL'] = next_line
+                    i += 2
+            else:
+                if '@' in next_line:
+                    club_info['CONTACT_EMAIL_2'] = next_line
+                    i += 2
+                else:
+                    club_info['CONTACT_EMAIL_2'] = 'NA'
+                    i += 1
+        else:
+            if current_club and len(club_info) != 0:
+                club_info['NAME'] = current_club
+                scraped_clubs.append(club_info)
+            club_info = dict()
+            current_club = line
+            i += 1
+    return scraped_clubs
+
+
+@barometer
+def quiet(parse, content):
+    """
+    Runs a parser under a barometer that doesn't print, so its DEBUG lines aren't timed
+    """
+    return parse(content)
+
+
+def peak_memory(function):
+    """
+    returns:
+        int: Peak bytes allocated while function runs
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10],
+                        help='Listing size multipliers; 1x has 200 clubs (default 1 10)')
+    parser.add_argument('--listing', nargs='+', default=[],
+                        help='Saved listing pages timed instead of the synthetic ones, '
+                             'e.g. tests/fixtures/club_listing.html')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timing runs')
+    args = parser.parse_args()
+
+    scraper = ClubScraper()
+    parsers = (
+        ('state machine', lambda content: legacy_parse_clubs(content, scraper.INFO_ENTRY_PAIRS)),
+        ('iter_clubs', lambda content: list(scraper.iter_clubs(BytesIO(content)))),
+        # Clubs consumed one at a time, as a streaming consumer would
+        ('iter_clubs, streamed', lambda content: sum(1 for _ in scraper.iter_clubs(BytesIO(content)))),
+    )
+    print(f'{"clubs":>6} {"parser":>22} {"ms":>8} {"clubs/s":>9} {"peak MiB":>9}')
+    if args.listing:
+        listings = []
+        for path in args.listing:
+            with open(path, 'rb') as f:
+                listings.append((path, f.read()))
+    else:
+        listings = [(f'{scale}x', content) for scale in args.scale
+                    for (content, _) in synthetic.club_pages(scale).values()]
+    for label, content in listings:
+        expected = parsers[0][1](content)
+        if parsers[1][1](content) != expected:
+            print(f'{label}: parsers disagree')
+        for name, parse in parsers:
+            def run():
+                return quiet(parse, content, verbosity=False, log_level=False, metrics=False)
+            best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+            peak = peak_memory(run)
+            print(f'{len(expected):>6} {name:>22} {best * 1000:>8.1f} {len(expected) / best:>9.0f} '
+                  f'{peak / 2 ** 20:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
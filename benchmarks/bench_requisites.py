@@ -0,0 +1,118 @@
+"""
+Title: Requisite parser benchmark
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Times requisite_parser.parse_requisites against the word loop that
+CourseScraper.parse_courseblock used before it, on a corpus of course block texts.
+The default corpus, fixtures/courseblock_texts.txt, is hand-written in the format of
+the catalog's course block text rather than saved from the catalog; pass --corpus to
+time a file of recorded texts instead.
+Run from the repository root: python benchmarks/bench_requisites.py
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+
+from requisite_parser import parse_requisites  # noqa: E402
+
+CORPUS = os.path.join(HERE, 'fixtures', 'courseblock_texts.txt')
+
+
+def legacy_parse_requisites(course_terms_and_reqs):
+    """
+    The word loop formerly in CourseScraper.parse_courseblock, without its logging
+
+    returns:
+        tuple: prerequisites, corequisites, concurrent, recommended, terms
+    """
+    section = None
+    course_prereqs, course_coreqs, course_conc, course_rec, course_terms = [], [], [], [], []
+    for word in course_terms_and_reqs.split():
+        if word.endswith(':'):
+            if word == 'Offered:':
+                section = 'terms'
+            elif word.endswith('Prerequisite:'):
+                course_terms.append((word.split('Pre'))[0])
+                section = 'prereq'
+            elif word.endswith('Corequisite:'):
+                course_terms.append((word.split('Cor'))[0])
+                section = 'coreq'
+            elif word.endswith('Concurrent:'):
+                course_terms.append((word.split('Con'))[0])
+                section = 'conc'
+            elif word.endswith('Recommended:'):
+                course_terms.append((word.split('Rec'))[0])
+                section = 'rec'
+        else:
+            if section == 'prereq':
+                course_prereqs.append(word)
+            elif section == 'coreq':
+                course_coreqs.append(word)
+            elif section == 'conc':
+                course_conc.append(word)
+            elif section == 'rec':
+                course_rec.append(word)
+            elif section == 'terms':
+                course_terms.append(word)
+
+    maybe_join = (lambda x, j: j.join(x) if x else 'NA')
+    course_terms = [term for term in maybe_join(course_terms, ', ').split(',') if len(term) > 0]
+    return (maybe_join(course_prereqs, ' '), maybe_join(course_coreqs, ' '), maybe_join(course_conc, ' '),
+            maybe_join(course_rec, ' '), course_terms)
+
+
+def load_corpus(path=CORPUS):
+    with open(path, 'r') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def check(texts, verbose=False):
+    """
+    Compares the requisite text of both parsers. The legacy loop moves the last
+    word of a section into the terms when the next label is glued to it, e.g. the
+    '357.' in 'CSC 357.Recommended:', so texts like that are expected to differ.
+
+    returns:
+        int: Number of texts whose requisite text differs between the two parsers
+    """
+    mismatches = 0
+    for text in texts:
+        parsed = parse_requisites(text, course_codes=False)
+        new = tuple('NA' if parsed[field] is None else parsed[field]
+                    for field in ('prerequisites', 'corequisites', 'concurrent', 'recommended'))
+        if new != legacy_parse_requisites(text)[:4]:
+            mismatches += 1
+            if verbose:
+                print(f'legacy: {legacy_parse_requisites(text)}\n   new: {parsed}')
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=CORPUS, help='File with one course block text per line')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timing runs')
+    parser.add_argument('--scale', type=int, default=200, help='Number of copies of the corpus per run')
+    parser.add_argument('--verbose', action='store_true', help='Prints texts the parsers disagree on')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    texts = corpus * args.scale
+    print(f'{len(corpus)} texts in corpus, {check(corpus, args.verbose)} with legacy glued-label differences')
+    parsers = (
+        ('legacy', legacy_parse_requisites),
+        ('sections', lambda text: parse_requisites(text, course_codes=False)),
+        ('sections+codes', parse_requisites),
+    )
+    for name, parse in parsers:
+        best = min(timeit.repeat(lambda: [parse(text) for text in texts], number=1, repeat=args.repeat))
+        print(f'{name:>14}: {best * 1000:8.1f} ms  {len(texts) / best:10.0f} texts/s')
+
+
+if __name__ == '__main__':
+    main()
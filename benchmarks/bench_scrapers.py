@@ -0,0 +1,215 @@
+"""
+Title: Scraper benchmark
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Runs every scraper over synthetic pages served through
+scraper_base.set_fetcher, uploading to a local ingestion server, and reports
+throughput, peak memory and per-stage time at each scale. With --snapshot, pages
+are replayed from a snapshot file (see scraper_base.use_snapshot) instead, or
+recorded into one with --record.
+Run from the repository root: python benchmarks/bench_scrapers.py --scale 1 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from io import StringIO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+import pandas as pd  # noqa: E402
+
+import scraper_base  # noqa: E402
+import synthetic  # noqa: E402
+from barometer import barometer  # noqa: E402
+from calendar_scraper import CalendarScraper  # noqa: E402
+from club_scraper import ClubScraper  # noqa: E402
+from course_scraper import CourseScraper  # noqa: E402
+from faculty_scraper import FacultyScraper  # noqa: E402
+from ingest_server import IngestServer  # noqa: E402
+from location_scraper import LocationScraper  # noqa: E402
+from ratings_scraper import RatingsScraper  # noqa: E402
+from schedules_scraper import SchedulesScraper  # noqa: E402
+from snapshot import Snapshot  # noqa: E402
+
+
+# Scraper, page generator, scrape() arguments and the attribute holding its upload URL
+SCENARIOS = {
+    'course': (CourseScraper, synthetic.course_pages, {'all_departments': True}, ('COURSES_API', 'courses')),
+    'calendar': (CalendarScraper, synthetic.calendar_pages, {}, ('CALENDARS_API', 'calendars')),
+    'club': (ClubScraper, synthetic.club_pages, {}, ('CLUBS_API', 'clubs')),
+    'schedules': (SchedulesScraper, synthetic.schedules_pages, {'all_colleges': True}, None),
+    'location': (LocationScraper, synthetic.location_pages, {}, ('LOCATIONS_API', 'locations')),
+    'faculty': (FacultyScraper, synthetic.faculty_pages, {}, None),
+    'ratings': (RatingsScraper, synthetic.ratings_pages, {}, None),
+}
+
+
+class SnapshotFetcher:
+    """
+    Fetcher for scraper_base.set_fetcher replaying a snapshot, which counts the
+    pages it serves like synthetic.FixtureFetcher
+    """
+
+    def __init__(self, snapshot):
+        """
+        args:
+            snapshot (snapshot.Snapshot)
+        """
+        self.snapshot = snapshot
+        self.served = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url, **kwargs):
+        r = self.snapshot.replay(url, **kwargs)
+        if r.ok:
+            with self._lock:
+                self.served += 1
+                self.bytes += len(r.content)
+        return r
+
+
+@barometer
+def call(function, **kwargs):
+    """
+    Runs a scraper that isn't decorated with barometer under one, so its
+    requests and stages are still measured
+    """
+    return function(**kwargs)
+
+
+def count_records(csv):
+    """
+    returns:
+        int: Number of rows in a scraper's CSV output
+    """
+    if not csv:
+        return 0
+    try:
+        return len(pd.read_csv(StringIO(csv)))
+    except pd.errors.ParserError:
+        # Location rows for shapes hold unquoted coordinate lists
+        return len(csv.splitlines()) - 1
+
+
+def run(name, scale, server, memory=False, snapshot=None, record=False):
+    """
+    Runs one scraper over freshly generated pages, or over the pages of a snapshot
+
+    args:
+        scale (int): Input size multiplier. Unused when replaying a snapshot
+        snapshot (snapshot.Snapshot): Snapshot the pages are replayed from
+        record (bool): Records the generated pages into snapshot instead of
+            replaying it
+
+    returns:
+        dict: Measurements of the run
+    """
+    scraper_class, generate, kwargs, api = SCENARIOS[name]
+    if snapshot is None:
+        fetcher = send = synthetic.FixtureFetcher(generate(scale))
+    elif record:
+        fetcher = synthetic.FixtureFetcher(generate(scale))
+        send = snapshot.recorder(fetcher)
+    else:
+        fetcher = send = SnapshotFetcher(snapshot)
+    previous = scraper_base.set_fetcher(send)
+    scraper = scraper_class()
+    if api is not None:
+        setattr(scraper, api[0], f'{server.url}/{api[1]}')
+
+    fd, metrics_path = tempfile.mkstemp(suffix='.jsonl')
+    os.close(fd)
+    kwargs = dict(kwargs, verbosity=False, log_level=False, metrics=metrics_path)
+    try:
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if isinstance(scraper_class.__dict__['scrape'], barometer):
+            csv = scraper.scrape(**kwargs)
+        else:
+            csv = call(scraper.scrape, **kwargs)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+        scraper_base.set_fetcher(previous)
+        with open(metrics_path) as f:
+            summary = json.loads(f.read().splitlines()[-1])
+        os.remove(metrics_path)
+
+    records = count_records(csv)
+    return {
+        'scraper': name,
+        'scale': scale,
+        'pages': fetcher.served,
+        'bytes': fetcher.bytes,
+        'records': records,
+        'seconds': elapsed,
+        'pages_per_second': fetcher.served / elapsed,
+        'records_per_second': records / elapsed,
+        'peak_memory': peak,
+        'stages': {stage: round(span['total'], 4) for stage, span in summary['spans'].items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10],
+                        help='Input size multipliers, e.g. 10 for 10x departments (default 1 10)')
+    parser.add_argument('--scrapers', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skips the extra run under tracemalloc that measures peak memory')
+    parser.add_argument('--json', help='Also writes the results to this file')
+    parser.add_argument('--snapshot',
+                        help='Replays the pages of this snapshot file instead of generating them, e.g. one '
+                             'recorded by sustainer.scrape_all or with --record')
+    parser.add_argument('--record', action='store_true',
+                        help='Records the generated pages into the --snapshot file. It keeps the pages of the '
+                             'last scale run')
+    args = parser.parse_args()
+    if args.record and not args.snapshot:
+        parser.error('--record needs --snapshot')
+    # A replayed snapshot holds one set of pages, so each scraper runs once
+    scales = [None] if args.snapshot and not args.record else args.scale
+    snapshot = Snapshot(args.snapshot) if args.snapshot else None
+
+    # Pages are local, so nothing needs to be rate limited
+    scraper_base.RATE_LIMITER.enabled = False
+    server = IngestServer().start()
+    results = []
+    try:
+        print(f'{"scraper":>10} {"scale":>5} {"pages":>6} {"records":>8} {"seconds":>8} {"pages/s":>9} '
+              f'{"records/s":>10} {"peak MiB":>9}  stages (s)')
+        for name in args.scrapers:
+            for scale in scales:
+                result = run(name, scale, server, snapshot=snapshot, record=args.record)
+                if not args.no_memory:
+                    result['peak_memory'] = run(name, scale, server, memory=True, snapshot=snapshot,
+                                                record=args.record)['peak_memory']
+                results.append(result)
+                peak = '-' if result['peak_memory'] is None else f'{result["peak_memory"] / 2 ** 20:.1f}'
+                stages = ' '.join(f'{stage}={seconds:.3f}' for stage, seconds in result['stages'].items())
+                print(f'{name:>10} {"-" if scale is None else scale:>5} {result["pages"]:>6} {result["records"]:>8} {result["seconds"]:>8.2f} '
+                      f'{result["pages_per_second"]:>9.1f} {result["records_per_second"]:>10.0f} {peak:>9}  {stages}')
+    finally:
+        server.stop()
+        if snapshot is not None:
+            snapshot.close()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
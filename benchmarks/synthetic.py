@@ -0,0 +1,264 @@
+"""
+Title: Synthetic fixtures
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Generates pages in the formats of the sites every scraper reads, scaled
+up by a factor, and serves them through scraper_base.set_fetcher so scrapers run
+without network access
+"""
+
+import io
+import random
+import threading
+import zipfile
+from html import escape
+
+import scraper_base
+
+
+HTML = {'Content-Type': 'text/html; charset=utf-8'}
+KMZ = {'Content-Type': 'application/vnd.google-earth.kmz'}
+
+WORDS = ('data structures systems programming design analysis algorithms software engineering computer '
+         'architecture networks security theory databases graphics learning robotics interaction').split()
+TERMS = ('F', 'W', 'SP', 'SU')
+DEPARTMENTS = ('CSC', 'CPE', 'EE', 'ME', 'MATH', 'STAT', 'PHYS', 'CHEM', 'BIO', 'IME', 'ENGL', 'COMS',
+               'ART', 'MU', 'HIST', 'PSY', 'ECON', 'BUS', 'ARCH', 'CE')
+
+
+def words(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def department_codes(n):
+    """
+    returns:
+        list(str): n distinct department codes, e.g. ['CSC', 'CPE', ..., 'CSC2']
+    """
+    return [DEPARTMENTS[i % len(DEPARTMENTS)] + (str(i // len(DEPARTMENTS)) if i >= len(DEPARTMENTS) else '')
+            for i in range(n)]
+
+
+class FixtureFetcher:
+    """
+    Fetcher for scraper_base.set_fetcher serving pages from a dict. URLs that
+    aren't in the dict get a 404 like a missing page would.
+    """
+
+    def __init__(self, pages):
+        """
+        args:
+            pages (dict(str: (bytes, dict))): Body and headers of each URL
+        """
+        self.pages = pages
+        self.served = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url, **kwargs):
+        page = self.pages.get(url)
+        if page is None:
+            return scraper_base.build_response(url, 404, b'Not Found', HTML)
+        content, headers = page
+        with self._lock:
+            self.served += 1
+            self.bytes += len(content)
+        return scraper_base.build_response(url, 200, content, headers)
+
+
+def page(html):
+    return html.encode('utf-8'), HTML
+
+
+def course_pages(scale, seed=0):
+    """
+    Catalog index plus 10 * scale department pages of 40 courses each
+
+    returns:
+        dict(str: (bytes, dict))
+    """
+    rng = random.Random(seed)
+    departments = department_codes(10 * scale)
+    pages = dict()
+    links = ''.join(f'<tr><td><a href="/coursesaz/{d.lower()}/">{d}</a></td></tr>' for d in departments)
+    pages['http://catalog.calpoly.edu/coursesaz/'] = page(f'<html><body><table>{links}</table></body></html>')
+    for d in departments:
+        blocks = []
+        for num in range(100, 580, 12):
+            prereqs = ' and '.join(f'{rng.choice(departments)} {rng.randrange(100, 500)}' for _ in range(rng.randrange(3)))
+            terms = ', '.join(rng.sample(TERMS, rng.randrange(1, 5)))
+            ge = (f'<p class="noindent">GE Area {rng.choice("ABCD")}{rng.randrange(1, 6)}</p>'
+                  f'<p class="noindent">Fulfills GE Area {rng.choice("ABCD")}{rng.randrange(1, 6)}</p>'
+                  if rng.random() < 0.2 else '')
+            blocks.append(
+                f'<div class="courseblock"><p class="courseblocktitle"><strong>{d}&#160;{num}. '
+                f'{words(rng, 3).title()}.</strong>\n<strong>{rng.randrange(1, 5)} units</strong></p>{ge}'
+                f'<div class="noindent courseextendedwrap"><p class="noindent">Term Typically Offered: {terms}</p>'
+                + (f'<p class="noindent">Prerequisite: {prereqs}.</p>' if prereqs else '')
+                + f'</div><div class="courseblockdesc"><p>{words(rng, 40).capitalize()}.</p></div></div>')
+        nav = ''.join(f'<li><a href="/{words(rng, 1)}/">{words(rng, 2)}</a></li>' for _ in range(200))
+        pages[f'http://catalog.calpoly.edu/coursesaz/{d.lower()}/'] = page(
+            f'<html><head><title>{d}</title></head><body><ul>{nav}</ul>'
+            f'<div class="sc_sccoursedescs">{"".join(blocks)}</div></body></html>')
+    return pages
+
+
+def calendar_pages(scale, epoch=2018, seed=0):
+    """
+    2 * scale academic years of calendar pages, starting at epoch
+
+    returns:
+        dict(str: (bytes, dict))
+    """
+    rng = random.Random(seed)
+    pages = dict()
+    quarters = (('Summer', ('June', 'July', 'August')), ('Fall', ('September', 'October', 'November', 'December')),
+                ('Winter', ('January', 'February', 'March')), ('Spring', ('March', 'April', 'May', 'June')))
+    for year in range(epoch, epoch + 2 * scale):
+        tables = []
+        for quarter, months in quarters:
+            rows = []
+            for month in months:
+                for day in range(1, 28, 3):
+                    if rng.random() < 0.2:
+                        dates = f'{month} {day} - {day + 2}'
+                    else:
+                        dates = f'{month} {day}'
+                    events = '\n'.join(words(rng, 5).capitalize() for _ in range(rng.randrange(1, 3)))
+                    rows.append(f'<tr><td>{dates}</td><td>Monday</td><td>{escape(events)}</td></tr>')
+            tables.append(f'<table id="{quarter} Quarter">{"".join(rows)}</table>')
+        tables.append('<table id="SUMMARY OF CALENDAR DAYS "><tr><td>Instruction</td><td>-</td><td>180</td></tr></table>')
+        pages[f'https://registrar.calpoly.edu/{year}-{year + 1 - 2000}-academic-calendar'] = page(
+            f'<html><body>{"".join(tables)}</body></html>')
+    return pages
+
+
+def club_pages(scale, seed=0):
+    """
+    Club directory listing with 200 * scale clubs
+
+    returns:
+        dict(str: (bytes, dict))
+    """
+    rng = random.Random(seed)
+    spans = ['Club Directory']
+    for i in range(200 * scale):
+        name = f'{words(rng, 2).title()} Club {i}'
+        email = f'club{i}@calpoly.edu'
+        spans += [name, 'Website', 'Contact Person:', words(rng, 2).title(), 'Contact Email:', f'person{i}@calpoly.edu',
+                  'Contact Phone:', f'805-756-{rng.randrange(1000, 9999)}', 'Advisor:', words(rng, 2).title(),
+                  'Advisor Phone:', 'Advisor Email:', f'advisor{i}@calpoly.edu', 'Box:', str(rng.randrange(100)),
+                  'Affiliation:', words(rng, 1).title(), 'Type(s):', words(rng, 2).title(),
+                  'Description:', words(rng, 30).capitalize(), 'Contact Email:', email]
+    # The listing ends with a non-club line so the last club is kept
+    spans.append('Associated Students, Inc.')
+    body = ''.join(f'<div><span>{escape(s)}</span></div>' for s in spans)
+    return {'https://www.asi.calpoly.edu/club_directories/listing_bs/': page(f'<html><body>{body}</body></html>')}
+
+
+def schedules_pages(scale, seed=0):
+    """
+    Schedules index linking 4 * scale college pages for both terms, each with 6
+    departments of 60 sections
+
+    returns:
+        dict(str: (bytes, dict))
+    """
+    rng = random.Random(seed)
+    root = 'https://schedules.calpoly.edu/'
+    colleges = [f'C{i}' for i in range(4 * scale - 1)] + ['CENG']
+    links = ''.join(f'<a href="depts_{50 + i}-{c}_curr.htm">{c}</a>' for i, c in enumerate(colleges))
+    pages = {root: page(f'<html><body>{links}</body></html>')}
+    for i, college in enumerate(colleges):
+        for term in ('curr', 'next'):
+            rows = []
+            for d in department_codes(6):
+                rows.append(f'<tr><td colspan="6">{d} Department</td></tr>')
+                for n in range(60):
+                    rows.append(f'<tr><td>{words(rng, 1).title()}, {words(rng, 1).title()}</td>'
+                                f'<td>{d} {rng.randrange(100, 600)}</td><td>{n + 1:02d}</td>'
+                                f'<td>{rng.choice(("LEC", "LAB", "SEM"))}</td><td>{rng.choice(("MWF", "TR"))}</td>'
+                                f'<td>{rng.choice(("", "M 10-11"))}</td></tr>')
+            # The first sub-table is named by the header row, the rest by separator rows
+            rows.pop(0)
+            pages[f'{root}depts_{50 + i}-{college}_{term}.htm'] = page(
+                '<html><body><table><thead><tr><th colspan="6">Department</th></tr>'
+                '<tr><th>Name</th><th>Course</th><th>Sect</th><th>Type</th><th>Days</th><th>Office Hours</th></tr>'
+                f'</thead><tbody>{"".join(rows)}</tbody></table></body></html>')
+    return pages
+
+
+def location_pages(scale, seed=0):
+    """
+    Buildings .kmz file with 300 * scale placemarks
+
+    returns:
+        dict(str: (bytes, dict))
+    """
+    rng = random.Random(seed)
+    placemarks = []
+    for i in range(300 * scale):
+        lon, lat = -120.66 + rng.random() / 100, 35.30 + rng.random() / 100
+        name = f'{i} {words(rng, 2).title()}'
+        if i % 3 == 0:
+            geometry = f'<LookAt><longitude>{lon}</longitude></LookAt><Point><coordinates>{lon},{lat},0</coordinates></Point>'
+        else:
+            ring = ' '.join(f'{lon + dx / 10000},{lat + dy / 10000},0' for dx, dy in ((0, 0), (1, 0), (1, 1), (0, 0)))
+            geometry = f'<Polygon><outerBoundaryIs><LinearRing><coordinates>{ring}</coordinates></LinearRing></outerBoundaryIs></Polygon>'
+        placemarks.append(f'<Placemark><name>{escape(name)}</name>{geometry}</Placemark>')
+    kml = ('<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+           f'{"".join(placemarks)}</Document></kml>')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('doc.kml', kml)
+    return {'https://afd.calpoly.edu/facilities/campus-maps/docs/Cal_Poly_Buildings.kmz': (buffer.getvalue(), KMZ)}
+
+
+def faculty_pages(scale, seed=0):
+    """
+    CSC and CPE faculty listings with 30 * scale employee pages each
+
+    returns:
+        dict(str: (bytes, dict))
+    """
+    rng = random.Random(seed)
+    pages = dict()
+    for host in ('https://csc.calpoly.edu', 'https://cpe.calpoly.edu'):
+        paths = [f'/faculty/{words(rng, 1)}{i}/' for i in range(30 * scale)]
+        links = ''.join(f'<a href="{p}">{p}</a>' for p in paths)
+        pages[f'{host}/faculty/'] = page(f'<html><body><a href="/faculty/">Faculty</a>{links}</body></html>')
+        for p in paths:
+            name = words(rng, 2).title()
+            interests = ''.join(f'<span>{words(rng, 3)}</span>' for _ in range(rng.randrange(1, 4)))
+            pages[host + p] = page(
+                f'<html><body><h1>{name}</h1><div id="facultyMainBlock">\n'
+                f'Office: {rng.randrange(1, 200)}-{rng.randrange(100, 300)}\n'
+                f'Phone 805-756-{rng.randrange(1000, 9999)}\n'
+                f'Email:\xa0{p.split("/")[2]}(at)calpoly.edu\n'
+                '<table><tr><th>Days</th></tr></table></div>'
+                f'<div class="facultyBlock">{interests}</div></body></html>')
+    return pages
+
+
+def ratings_pages(scale, seed=0):
+    """
+    2 * scale listing pages of 20 professors each
+
+    returns:
+        dict(str: (bytes, dict))
+    """
+    rng = random.Random(seed)
+    top = 'https://calpolyratings.com'
+    pages = dict()
+    for n in range(1, 2 * scale + 1):
+        paths = [f'/{words(rng, 1)}-{n}-{i}' for i in range(20)]
+        links = ''.join(f'<a href="{p}">{p}</a>' for p in paths) + '<a href="/about/">About</a>'
+        pages[f'{top}/?page={n}'] = page(f'<html><body>{links}</body></html>')
+        for p in paths:
+            pages[top + p] = page(
+                f'<html><head><title>{words(rng, 2).title()}</title></head><body><button>Menu</button>'
+                '<button>Search</button><button><span class="teacher-rating">'
+                f'{rng.uniform(1, 4):.2f}</span><span class="evals-span">Difficulty {rng.uniform(1, 4):.2f}'
+                f'</span></button><p>{words(rng, 60)}</p></body></html>')
+    return pages
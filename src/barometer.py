@@ -1,7 +1,14 @@
 import sys
-import os.path
 import io
+import contextvars
 import datetime
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
 import traceback
 
 
@@ -90,103 +97,548 @@ CODEBOOK = {
 }
 
 
-class Logger(object):
+# Bytes of log lines held in memory before they're written to the log file
+LOG_BUFFER_SIZE = 64 * 1024
+# Seconds buffered log lines may wait before they're written
+LOG_FLUSH_INTERVAL = 1.0
+# Options for log files opened by Logger. See configure_logfiles
+_logfile_options = dict()
+
+
+def configure_logfiles(max_bytes=None, interval=None, compress=False, backups=None,
+                       buffer_size=LOG_BUFFER_SIZE, flush_interval=LOG_FLUSH_INTERVAL):
     """
-    Main working object. Splits input from print() statements in wrapped function to
-    a logging buffer and stdout. Also optionally tags and timestamps messages
+    Sets the rotation and buffering of log files opened by decorated functions
+    from now on
+
+    args:
+        max_bytes (int): Rotates a log file once it reaches this size. Never if None
+        interval (num): Rotates a log file every interval seconds, e.g. 86400 for
+            daily logs. Periods start at multiples of interval since the epoch, so
+            every process rotates at the same time. Never if None
+        compress (bool): Gzips rotated log files if True
+        backups (int): Number of rotated files kept per log file. Keeps all if None
+        buffer_size (int): Bytes of log lines buffered before they're written
+        flush_interval (num): Seconds log lines may stay buffered
     """
-    def __init__(self, verbosity, log_level, add_timestamp, default_msg_type):
-        self.old_stdout = sys.stdout
+    global _logfile_options
+    _logfile_options = dict(max_bytes=max_bytes, interval=interval, compress=compress, backups=backups,
+                            buffer_size=buffer_size, flush_interval=flush_interval)
 
-        if type(verbosity) == MessageType:
-            self.verbosity = verbosity.level
-        elif verbosity is False or verbosity is None:
-            self.verbosity = -1
-        else:
-            self.verbosity = verbosity
 
-        if type(log_level) == MessageType:
-            self.log_level = log_level.level
-        elif log_level is False or log_level is None:
-            self.log_level = -1
-        else:
-            self.log_level = log_level
+def logfile_settings():
+    """
+    returns:
+        dict: Arguments of the last configure_logfiles call, for worker processes
+            that don't inherit them
+    """
+    return dict(_logfile_options)
 
-        self.log_buffer = io.StringIO()
-        self.stdout = sys.stdout
-        sys.stdout = self
-        self.add_timestamp = add_timestamp
-        self.buffered_msg_type = None
-        self.default_msg_type = default_msg_type
-        print(DEBUG, f"Started new Logger. verbosity={self.verbosity}, log_level={self.log_level}, "
-                     f"add_timestamp={add_timestamp}, default_msg_type={default_msg_type.name}")
 
-    def __del__(self):
+class LogFile(object):
+    """
+    Appends log lines to a file in buffered writes, rotating it by size or time.
+    Lines are written once buffer_size bytes are buffered or flush_interval seconds
+    passed since the last write, and at once for errors, so memory stays flat and
+    little is lost if the process dies. Rotated files are renamed to
+    <name>.<timestamp><ext>, optionally gzipped.
+    """
+
+    def __init__(self, path, max_bytes=None, interval=None, compress=False, backups=None,
+                 buffer_size=LOG_BUFFER_SIZE, flush_interval=LOG_FLUSH_INTERVAL):
+        """
+        args:
+            path (str): Log file to append to
+            See configure_logfiles for the other arguments
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compress = compress
+        self.backups = backups
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A file left over from an earlier period is rotated before appending
+        if interval and os.path.exists(path) and self.period(os.path.getmtime(path)) < self.period():
+            self.rotate(os.path.getmtime(path))
+        self._open()
+
+    def period(self, timestamp=None):
+        return int((time.time() if timestamp is None else timestamp) // self.interval)
+
+    def _open(self):
+        self._file = open(self.path, 'a')
+        self.size = self._file.tell()
+        self._period = self.period() if self.interval else None
+
+    def write(self, text, flush=False):
         """
-        Returns stdout to its original state
+        args:
+            text (str): Log lines
+            flush (bool): Writes the buffer to the file now if True
+        """
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if (flush or self._buffered >= self.buffer_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        Writes buffered lines to the file, rotating it first if it's due
+        """
+        if self._file is None:
+            return
+        if self._buffer:
+            if ((self.max_bytes and self.size and self.size + self._buffered > self.max_bytes)
+                    or (self.interval and self.period() != self._period)):
+                self._file.close()
+                self.rotate()
+                self._open()
+            self._file.write(''.join(self._buffer))
+            self.size += self._buffered
+            self._buffer = []
+            self._buffered = 0
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def rotate(self, timestamp=None):
+        """
+        Renames the (closed) log file out of the way, then compresses it and
+        removes old rotated files as configured
+
+        args:
+            timestamp (num): Time used in the rotated file's name. Now if None
         """
-        sys.stdout = self.old_stdout
+        root, ext = os.path.splitext(self.path)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(timestamp))
+        rotated = f'{root}.{stamp}{ext}'
+        n = 1
+        while os.path.exists(rotated) or os.path.exists(f'{rotated}.gz'):
+            rotated = f'{root}.{stamp}-{n}{ext}'
+            n += 1
+        os.replace(self.path, rotated)
+        if self.compress:
+            with open(rotated, 'rb') as src, gzip.open(f'{rotated}.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        if self.backups is not None:
+            old = sorted(glob.glob(f'{glob.escape(root)}.[0-9]*-[0-9]*{ext}*'), key=os.path.getmtime)
+            for path in old[:max(len(old) - self.backups, 0)]:
+                os.remove(path)
 
     def close(self):
-        self.__del__()
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class Metrics(object):
+    """
+    Timings and counters of one run of a decorated function. Spans add up the
+    time spent in named stages, e.g. 'fetch' or 'parse'; spans running at the
+    same time on different threads each count in full, so stage totals can add up
+    to more than the run's wall time. Requests are counted per host.
+    """
 
-    def write(self, data):
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.spans = dict()
+        self.counters = dict()
+        self.hosts = dict()
+        self._lock = threading.Lock()
+
+    def add_time(self, name, seconds):
         """
-        Intercepts output of print() calls inside decorated function and writes data
-        to stdout and a log buffer.
+        Adds one occurrence of a span that took seconds
         """
-        ts = Logger.get_timestamp() if self.add_timestamp else ''
-        if self.buffered_msg_type is not None:
-            # print(a, b) puts a space AKA chr(32) between a and b--ignore
-            if data == chr(32):
-                return
-            elif data in CODEBOOK:
-                # MessageTypes and data are out-of-order. Should never get here.
-                self.buffered_msg_type = CODEBOOK[data]
-                return
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, seconds, seconds]
             else:
-                code = self.buffered_msg_type.code
-                msg_level = self.buffered_msg_type.level
-                icon = self.buffered_msg_type.icon
-                self.buffered_msg_type = None
-        elif data in CODEBOOK:
-            self.buffered_msg_type = CODEBOOK[data]
-            return
+                span[0] += 1
+                span[1] += seconds
+                if seconds > span[2]:
+                    span[2] = seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_request(self, host, status, size, seconds, cached=False):
+        """
+        Records one HTTP request
+
+        args:
+            host (str): Host the request was sent to
+            status (int): Response status, or None if the request failed
+            size (int): Bytes in the response body
+            seconds (num): Time until the response was read
+            cached (bool): True if the body was served from the response cache
+        """
+        with self._lock:
+            stats = self.hosts.get(host)
+            if stats is None:
+                stats = self.hosts[host] = {'requests': 0, 'errors': 0, 'cached': 0, 'bytes': 0,
+                                            'latency_total': 0.0, 'latency_max': 0.0, 'statuses': dict()}
+            stats['requests'] += 1
+            stats['bytes'] += size
+            stats['latency_total'] += seconds
+            stats['latency_max'] = max(stats['latency_max'], seconds)
+            if cached:
+                stats['cached'] += 1
+            if status is None or status >= 400:
+                stats['errors'] += 1
+            status = str(status)
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    def summary(self):
+        """
+        returns:
+            dict: JSON-serializable summary of the run so far. Times are in seconds
+        """
+        with self._lock:
+            hosts = dict()
+            for host, stats in self.hosts.items():
+                hosts[host] = dict(stats, statuses=dict(stats['statuses']),
+                                   latency_mean=stats['latency_total'] / stats['requests'])
+            return {
+                'started': datetime.datetime.fromtimestamp(self.started).isoformat(),
+                'wall_time': time.perf_counter() - self._start,
+                'spans': {name: {'count': count, 'total': total, 'max': longest}
+                          for name, (count, total, longest) in self.spans.items()},
+                'counters': dict(self.counters),
+                'hosts': hosts,
+            }
+
+
+class _Span(object):
+    """
+    Context manager timing one occurrence of a span
+    """
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan(object):
+    """
+    Stand-in for _Span outside decorated functions
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Logger(object):
+    """
+    Main working object. Writes messages logged inside a decorated function to
+    stdout and a log file. Also optionally tags and timestamps messages.
+    Messages above both the verbosity and the log level are dropped before
+    they are formatted.
+    """
+    def __init__(self, verbosity, log_level, add_timestamp, default_msg_type, logfile=None):
+        self.verbosity = Logger.get_level(verbosity)
+        self.log_level = Logger.get_level(log_level)
+        self.max_level = max(self.verbosity, self.log_level)
+        self.add_timestamp = add_timestamp
+        self.default_msg_type = default_msg_type
+        self.logfile = logfile
+
+        # Log lines are streamed to the file (see LogFile). Without a file name
+        # they're kept in memory so they can be returned to the caller.
+        if self.log_level < 0:
+            self.log_file = None
+        elif logfile is None:
+            self.log_file = io.StringIO()
         else:
-            # program ends with a newline character AKA chr(10)--ignore it
-            if data == chr(10):
-                return
-            code = self.default_msg_type.code
-            msg_level = self.default_msg_type.level
-            icon = self.default_msg_type.icon
-
-        if self.verbosity >= msg_level:
-            if code == NO_LOG:
-                self.stdout.write(f"{code}{data}\n")
-            else:
-                self.stdout.write(f"{code}{ts}{data}\n")
+            self.log_file = LogFile(logfile, **_logfile_options)
+        # Threads started inside a decorated function may share this logger
+        self._lock = threading.Lock()
+        self.metrics = Metrics()
+        self.log(DEBUG, "Started new Logger. verbosity=%s, log_level=%s, add_timestamp=%s, default_msg_type=%s",
+                 (self.verbosity, self.log_level, add_timestamp, default_msg_type.name))
 
-        if self.log_level >= msg_level and code != NO_LOG:
-            self.log_buffer.write(f"{icon} {ts}{data}\n")
+    @staticmethod
+    def get_level(level):
+        """
+        returns:
+            int: The level of a MessageType, -1 for False or None, or level itself
+        """
+        if type(level) == MessageType:
+            return level.level
+        elif level is False or level is None:
+            return -1
+        return level
+
+    def enabled(self, msg_type):
+        """
+        returns:
+            bool: True if messages of msg_type are displayed or logged
+        """
+        return msg_type.level <= self.max_level
+
+    def log(self, msg_type, msg, args=()):
+        """
+        Writes a message to stdout and the log file according to its level
+
+        args:
+            msg_type (MessageType)
+            msg (object): Message, optionally with %-style placeholders. Converted
+                to str only if the message is kept
+            args (tuple): Values for the placeholders in msg
+        """
+        msg_level = msg_type.level
+        if msg_level > self.max_level:
+            return
+        msg = str(msg)
+        if args:
+            msg = msg % args
+        ts = Logger.get_timestamp() if self.add_timestamp else ''
+
+        with self._lock:
+            if self.verbosity >= msg_level:
+                if msg_type is NO_LOG:
+                    sys.stdout.write(f"{msg_type.code}{msg}\n")
+                else:
+                    sys.stdout.write(f"{msg_type.code}{ts}{msg}\n")
+
+            if self.log_file is not None and self.log_level >= msg_level and msg_type is not NO_LOG:
+                line = f"{msg_type.icon} {ts}{msg}\n"
+                if isinstance(self.log_file, LogFile):
+                    # Errors are written at once in case the process is about to die
+                    self.log_file.write(line, flush=msg_level <= ERR_MSG_LEVEL)
+                else:
+                    self.log_file.write(line)
 
     def read(self):
         """
         returns:
-            str: Contents of log buffer
+            str: Contents of the in-memory log, or '' if logging to a file
         """
-        return self.log_buffer.getvalue()
+        if isinstance(self.log_file, io.StringIO):
+            return self.log_file.getvalue()
+        return ''
 
     def flush(self):
-        self.stdout.flush()
+        sys.stdout.flush()
+        if self.log_file is not None:
+            with self._lock:
+                self.log_file.flush()
+
+    def close(self):
+        """
+        Closes the log file
+        """
+        if self.log_file is not None and not isinstance(self.log_file, io.StringIO):
+            with self._lock:
+                self.log_file.close()
 
     @staticmethod
     def get_timestamp():
         return f"{datetime.datetime.now()}: "
 
 
+# Logger of the decorated function currently running in this thread or task
+_current_logger = contextvars.ContextVar('barometer_logger', default=None)
+# Used when log() is called outside of a decorated function
+_fallback_logger = None
+
+
+def get_logger():
+    """
+    returns:
+        Logger: The active Logger, or a stdout-only Logger showing INFO and above
+            if no decorated function is running
+    """
+    global _fallback_logger
+    logger = _current_logger.get()
+    if logger is None:
+        if _fallback_logger is None:
+            _fallback_logger = Logger(INFO, False, False, NO_LOG)
+        logger = _fallback_logger
+    return logger
+
+
+def log(msg_type, msg='', *args):
+    """
+    Logs a message through the Logger of the running decorated function.
+    Converting msg to str and formatting it with args are skipped when the
+    message would be filtered out.
+
+    args:
+        msg_type (MessageType): Message type. If a str is passed instead, it's
+            used as the message and the Logger's default_msg_type is used
+        msg (str): Message, optionally with %-style placeholders
+        args: Values for the placeholders in msg
+
+    examples:
+        log(DEBUG, "Found %s courses", len(courses))
+    """
+    logger = get_logger()
+    if type(msg_type) != MessageType:
+        args = (msg,) + args if msg else args
+        msg_type, msg = logger.default_msg_type, msg_type
+    logger.log(msg_type, msg, args)
+
+
+def enabled(msg_type):
+    """
+    returns:
+        bool: True if messages of msg_type are displayed or logged. Use to skip
+            work that only builds log messages
+    """
+    return get_logger().enabled(msg_type)
+
+
+def max_level():
+    """
+    returns:
+        int: Level of the most detailed messages the active Logger displays or logs
+    """
+    return get_logger().max_level
+
+
+class _RecordingLogger(Logger):
+    """
+    Logger keeping formatted messages in a list instead of writing them. See capture
+    """
+    def __init__(self, level):
+        self.records = []
+        super().__init__(False, False, False, NO_LOG)
+        self.max_level = Logger.get_level(level)
+
+    def log(self, msg_type, msg, args=()):
+        if msg_type.level <= self.max_level:
+            # Message types are sent by identifier, as unpickled ones are copies
+            msg = str(msg)
+            self.records.append((msg_type.identifier, msg % args if args else msg))
+
+
+def capture(level, function, *args, **kwargs):
+    """
+    Calls function with the messages it logs collected instead of written. For
+    functions run in worker processes, which have no decorated function to log
+    through: pass the messages back and log them in the caller with replay.
+
+    args:
+        level (int): Level of the most detailed messages kept, usually max_level()
+            of the caller
+        function (function): Must be picklable to run in a worker process
+        args, kwargs: Passed to function
+
+    returns:
+        (object, list((str, str))): What function returned and the identifier of
+            the MessageType and text of each message
+    """
+    logger = _RecordingLogger(level)
+    token = _current_logger.set(logger)
+    try:
+        return function(*args, **kwargs), logger.records
+    finally:
+        _current_logger.reset(token)
+
+
+def replay(records):
+    """
+    Logs messages collected by capture through the active Logger
+    """
+    for identifier, msg in records:
+        log(CODEBOOK[identifier], '%s', msg)
+
+
+def get_metrics():
+    """
+    returns:
+        Metrics: Metrics of the decorated function currently running, or None
+    """
+    logger = _current_logger.get()
+    return None if logger is None else logger.metrics
+
+
+def span(name):
+    """
+    Times a stage of the running decorated function. Does nothing outside one.
+
+    args:
+        name (str): Stage name, e.g. 'fetch', 'parse', 'transform' or 'upload'
+
+    examples:
+        with span('parse'):
+            courses = self.parse_department(dep_name, dep_soup)
+    """
+    metrics = get_metrics()
+    return _NO_SPAN if metrics is None else _Span(metrics, name)
+
+
+def timed(name, function):
+    """
+    Wraps a function so every call is timed as a span
+
+    args:
+        name (str): Stage name
+        function (function)
+
+    returns:
+        function
+    """
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def count(name, n=1):
+    """
+    Adds n to a counter of the running decorated function, e.g. count('records', 50)
+    """
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.count(name, n)
+
+
+def metrics_file(logfile):
+    """
+    returns:
+        str: Sidecar file runs logging to logfile append their metrics to,
+            e.g. 'scraper.txt' -> 'scraper.metrics.jsonl'
+    """
+    return f'{os.path.splitext(logfile)[0]}.metrics.jsonl'
+
+
 class barometer(object):
     """
-    Main logging decorator. Adds verbosity control and logging by redirecting stdout
+    Main logging decorator. Adds verbosity control and logging to messages
+    sent with log() while the decorated function runs. The active Logger is
+    kept in a context variable, so decorated functions can run concurrently in
+    threads or asyncio tasks.
     """
     def __init__(self, wrapped):
         self.wrapped = wrapped
@@ -196,7 +648,7 @@ class barometer(object):
         return self.__class__(self.wrapped.__get__(instance, owner))
 
     def __call__(self, *args, verbosity=7, log_level=False, add_timestamp=True,
-                 logfile='log.txt', default_msg_type=NO_LOG, **kwargs):
+                 logfile='log.txt', default_msg_type=NO_LOG, metrics=None, **kwargs):
         """
         args:
             verbosity: Maximum level of message that will be displayed on stdout.
@@ -206,39 +658,39 @@ class barometer(object):
                 If a MessageType is passed in, will  be set to the level of that type.
                 Logs nothing if set to False or None
             add_timestamp (bool): Adds timestamps to messages if True
-            logfile (str): Filename to save log buffer to. If None, returns
-                (result, log) as a tuple
+            logfile (str): Filename to append log messages to as they're logged,
+                rotated as set by configure_logfiles.
+                If None, returns (result, log) as a tuple
             default_msg_type (MessageType): Default MessageType if none specified
+            metrics (str): File to append the run's metrics summary to as one JSON
+                line. Uses metrics_file(logfile) if None and logging to a file.
+                Skipped if False
         """
-        logger = Logger(verbosity, log_level, add_timestamp, default_msg_type,)
+        logger = Logger(verbosity, log_level, add_timestamp, default_msg_type, logfile)
+        token = _current_logger.set(logger)
         result = None
         try:
-            if args:
-                if kwargs:
-                    result = self.wrapped(*args, **kwargs)
-                else:
-                    result = self.wrapped(*args)
-            else:
-                if kwargs:
-                    result = self.wrapped(**kwargs)
-                else:
-                    result = self.wrapped()
-        except:
+            result = self.wrapped(*args, **kwargs)
+        except Exception:
             tb = traceback.format_exc()
-            print(ALERT, f"Unhandled exception!\n{tb}")
+            log(ALERT, "Unhandled exception!\n%s", tb)
         finally:
-            if log_level is not None and log_level is not False:
-                # dumps contents of log buffer to "data"
-                data = logger.read()
-                if logfile is None:
-                    return result, data
-                if os.path.exists(logfile):
-                    with open(logfile, 'a') as log:
-                        log.write(data)
-                else:
-                    with open(logfile, 'w') as log:
-                        log.write(data)
+            summary = logger.metrics.summary()
+            summary['function'] = getattr(self.wrapped, '__qualname__', repr(self.wrapped))
+            logger.log(DEBUG, "Finished in %.2fs. Stage times: %s", (summary['wall_time'], ', '.join(
+                f"{name} {span['total']:.2f}s/{span['count']}" for name, span in summary['spans'].items()) or 'none'))
+            _current_logger.reset(token)
             logger.close()
+            if metrics is None and logfile is not None and logger.log_file is not None:
+                metrics = metrics_file(logfile)
+            if metrics:
+                try:
+                    with open(metrics, 'a') as f:
+                        f.write(json.dumps(summary) + '\n')
+                except OSError as e:
+                    sys.stderr.write(f"Failed to write metrics to {metrics}: {e}\n")
+        if logger.log_file is not None and logfile is None:
+            return result, logger.read()
         return result
 
 
@@ -0,0 +1,286 @@
+"""
+Title: Calendar export
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Writes scraped calendar events as an iCalendar (.ics) file and keeps a
+feed of the events added and removed each run, so clients can fetch only what
+changed since the last run they saw
+"""
+
+import datetime
+import hashlib
+import json
+import os
+
+from calendar_model import ONE_DAY
+
+PRODID = '-//Cal Poly CSAI//Nimbus Scraper//EN'
+# Domain part of event UIDs
+UID_DOMAIN = 'calendar.nimbus.calpoly.edu'
+# Longest content line in octets before it's folded
+LINE_LENGTH = 75
+
+
+def event_uid(event):
+    """
+    returns:
+        str: UID of an event, the same every run the event is scraped unchanged
+    """
+    digest = hashlib.sha1(f'{event.start}|{event.end}|{event.text}'.encode('utf-8')).hexdigest()
+    return f'{digest[:24]}@{UID_DOMAIN}'
+
+
+def event_record(event):
+    """
+    returns:
+        dict(str:str): An event as it appears in the change feed
+    """
+    return {'uid': event_uid(event), 'start_date': event.start.isoformat(),
+            'end_date': event.end.isoformat(), 'summary': event.text}
+
+
+def escape_text(text):
+    """
+    Escapes a TEXT value (RFC 5545 3.3.11)
+    """
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """
+    Splits a content line into lines of at most LINE_LENGTH octets, without
+    splitting UTF-8 characters (RFC 5545 3.1)
+
+    returns:
+        str: The folded line, ending in CRLF
+    """
+    data = line.encode('utf-8')
+    if len(data) <= LINE_LENGTH:
+        return line + '\r\n'
+    parts = []
+    start = 0
+    limit = LINE_LENGTH
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Continuation bytes of a character start with 0b10
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start = end
+        # Continuation lines start with a space, which counts toward their length
+        limit = LINE_LENGTH - 1
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def iter_ics(events, name='Cal Poly Academic Calendar', stamp=None):
+    """
+    Generates an iCalendar file one line at a time. Events become all-day VEVENTs;
+    events scraped more than once are only listed once.
+
+    args:
+        events (iterable(calendar_model.Event))
+        name (str): Calendar name shown by clients
+        stamp (datetime.datetime): DTSTAMP of the events. Uses the current time if None
+
+    yields:
+        str: Folded content lines ending in CRLF
+    """
+    stamp = (stamp or datetime.datetime.now(datetime.timezone.utc)).astimezone(datetime.timezone.utc)
+    dtstamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold(f'PRODID:{PRODID}')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold(f'X-WR-CALNAME:{escape_text(name)}')
+    seen = set()
+    for event in events:
+        uid = event_uid(event)
+        if uid in seen:
+            continue
+        seen.add(uid)
+        yield fold('BEGIN:VEVENT')
+        yield fold(f'UID:{uid}')
+        yield fold(f'DTSTAMP:{dtstamp}')
+        yield fold(f'DTSTART;VALUE=DATE:{event.start.strftime("%Y%m%d")}')
+        # DTEND of an all-day event is the day after it ends
+        yield fold(f'DTEND;VALUE=DATE:{(event.end + ONE_DAY).strftime("%Y%m%d")}')
+        yield fold(f'SUMMARY:{escape_text(event.text)}')
+        yield fold('TRANSP:TRANSPARENT')
+        yield fold('END:VEVENT')
+    yield fold('END:VCALENDAR')
+
+
+def write_ics(events, path, **kwargs):
+    """
+    Streams events to an .ics file, replacing it only once it's complete
+
+    args:
+        events (iterable(calendar_model.Event))
+        path (str): File to write
+        kwargs: Passed to iter_ics
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    # Lines already end in CRLF
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.writelines(iter_ics(events, **kwargs))
+    os.replace(tmp_path, path)
+
+
+class CalendarFeed:
+    """
+    Append-only JSON lines file with one line per run: its number, time, and the
+    events added and the UIDs removed since the run before. The number and events
+    of the latest run are also kept in a small state file next to it, so a run
+    doesn't replay the whole feed. The state is only trusted if the feed's size
+    matches it; otherwise it's rebuilt by replaying the feed.
+    """
+
+    def __init__(self, path):
+        """
+        args:
+            path (str): Feed file. Created on the first run, with a state file
+                named after it, e.g. calendar_feed.state.json
+        """
+        self.path = path
+        self.state_path = f'{os.path.splitext(path)[0]}.state.json'
+
+    def runs(self):
+        """
+        Reads the feed one run at a time
+
+        yields:
+            dict: Runs, oldest first
+        """
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _read_state(self):
+        """
+        returns:
+            (int, dict(str:dict)): See current, or None if the state file is missing
+                or was written for a different feed size
+        """
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            size = os.path.getsize(self.path)
+        except (OSError, ValueError):
+            return None
+        if state.get('size') != size:
+            return None
+        return state['run'], state['events']
+
+    def _write_state(self, run, events):
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'run': run, 'size': os.path.getsize(self.path), 'events': events}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def current(self):
+        """
+        returns:
+            (int, dict(str:dict)): Number of the latest run, or 0 if there were none,
+                and the records of the events it had by UID
+        """
+        state = self._read_state()
+        if state is not None:
+            return state
+        run = 0
+        events = dict()
+        for entry in self.runs():
+            run = entry['run']
+            for uid in entry['removed']:
+                events.pop(uid, None)
+            for record in entry['added']:
+                events[record['uid']] = record
+        return run, events
+
+    def record(self, events, now=None):
+        """
+        Appends a run with the changes between the latest run and events
+
+        args:
+            events (iterable(calendar_model.Event)): Events scraped this run
+            now (datetime.datetime): Time of the run. Uses the current time if None
+
+        returns:
+            dict: The new run
+        """
+        run, previous = self.current()
+        records = dict()
+        for event in events:
+            record = event_record(event)
+            records.setdefault(record['uid'], record)
+        entry = {
+            'run': run + 1,
+            'time': (now or datetime.datetime.now(datetime.timezone.utc)).isoformat(),
+            'added': [record for uid, record in records.items() if uid not in previous],
+            'removed': [uid for uid in previous if uid not in records],
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+        self._write_state(entry['run'], records)
+        return entry
+
+    def changes_since(self, run):
+        """
+        Nets out the changes made after a run: events added and removed again
+        since then aren't listed
+
+        args:
+            run (int): Last run the client has seen. 0 for every event
+
+        returns:
+            dict: since, the latest run, added event records and removed UIDs
+        """
+        latest = run
+        # UID -> (record or None if removed, whether it existed at run)
+        changes = dict()
+        for entry in self.runs():
+            latest = entry['run']
+            if entry['run'] <= run:
+                continue
+            for uid in entry['removed']:
+                existed = changes[uid][1] if uid in changes else True
+                changes[uid] = (None, existed)
+            for record in entry['added']:
+                existed = changes[record['uid']][1] if record['uid'] in changes else False
+                changes[record['uid']] = (record, existed)
+        return {
+            'since': run,
+            'run': latest,
+            # UIDs are derived from the event, so one that's back was never changed
+            'added': [record for record, existed in changes.values() if record is not None and not existed],
+            'removed': [uid for uid, (record, existed) in changes.items() if record is None and existed],
+        }
+
+    def write_changes(self, run, file):
+        """
+        Writes changes_since(run) as JSON lines: a header with since and run,
+        then one line per added event and one per removed UID. The changes are
+        netted out over the whole feed before the first line is written
+
+        args:
+            run (int): Last run the client has seen
+            file (file): Text file to write to
+        """
+        changes = self.changes_since(run)
+        file.write(json.dumps({'since': changes['since'], 'run': changes['run']}) + '\n')
+        for record in changes['added']:
+            file.write(json.dumps({'added': record}) + '\n')
+        for uid in changes['removed']:
+            file.write(json.dumps({'removed': uid}) + '\n')
@@ -0,0 +1,132 @@
+"""
+Title: Calendar model
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Academic calendar events kept as date intervals, with an index that
+finds the events on a date or in a week without expanding ranges into days
+"""
+
+import calendar
+import datetime
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class Event(namedtuple('Event', 'start end text')):
+    """
+    An event lasting from start to end, both datetime.date and inclusive
+    """
+    __slots__ = ()
+
+    def to_record(self):
+        """
+        returns:
+            dict(str:str): The event with ISO dates, as stored in manifests
+        """
+        return {'START_DATE': self.start.isoformat(), 'END_DATE': self.end.isoformat(), 'EVENT': self.text}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(datetime.date.fromisoformat(record['START_DATE']),
+                   datetime.date.fromisoformat(record['END_DATE']), record['EVENT'])
+
+
+def legacy_date(date):
+    """
+    returns:
+        str: date as month_day_year, e.g. '3_30_2020', as in the per-day CSV
+    """
+    return f'{date.month}_{date.day}_{date.year}'
+
+
+class CalendarModel:
+    """
+    Events are binned by length: bin b holds events lasting less than 2 ** b days,
+    sorted by start. An event in bin b that overlaps a date starts at most 2 ** b
+    days before it, so each bin is searched with two bisections and only events
+    near the date are looked at, however long the other events are.
+    """
+
+    def __init__(self, events):
+        """
+        args:
+            events (iterable(Event)): Events in the order they were scraped
+        """
+        self.events = list(events)
+        bins = dict()
+        for i, event in enumerate(self.events):
+            days = (event.end - event.start).days + 1
+            bins.setdefault(days.bit_length(), []).append(i)
+        # (2 ** b, start ordinals, event numbers) of each bin
+        self.bins = []
+        for b, numbers in sorted(bins.items()):
+            numbers.sort(key=lambda i: self.events[i].start)
+            self.bins.append((2 ** b, [self.events[i].start.toordinal() for i in numbers], numbers))
+
+    def between(self, first, last):
+        """
+        args:
+            first (datetime.date)
+            last (datetime.date): Inclusive
+
+        returns:
+            list(Event): Events overlapping first through last, by start date, then
+                in scraped order
+        """
+        found = []
+        for length, starts, numbers in self.bins:
+            lo = bisect_left(starts, first.toordinal() - length)
+            hi = bisect_right(starts, last.toordinal())
+            found.extend(i for i in numbers[lo:hi] if self.events[i].end >= first)
+        found.sort(key=lambda i: (self.events[i].start, i))
+        return [self.events[i] for i in found]
+
+    def on(self, date):
+        """
+        returns:
+            list(Event): Events happening on a date
+        """
+        return self.between(date, date)
+
+    def week(self, date):
+        """
+        returns:
+            list(Event): Events happening in the Monday to Sunday week of a date
+        """
+        monday = date - date.weekday() * ONE_DAY
+        return self.between(monday, monday + 6 * ONE_DAY)
+
+    def daily_rows(self):
+        """
+        Expands the events into the rows of the per-day CSV, sweeping the dates in
+        order so only the events in progress are held at a time
+
+        yields:
+            dict: DATE, DAY, MONTH, YEAR and EVENTS of each date with events. EVENTS
+                are in scraped order
+        """
+        order = sorted(range(len(self.events)), key=lambda i: (self.events[i].start, i))
+        active = []  # (end, event number) of events in progress
+        k = 0
+        day = None
+        while k < len(order) or active:
+            if not active:
+                day = self.events[order[k]].start
+            while k < len(order) and self.events[order[k]].start <= day:
+                i = order[k]
+                heapq.heappush(active, (self.events[i].end, i))
+                k += 1
+            yield {
+                'DATE': legacy_date(day),
+                'DAY': day.day,
+                'MONTH': calendar.month_name[day.month],
+                'YEAR': day.year,
+                'EVENTS': [self.events[i].text for _, i in sorted(active, key=lambda item: item[1])],
+            }
+            day += ONE_DAY
+            while active and active[0][0] < day:
+                heapq.heappop(active)
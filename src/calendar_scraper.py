@@ -5,13 +5,17 @@ Date: 1/22/2020
 Organization: Cal Poly CSAI
 Description: Scrapes calendar data from the main Cal Poly academic calendar
 """
-import json
 
 import scraper_base
+from manifest import Manifest
+from uploader import Uploader
 import requests
 import calendar as cal
+import datetime
 import pandas as pd
-from barometer import barometer, SUCCESS, ALERT, INFO, DEBUG, NOTICE, ERR
+from calendar_export import CalendarFeed, write_ics
+from calendar_model import CalendarModel, Event
+from barometer import barometer, log, span, SUCCESS, ALERT, INFO, DEBUG, NOTICE, WARNING, ERR
 
 
 class CalendarScraper:
@@ -21,152 +25,287 @@ class CalendarScraper:
         self.CALENDAR_EPOCH = 2018
         self.TOP_LINK = 'https://registrar.calpoly.edu'
         self.months = list(cal.month_name)
+        # Events of the last scrape
+        self.calendar = None
+        # Calendars scraped each run: the path of an academic year's page, formatted
+        # with its starting year and the last two digits of its ending year, and the
+        # method parsing the page. Pages of every calendar are fetched concurrently.
+        self.CALENDARS = {
+            'academic': ('{start}-{end:02d}-academic-calendar', self.parse_calendar_page),
+        }
 
-    def month_lengths(self, year):
+    def parse_date_range(self, dates, year):
         """
+        Turns a date range into its first and last day
+
         args:
-            year (int): year whose month lengths will be returned
+            dates (str): Date range
+            year (int): Year the range ends in. A range crossing into January
+                starts the year before
+
+        returns:
+            (datetime.date, datetime.date): The first and last day, or None if
+                dates isn't a date range
+
+        examples:
+            'March 30 - April 3' -> (March 30, April 3)
+            'January 25' -> (January 25, January 25)
+            'February 2 - 7' -> (February 2, February 7)
+        """
+        tokens = [t for t in dates.split() if t != '-']
+        try:
+            if len(tokens) == 2:
+                month, day = tokens
+                start = end = datetime.date(year, self.months.index(month), int(day))
+            elif len(tokens) == 3:
+                month, day_1, day_2 = tokens
+                start = datetime.date(year, self.months.index(month), int(day_1))
+                end = datetime.date(year, self.months.index(month), int(day_2))
+            elif len(tokens) == 4:
+                month_1, day_1, month_2, day_2 = tokens
+                month_1, month_2 = self.months.index(month_1), self.months.index(month_2)
+                start = datetime.date(year if month_1 <= month_2 else year - 1, month_1, int(day_1))
+                end = datetime.date(year, month_2, int(day_2))
+            else:
+                return None
+        except ValueError:
+            log(WARNING, "Couldn't parse dates %r", dates)
+            return None
+        return (start, end) if start <= end else None
+
+    @staticmethod
+    def entry_key(entry: dict):
+        return f"{entry['start_date']}|{entry['end_date']}|{entry['raw_events_text']}"
 
+    @staticmethod
+    def interval_entries(entries):
+        """
         returns:
-            list(int): 1-indexed list of month length for the given year
+            list(dict): entries, or None if they were stored per day by a run
+                before the calendar was kept as intervals and need parsing again
+        """
+        if entries and 'START_DATE' not in entries[0]:
+            return None
+        return entries
+
+    def parse_calendar_page(self, calendar_soup, starting_year):
         """
-        return [''] + [cal.monthrange(year, i)[1] for i in range(1,13)]
+        Parses the tables of one academic year's calendar page
 
+        args:
+            calendar_soup (BeautifulSoup): Parsed calendar page
+            starting_year (int): Year the academic year starts in
 
-    def parse_dates(self, dates, year):
+        returns:
+            list(dict): One entry per event and date range, see calendar_model.Event.to_record
         """
-        Turns date strings into formatted dictionaries
+        ending_year = starting_year + 1
+        current_year = starting_year
+        entries = []
+        # Finds all tables on the page (summer/fall/winter/spring quarters)
+        # Excludes the last summary table.
+        # Note: summary table id has a space at the end. All years are like this.
+        tables = calendar_soup.find_all(lambda tag:
+                                        tag.name == 'table'
+                                        and tag.has_attr('id')
+                                        and tag['id'] != "SUMMARY OF CALENDAR DAYS ")
+        log(DEBUG, "Found %s tables", len(tables))
+        for table in tables:
+            for row in table.find_all('tr'):
+                cols = row.find_all('td')
+                dates = cols[0].text
+                # Ugly solution to change the calendar year during the school year.
+                # Assumes there will always be an event in January.
+                if 'January' in dates.split() and current_year != ending_year:
+                    log(DEBUG, "Switching current year from %s to %s", current_year, ending_year)
+                    current_year = ending_year
+                date_range = self.parse_date_range(dates, current_year)
+                if date_range is None:
+                    continue
+                # Second column is just the days of the week; ignore
+                for line in cols[2].text.splitlines():
+                    event = line.strip()
+                    if event:
+                        entries.append(Event(*date_range, event).to_record())
+        return entries
 
+    def current_academic_year(self, today=None):
+        """
         args:
-            dates (str): Date range
-            year (int): Year dates occur in
+            today (datetime.date): Uses the current date if None
 
         returns:
-            dict(str : list(int)) : A dictionary mapping each month in the date
-                range to its days
+            int: Year the academic year in progress started in. A new academic year
+                starts in July, after spring quarter ends
+        """
+        today = today or datetime.date.today()
+        return today.year if today.month >= 7 else today.year - 1
 
-        examples:
-            'March 30 - April 3' -> {'March': [30, 31], 'April': [1, 2, 3]}
-            'January 25' -> {'January': [25]}
-            'February 2 - 7' -> {'February': [2, 3, 4, 5, 6, 7]}
+    def calendar_url(self, calendar, starting_year):
         """
-        month_lengths = self.month_lengths(year)
-        tokens = [t for t in dates.split() if t != '-']
-        parsed_dates = dict()
+        args:
+            calendar (str): Key of the calendar in self.CALENDARS
+            starting_year (int): Year the academic year starts in
 
-        if len(tokens) == 2:
-            month, day = tokens
-            parsed_dates[month] = [int(day)]
-        elif len(tokens) == 3:
-            month, start, end = tokens
-            parsed_dates[month] = [n for n in range(int(start), int(end) + 1)]
-        elif len(tokens) == 4:
-            month_1, day_1, month_2, day_2 = tokens
-            i = self.months.index(month_1)
-            num_days = month_lengths[i]
-            parsed_dates[month_1] = [n for n in range(int(day_1), num_days + 1)]
-            parsed_dates[month_2] = [n for n in range(1, int(day_2) + 1)]
+        returns:
+            str: URL of the calendar's page for that academic year
+        """
+        path = self.CALENDARS[calendar][0].format(start=starting_year, end=(starting_year + 1) % 100)
+        return f'{self.TOP_LINK}/{path}'
+
+    def read_page(self, calendar, starting_year, url, response, manifest):
+        """
+        Parses a fetched calendar page, or takes its entries from the manifest if
+        it's unchanged
 
-        return parsed_dates
+        returns:
+            list(dict): One entry per event and date range
+        """
+        entries = self.interval_entries(manifest.unchanged_records(url, response)) if manifest else None
+        if entries is None:
+            parse = self.CALENDARS[calendar][1]
+            with span('parse'):
+                entries = parse(scraper_base.parse_soup(response), starting_year)
+            if manifest:
+                manifest.update_source(url, response, entries)
+        return entries
 
-    def make_date(self, month, day, year):
+    def fetch_pages(self, manifest=None, today=None):
         """
+        Gets the page of every academic year of every calendar. Years from
+        CALENDAR_EPOCH up to the one after the current academic year are fetched
+        concurrently, then later years one at a time while they exist. Years before
+        the current one are finalized and aren't fetched again once they were
+        scraped: their entries are taken from the manifest, or without one, their
+        pages are read from the response cache (see scraper_base.configure_cache).
+        Without either, every year is fetched.
+
         args:
-            month (str)
-            day (int)
-            year (int)
+            manifest (Manifest): Manifest from previous runs, if any
+            today (datetime.date): Uses the current date if None
+
         returns:
-            str: month_day_year
+            dict((str, int): list(dict)): Entries of each calendar and starting year
+                whose page exists
+
+        raises:
+            requests.exceptions.RequestException: A page couldn't be fetched for a
+                reason other than not existing
         """
-        return f'{self.months.index(month)}_{day}_{year}'
+        current = self.current_academic_year(today)
+        pages = dict()
+        urls = dict()
+        for calendar in self.CALENDARS:
+            for starting_year in range(self.CALENDAR_EPOCH, current + 2):
+                url = self.calendar_url(calendar, starting_year)
+                entries = None
+                if manifest and starting_year < current:
+                    entries = self.interval_entries(manifest.source_records(url))
+                if entries is None and starting_year < current:
+                    response = scraper_base.cached(url)
+                    if response is not None:
+                        entries = self.read_page(calendar, starting_year, url, response, manifest)
+                if entries is not None:
+                    log(DEBUG, "Using stored %s %s-%s calendar", calendar, starting_year, starting_year + 1)
+                    pages[calendar, starting_year] = entries
+                else:
+                    urls[url] = (calendar, starting_year)
+
+        for url, response in scraper_base.fetch_many(urls, parse=lambda r: r, return_exceptions=True):
+            calendar, starting_year = urls[url]
+            if isinstance(response, requests.exceptions.HTTPError):
+                log(NOTICE, "%s %s-%s calendar doesn't exist", calendar, starting_year, starting_year + 1)
+                continue
+            if isinstance(response, Exception):
+                raise response
+            log(SUCCESS, "Successfully retrieved %s %s-%s calendar", calendar, starting_year, starting_year + 1)
+            pages[calendar, starting_year] = self.read_page(calendar, starting_year, url, response, manifest)
+
+        # Calendars may already be published further ahead
+        for calendar in self.CALENDARS:
+            starting_year = current + 2
+            while (calendar, starting_year - 1) in pages:
+                url = self.calendar_url(calendar, starting_year)
+                try:
+                    response = scraper_base.get(url)
+                except requests.exceptions.HTTPError:
+                    log(NOTICE, "%s %s-%s calendar doesn't exist", calendar, starting_year, starting_year + 1)
+                    break
+                log(SUCCESS, "Successfully retrieved %s %s-%s calendar", calendar, starting_year, starting_year + 1)
+                pages[calendar, starting_year] = self.read_page(calendar, starting_year, url, response, manifest)
+                starting_year += 1
+        return pages
 
     @barometer
-    def scrape(self):
+    def scrape(self, manifest=None, ics=None, feed=None):
         """
-        Scrapes academic calendar data to CSV
+        Scrapes academic calendar data to CSV. Events are kept as date intervals
+        in self.calendar (see calendar_model.CalendarModel) and uploaded as one
+        entry per event, with start_date and end_date
+
+        args:
+            manifest (str): Path of a manifest file from previous runs. If given,
+                finalized years aren't fetched again, unchanged calendar pages aren't
+                parsed again and only inserted, updated and deleted entries are
+                uploaded. Without one, finalized years are only fetched again if
+                the response cache is disabled
+            ics (str): Path to write the events to as an iCalendar file, if any
+            feed (str): Path of a calendar_export.CalendarFeed to add this run's
+                added and removed events to, if any
 
         returns:
             str: A CSV string of scraped data
         """
-        print(DEBUG, f"Starting calendar scrape: CALENDAR_EPOCH={self.CALENDAR_EPOCH}, TOP_LINK={self.TOP_LINK}")
-        starting_year = self.CALENDAR_EPOCH
-        calendar = dict()
-
-        while True:
-            ending_year = starting_year + 1
-            current_year = starting_year
-            calendar_url = f'{self.TOP_LINK}/{starting_year}-{ending_year - 2000}-academic-calendar'
-            print(DEBUG, f"Attempting to retrieve {starting_year}-{ending_year} calendar from {calendar_url}")
-            try:
-                calendar_soup = scraper_base.get_soup(calendar_url)
-            # Returns on an invalid school year; should always return.
-            except requests.exceptions.HTTPError:
-                print(NOTICE, f"{starting_year}-{ending_year} calendar doesn't exist. Ending scrape.")
-                dates = list(calendar.values())
-                if len(dates) > 0:
-                    print(SUCCESS, f"Done! Scraped {ending_year-self.CALENDAR_EPOCH-1} calendar(s)")
-                else:
-                    print(ERR, "Did not successfully scrape any dates")
-                    return None
-                return pd.DataFrame(dates).to_csv(None, index=False)
-            except requests.exceptions.RequestException as e:
-                print(ALERT, e)
-                return None
-            else:
-                print(SUCCESS, f"Successfully retrieved {starting_year}-{ending_year} calendar")
-                # Finds all tables on the page (summer/fall/winter/spring quarters)
-                # Excludes the last summary table.
-                # Note: summary table id has a space at the end. All years are like this.
-                tables = calendar_soup.find_all(lambda tag:
-                                                tag.name == 'table'
-                                                and tag.has_attr('id')
-                                                and tag['id'] != "SUMMARY OF CALENDAR DAYS ")
-                print(DEBUG, f"Found {len(tables)} tables")
-                for table in tables:
-                    for row in table.find_all('tr'):
-                        cols = row.find_all('td')
-                        dates = cols[0].text
-                        parsed_dates = self.parse_dates(dates, current_year)
-                        # Ugly solution to change the calendar year during the school year.
-                        # Assumes there will always be an event in January.
-                        if 'January' in parsed_dates and current_year != ending_year:
-                            print(DEBUG, f"Switching current year from {current_year} to {ending_year}")
-                            current_year = ending_year
-                        # Second column is just the days of the week; ignore
-                        events = [t.strip() for t in cols[2].text.splitlines()]
-                        for month, days in parsed_dates.items():
-                            for day in days:
-                                date = self.make_date(month, day, current_year)
-                                if date in calendar:
-                                    print(DEBUG, f"Adding event to {date}")
-                                    calendar[date]['EVENTS'].extend(events)
-                                else:
-                                    print(DEBUG, f"Making calendar entry for {date}")
-                                    entry = dict()
-                                    entry['DATE'] = date
-                                    entry['DAY'] = day
-                                    entry['MONTH'] = month
-                                    entry['YEAR'] = current_year
-                                    entry['EVENTS'] = events
-                                    calendar[date] = entry
+        log(DEBUG, "Starting calendar scrape: CALENDAR_EPOCH=%s, TOP_LINK=%s", self.CALENDAR_EPOCH, self.TOP_LINK)
+        manifest = Manifest(manifest) if manifest else None
+        try:
+            pages = self.fetch_pages(manifest)
+        except requests.exceptions.RequestException as e:
+            log(ALERT, "%s", e)
+            return None
 
+        # Each calendar ends at its first missing year
+        events = []
+        scraped = 0
+        for name in self.CALENDARS:
+            starting_year = self.CALENDAR_EPOCH
+            while (name, starting_year) in pages:
+                events.extend(Event.from_record(entry) for entry in pages[name, starting_year])
                 starting_year += 1
+                scraped += 1
+        self.calendar = CalendarModel(events)
+
+        if len(events) > 0:
+            log(SUCCESS, "Done! Scraped %s calendar(s) with %s events", scraped, len(events))
+        else:
+            log(ERR, "Did not successfully scrape any dates")
+            return None
+
+        # Events listed in two academic years' pages are uploaded once
+        scraped_calendar_entries = dict()
+        for event in events:
+            entry = {
+                'start_date': event.start.isoformat(),
+                'end_date': event.end.isoformat(),
+                'raw_events_text': event.text,
+            }
+            scraped_calendar_entries.setdefault(self.entry_key(entry), entry)
+
+        # With a manifest, only changed entries are uploaded
+        Uploader(self.CALENDARS_API, 'calendars').sync(list(scraped_calendar_entries.values()), self.entry_key,
+                                                       manifest=manifest)
+
+        if ics or feed:
+            with span('export'):
+                try:
+                    if ics:
+                        write_ics(sorted(events, key=lambda event: event.start), ics)
+                    if feed:
+                        run = CalendarFeed(feed).record(events)
+                        log(INFO, "Calendar feed run %s: %s events added, %s removed",
+                            run['run'], len(run['added']), len(run['removed']))
+                except OSError as e:
+                    log(ALERT, "Failed to export calendar: %s", e)
 
-            scraped_calendar_entries = []
-            for date, full_entry in calendar.items():
-                for event in full_entry['EVENTS']:
-                    scraped_calendar_entries.append(
-                        {
-                            'date': full_entry['DATE'],
-                            'day': full_entry['DAY'],
-                            'month': full_entry['MONTH'],
-                            'year': full_entry['YEAR'],
-                            'raw_events_text': event,
-                        }
-                    )
-
-            calendars_request = json.dumps({
-                'calendars': scraped_calendar_entries
-            })
-            requests.post(url=self.CALENDARS_API,
-                          json=calendars_request)
+        # The per-day CSV is only expanded from the intervals here
+        return pd.DataFrame(self.calendar.daily_rows()).to_csv(None, index=False)
@@ -0,0 +1,285 @@
+"""
+Title: Campus index
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Spatial index over the placemarks of the campus map, keeping building
+footprints, so "nearest building to here" and "what building is this coordinate in"
+are answered without scanning every location
+"""
+
+import math
+import re
+from array import array
+from collections import namedtuple
+
+
+# Kinds of placemark, in the order LocationScraper lists them
+POINT, LINE, SHAPE = 'point', 'line', 'shape'
+# Meters per degree of latitude
+METERS_PER_DEGREE = 6371008.8 * math.pi / 180
+# Longitude and latitude of each 'lon,lat[,height]' tuple in a coordinates element
+COORDINATE = re.compile(r'(-?[\d.]+(?:[eE]-?\d+)?),(-?[\d.]+(?:[eE]-?\d+)?)(?:,-?[\d.]+(?:[eE]-?\d+)?)?')
+
+Location = namedtuple('Location', 'key building_number name kind coordinates')
+Location.__doc__ = """
+A placemark of the campus map. coordinates is a list of (longitude, latitude)
+holding one point, the vertices of a line or the ring of a shape.
+"""
+
+
+def placemark_kind(elements):
+    """
+    args:
+        elements (dict(str:str)): Element texts of a placemark
+
+    returns:
+        str: POINT, LINE or SHAPE
+    """
+    if 'LookAt' in elements:
+        return POINT
+    if 'LineString' in elements:
+        return LINE
+    return SHAPE
+
+
+def parse_coordinates(text):
+    """
+    returns:
+        list((float, float)): The (longitude, latitude) pairs of a coordinates element
+    """
+    return [(float(lon), float(lat)) for lon, lat in COORDINATE.findall(text)]
+
+
+def to_location(key, elements, kind=None):
+    """
+    args:
+        key (str): Placemark name, e.g. '14 Frank E. Pilling'
+        elements (dict(str:str)): Element texts of the placemark
+        kind (str): POINT, LINE or SHAPE. Found from elements if None
+
+    returns:
+        Location
+    """
+    try:
+        building_number, name = key.split(' ', 1)
+    except ValueError:
+        building_number, name = key, 'NA'
+    return Location(key, building_number, name, kind or placemark_kind(elements),
+                    parse_coordinates(elements.get('coordinates', '')))
+
+
+def segment_distance(px, py, ax, ay, bx, by):
+    """
+    returns:
+        float: Distance from (px, py) to the segment from (ax, ay) to (bx, by)
+    """
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+class CampusIndex:
+    """
+    Coordinates are projected to meters around the middle of the map, which is
+    accurate to well under a meter across a campus. Vertices of location i are
+    xs[offsets[i]:offsets[i + 1]] and ys[...], and the locations whose bounding
+    box overlaps grid cell c are cell_items[cell_offsets[c]:cell_offsets[c + 1]].
+
+    Distances are measured to a location's footprint: 0 inside a shape, else
+    to its nearest edge, vertex or point.
+    """
+
+    def __init__(self, locations, cell_size=None):
+        """
+        args:
+            locations (list(Location)): A location replaces earlier ones with the
+                same key, as in LocationScraper.build_table. Locations without
+                coordinates are left out
+            cell_size (num): Width of a grid cell in meters. Sized so cells hold
+                about one location each if None
+        """
+        self.by_key = {l.key: l for l in locations}
+        self.locations = [l for l in self.by_key.values() if l.coordinates]
+        lats = [lat for l in self.locations for _, lat in l.coordinates]
+        self.scale = math.cos(math.radians((min(lats) + max(lats)) / 2)) if lats else 1.0
+
+        self.offsets, self.xs, self.ys = array('l', [0]), array('d'), array('d')
+        boxes = []
+        for location in self.locations:
+            vertices = [self.project(lon, lat) for lon, lat in location.coordinates]
+            self.xs.extend(x for x, _ in vertices)
+            self.ys.extend(y for _, y in vertices)
+            self.offsets.append(len(self.xs))
+            boxes.append((min(x for x, _ in vertices), min(y for _, y in vertices),
+                          max(x for x, _ in vertices), max(y for _, y in vertices)))
+        self.boxes = boxes
+
+        if boxes:
+            self.x0, self.y0 = min(b[0] for b in boxes), min(b[1] for b in boxes)
+            width = max(b[2] for b in boxes) - self.x0
+            height = max(b[3] for b in boxes) - self.y0
+        else:
+            self.x0 = self.y0 = width = height = 0.0
+        if cell_size is None:
+            cell_size = max(width, height) / max(1, math.ceil(math.sqrt(len(boxes))))
+        self.cell_size = max(cell_size, 1.0)
+        self.nx = int(width // self.cell_size) + 1
+        self.ny = int(height // self.cell_size) + 1
+
+        cells = dict()
+        for i, (x1, y1, x2, y2) in enumerate(boxes):
+            cx1, cy1 = self.cell(x1, y1)
+            cx2, cy2 = self.cell(x2, y2)
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    cells.setdefault(cx * self.ny + cy, []).append(i)
+        self.cell_offsets, self.cell_items = array('l', [0]), array('l')
+        for c in range(self.nx * self.ny):
+            self.cell_items.extend(cells.get(c, ()))
+            self.cell_offsets.append(len(self.cell_items))
+
+    @classmethod
+    def from_placemarks(cls, placemarks, cell_size=None):
+        """
+        args:
+            placemarks (iterable((str, dict(str:str)))): Placemarks as yielded by
+                location_scraper.iter_placemarks
+
+        returns:
+            CampusIndex
+        """
+        return cls([to_location(key, elements) for key, elements in placemarks], cell_size)
+
+    def project(self, lon, lat):
+        """
+        returns:
+            (float, float): Meters east and north of the map's origin
+        """
+        return lon * METERS_PER_DEGREE * self.scale, lat * METERS_PER_DEGREE
+
+    def cell(self, x, y):
+        """
+        returns:
+            (int, int): Column and row of the cell holding a projected point. May
+                be outside the grid
+        """
+        return int(math.floor((x - self.x0) / self.cell_size)), int(math.floor((y - self.y0) / self.cell_size))
+
+    def _ring(self, cx, cy, r):
+        """
+        Lists the cells of the grid at Chebyshev distance r from cell (cx, cy)
+
+        yields:
+            int: Cell numbers
+        """
+        for x in range(max(cx - r, 0), min(cx + r, self.nx - 1) + 1):
+            for y in ((cy - r, cy + r) if r and x not in (cx - r, cx + r) else range(cy - r, cy + r + 1)):
+                if 0 <= y < self.ny:
+                    yield x * self.ny + y
+
+    def _contains(self, i, x, y):
+        """
+        Even-odd ray casting test of a projected point against shape i
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        xs, ys = self.xs, self.ys
+        inside = False
+        j = end - 1
+        for k in range(start, end):
+            if (ys[k] > y) != (ys[j] > y) and x < (xs[j] - xs[k]) * (y - ys[k]) / (ys[j] - ys[k]) + xs[k]:
+                inside = not inside
+            j = k
+        return inside
+
+    def _distance(self, i, x, y):
+        """
+        returns:
+            float: Meters from a projected point to the footprint of location i
+        """
+        kind = self.locations[i].kind
+        start, end = self.offsets[i], self.offsets[i + 1]
+        xs, ys = self.xs, self.ys
+        if kind == SHAPE and end - start > 2 and self._contains(i, x, y):
+            return 0.0
+        if end - start == 1:
+            return math.hypot(x - xs[start], y - ys[start])
+        # Shapes are closed back to their first vertex
+        j = end - 1 if kind == SHAPE else start
+        best = math.inf
+        for k in range(start if kind == SHAPE else start + 1, end):
+            best = min(best, segment_distance(x, y, xs[j], ys[j], xs[k], ys[k]))
+            j = k
+        return best
+
+    def nearest(self, lon, lat, k=1, kinds=None):
+        """
+        Finds the locations closest to a coordinate by searching grid cells in
+        rings around it, stopping once no unsearched cell can hold anything closer
+
+        args:
+            lon (float): Longitude
+            lat (float): Latitude
+            k (int): Number of locations to return
+            kinds (iterable(str)): Kinds of location to consider, e.g. {SHAPE}. All if None
+
+        returns:
+            list((Location, float)): Up to k locations and their distances in
+                meters, closest first
+        """
+        kinds = None if kinds is None else set(kinds)
+        x, y = self.project(lon, lat)
+        cx, cy = self.cell(x, y)
+        # Rings that miss the grid entirely are skipped
+        first = max(0, -cx, cx - self.nx + 1, -cy, cy - self.ny + 1)
+        last = max(cx, self.nx - 1 - cx, cy, self.ny - 1 - cy)
+        seen = set()
+        found = []
+        for r in range(first, last + 1):
+            for c in self._ring(cx, cy, r):
+                for i in self.cell_items[self.cell_offsets[c]:self.cell_offsets[c + 1]]:
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    if kinds is None or self.locations[i].kind in kinds:
+                        found.append((self._distance(i, x, y), i))
+            # Everything in ring r + 1 or beyond is at least r cells away
+            if len(found) >= k:
+                found.sort()
+                del found[k:]
+                if found[-1][0] <= r * self.cell_size:
+                    break
+        found.sort()
+        return [(self.locations[i], distance) for distance, i in found[:k]]
+
+    def containing(self, lon, lat):
+        """
+        args:
+            lon (float): Longitude
+            lat (float): Latitude
+
+        returns:
+            list(Location): Shapes containing the coordinate, smallest first
+        """
+        x, y = self.project(lon, lat)
+        cx, cy = self.cell(x, y)
+        if not (0 <= cx < self.nx and 0 <= cy < self.ny):
+            return []
+        c = cx * self.ny + cy
+        hits = []
+        for i in self.cell_items[self.cell_offsets[c]:self.cell_offsets[c + 1]]:
+            x1, y1, x2, y2 = self.boxes[i]
+            if (self.locations[i].kind == SHAPE and x1 <= x <= x2 and y1 <= y <= y2
+                    and self._contains(i, x, y)):
+                hits.append(((x2 - x1) * (y2 - y1), i))
+        hits.sort()
+        return [self.locations[i] for _, i in hits]
+
+    def at(self, lon, lat):
+        """
+        returns:
+            Location: The smallest shape containing the coordinate, or None
+        """
+        hits = self.containing(lon, lat)
+        return hits[0] if hits else None
@@ -5,12 +5,21 @@ Date: 1/22/2020
 Organization: Cal Poly CSAI
 Description: Scrapes club data from the Cal Poly website
 """
-import json
 
 import scraper_base
+from manifest import Manifest
+from uploader import Uploader
 import requests
 import pandas as pd
-from barometer import barometer, SUCCESS, ALERT, INFO, DEBUG
+import tempfile
+from lxml import etree
+from barometer import barometer, log, span, SUCCESS, ALERT, INFO, DEBUG
+
+
+# Listings larger than this many bytes are spooled to disk
+SPOOL_SIZE = 2 ** 20
+# Elements holding the whole page, which are never a club's container
+PAGE_TAGS = ('html', 'body')
 
 
 class ClubScraper:
@@ -19,7 +28,7 @@ class ClubScraper:
         self.CLUBS_API = 'http://0.0.0.0:8080/new_data/clubs'
         self.TOP_LINK = 'https://www.asi.calpoly.edu/club_directories/listing_bs/'
         # Doesn't contain 'Contact Email' because that name is used for two different fields.
-        # Workaround in scrape method.
+        # Workaround in iter_clubs.
         self.INFO_ENTRY_PAIRS = {
             'Contact Person:': 'CONTACT_PERSON',
             'Contact Phone:': 'CONTACT_PHONE',
@@ -31,6 +40,8 @@ class ClubScraper:
             'Type(s):': 'TYPES',
             'Description:': 'DESCRIPTION'
         }
+        # Listing text that's neither a label, a value nor a club name
+        self.SKIPPED_LINES = {'Website', 'Homepage:'}
 
     @staticmethod
     def transform_club_to_db(club: dict):
@@ -49,81 +60,156 @@ class ClubScraper:
 
         return db_club
 
-    @barometer
-    def scrape(self):
+    @staticmethod
+    def club_key(club: dict):
+        return club['NAME']
+
+    def is_value(self, field, line):
         """
-        Scrapes club information to CSV
+        args:
+            field (str): Field waiting for its value
+            line (str): Line after the field's label
 
         returns:
-            str: A CSV string of scraped data
+            bool: Whether line is the field's value rather than the next club's name
+        """
+        # The club's own email is only taken if it is one, since the next line
+        # could be the name of another club
+        return '@' in line if field == 'CONTACT_EMAIL_2' else not line.endswith(':')
+
+    def iter_clubs(self, listing):
         """
-        print(INFO, f'Starting scrape on {self.TOP_LINK}')
-        try:
-            top = scraper_base.get_soup(self.TOP_LINK)
-        except requests.exceptions.RequestException as e:
-            print(ALERT, e)
-            return None
-        print(SUCCESS, f'Retrieved club list')
-        raw = [l.text.strip() for l in top.find_all('span')]
-        # Filters out some info we don't need
-        info = [x for x in raw if x and x != "Website" and x != "Homepage:"]
-        info.pop(0)  # Don't need first line
+        Parses the club directory listing in one pass over the text of its
+        outermost <span> elements. Each label is matched to its field with a dict
+        lookup and takes the next line as its value, unless that's another label.
+        Any other line starts a new club; text not followed by any fields, like
+        the directory's heading, isn't a club and is dropped.
+
+        A club also ends with its container: the highest element below <body>
+        whose text starts with the club's name, once it holds some of the club's
+        fields. So
+        a label left without a value at the end of a club can't take the next
+        club's name, whether each club is one element, a few rows or only spans
+        between the names. The listing is read incrementally and elements are
+        freed once read, so only the club being parsed is held in memory.
 
+        args:
+            listing (file): Binary file holding the listing page
+
+        yields:
+            dict: One record per club, as soon as the next one starts or its
+                container closes
+        """
         current_club = None
-        info_len = len(info)
         club_info = dict()
-        scraped_clubs = []
-        i = 0
-
-        while i < info_len:
-            line = info[i]
-            if line in self.INFO_ENTRY_PAIRS:
-                next_line = info[i+1]
-                entry_name = self.INFO_ENTRY_PAIRS[line]
-                if next_line.endswith(':'):
-                    club_info[entry_name] = 'NA'
-                    i += 1
+        field = None  # Field waiting for its value
+        container = None  # Element current_club started
+        # [element, whether any text was read in it] of each open element outside spans
+        open_elements = []
+        depth = 0  # Number of open <span> elements
+
+        for event, element in etree.iterparse(listing, events=('start', 'end'), html=True):
+            if event == 'start':
+                if depth == 0:
+                    open_elements.append([element, False])
+                if element.tag == 'span':
+                    depth += 1
+                continue
+            if element.tag == 'span':
+                depth -= 1
+            if depth > 0:
+                # Text of spans and elements inside a span belongs to the outermost span
+                continue
+            open_elements.pop()
+
+            line = ''.join(element.itertext()).strip() if element.tag == 'span' else None
+            if line and line not in self.SKIPPED_LINES:
+                if line == 'Contact Email:':
+                    # Two fields are called "Contact Email"--the email of the main contact for the club, and the
+                    # club's official email to contact them. The official email is called "contact_email_2"
+                    label = 'CONTACT_EMAIL_2' if 'CONTACT_EMAIL' in club_info else 'CONTACT_EMAIL'
                 else:
-                    club_info[entry_name] = next_line
-                    i += 2
-            elif line == "Contact Email:":
-                next_line = info[i+1]
-                try:
-                    bool(club_info['CONTACT_EMAIL'])  # Checks if there's already a contact_email entry.
-                except KeyError:
-                    if next_line.endswith(':'):
-                        club_info['CONTACT_EMAIL'] = 'NA'
-                        i += 1
-                    else:
-                        club_info['CONTACT_EMAIL'] = next_line
-                        i += 2
+                    label = self.INFO_ENTRY_PAIRS.get(line)
+                if label is not None:
+                    field = label
+                    club_info[field] = 'NA'
+                elif field is not None and self.is_value(field, line):
+                    club_info[field] = line
+                    field = None
                 else:
-                    # Two fields are called "Contact Email"--the email of the main contact for the club, and the club's
-                    # official email to contact them. For now, the official email is called "contact_email_2"
-                    if '@' in next_line:  # Next line could be the name of another club; doesn't end in ':'
-                        club_info['CONTACT_EMAIL_2'] = next_line
-                        i += 2
-                    else:
-                        club_info['CONTACT_EMAIL_2'] = 'NA'
-                        i += 1
-            else:
-                # Checking len(club_info) filters unused addresses and stuff that get parsed as club names.
-                if current_club and len(club_info) != 0:
+                    field = None
+                    if current_club and club_info:
+                        club_info['NAME'] = current_club
+                        log(DEBUG, 'Scraped %s', current_club)
+                        yield club_info
+                    elif current_club:
+                        log(DEBUG, 'Discarding non-club %s', current_club)
+                    club_info = dict()
+                    current_club = line
+                    container = None
+                    for ancestor in reversed(open_elements):
+                        if ancestor[1] or ancestor[0].tag in PAGE_TAGS:
+                            break
+                        container = ancestor[0]
+                for ancestor in reversed(open_elements):
+                    if ancestor[1]:
+                        break
+                    ancestor[1] = True
+            elif element is container:
+                container = None
+                if club_info:
                     club_info['NAME'] = current_club
-                    scraped_clubs.append(club_info)
-                    print(DEBUG, f'Scraped {current_club}')
-                else:
-                    print(DEBUG, f'Discarding non-club {current_club}')
-                club_info = dict()
-                current_club = line
-                i += 1
-
-        clubs_request = json.dumps({
-            'clubs': [self.transform_club_to_db(club)
-                      for club in scraped_clubs]
-        })
-        requests.post(url=self.CLUBS_API,
-                      json=clubs_request)
-
-        print(SUCCESS, f'Done! Scraped {len(scraped_clubs)} clubs')
+                    log(DEBUG, 'Scraped %s', current_club)
+                    yield club_info
+                    current_club = None
+                    club_info = dict()
+                    field = None
+
+            # Frees everything already read
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+
+        if current_club and club_info:
+            club_info['NAME'] = current_club
+            yield club_info
+
+    @barometer
+    def scrape(self, manifest=None):
+        """
+        Scrapes club information to CSV. The listing is spooled to a temporary
+        file and parsed as it's read back, so the page isn't held in memory.
+
+        args:
+            manifest (str): Path of a manifest file from previous runs. If given,
+                an unchanged listing isn't parsed again and only inserted, updated
+                and deleted clubs are uploaded
+
+        returns:
+            str: A CSV string of scraped data
+        """
+        log(INFO, 'Starting scrape on %s', self.TOP_LINK)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as listing:
+            try:
+                response = scraper_base.download(self.TOP_LINK, listing)
+            except requests.exceptions.RequestException as e:
+                log(ALERT, "%s", e)
+                return None
+            log(SUCCESS, 'Retrieved club list')
+
+            manifest = Manifest(manifest) if manifest else None
+            scraped_clubs = manifest.unchanged_records(self.TOP_LINK, response) if manifest else None
+            if scraped_clubs is None:
+                listing.seek(0)
+                with span('parse'):
+                    scraped_clubs = list(self.iter_clubs(listing))
+                if manifest:
+                    manifest.update_source(self.TOP_LINK, response, scraped_clubs)
+
+        # With a manifest, only changed clubs are uploaded
+        Uploader(self.CLUBS_API, 'clubs').sync(scraped_clubs, self.club_key,
+                                               self.transform_club_to_db, manifest)
+
+        log(SUCCESS, 'Done! Scraped %s clubs', len(scraped_clubs))
         return pd.DataFrame(scraped_clubs).to_csv(None, index=False)
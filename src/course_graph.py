@@ -0,0 +1,271 @@
+"""
+Title: Course graph
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Course dependency graph built from CourseScraper output, with the
+transitive prerequisites of every course precomputed so prerequisite and "what does
+this unlock" queries are lookups
+"""
+
+import json
+import os
+from array import array
+
+
+# Course document field each kind of requisite edge comes from
+REQUISITE_FIELDS = {
+    'prerequisites': 'PREREQUISITE_COURSES',
+    'corequisites': 'COREQUISITE_COURSES',
+    'concurrent': 'CONCURRENT_COURSES',
+}
+
+
+def transpose(offsets, targets):
+    """
+    Reverses the edges of a graph in compressed sparse row form
+
+    returns:
+        (array, array): Offsets and targets of the reversed edges
+    """
+    n = len(offsets) - 1
+    counts = [0] * (n + 1)
+    for j in targets:
+        counts[j + 1] += 1
+    reverse_offsets = array('l', [0]) * (n + 1)
+    for i in range(n):
+        reverse_offsets[i + 1] = reverse_offsets[i] + counts[i + 1]
+    reverse_targets = array('l', [0]) * len(targets)
+    filled = reverse_offsets[:-1]
+    for i in range(n):
+        for j in targets[offsets[i]:offsets[i + 1]]:
+            reverse_targets[filled[j]] = i
+            filled[j] += 1
+    return reverse_offsets, reverse_targets
+
+
+def bits(bitset):
+    """
+    Lists the set bits of an int, lowest first, in time proportional to their number
+
+    yields:
+        int
+    """
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+class CourseGraph:
+    """
+    Courses are numbered in the order they're first seen. Edges of each kind are
+    stored in compressed sparse row form: the targets of course i are
+    targets[offsets[i]:offsets[i + 1]]. The transitive prerequisites and transitive
+    unlocks of each course are kept as int bitsets over course numbers.
+
+    Requisites joined by 'or' in the catalog are all kept as edges, so transitive
+    prerequisites are every course that may be needed, not a required set.
+    """
+
+    def __init__(self, courses, edges, ancestors=None, descendants=None):
+        """
+        args:
+            courses (list(str)): Course codes, e.g. ['CSC 357', 'CSC 202']
+            edges (dict(str: (array, array))): Offsets and targets of each kind of
+                edge in REQUISITE_FIELDS, pointing from a course to its requisites
+            ancestors (list(int)): Transitive prerequisites of each course as
+                bitsets. Computed if None
+            descendants (list(int)): Courses each course transitively unlocks as
+                bitsets. Computed if None
+        """
+        self.courses = courses
+        self.index = {course: i for i, course in enumerate(courses)}
+        self.edges = edges
+        # Courses listing each course as a prerequisite
+        self.dependents = transpose(*edges['prerequisites'])
+        if ancestors is None:
+            ancestors = self.transitive_closure()
+        self.ancestors = ancestors
+        if descendants is None:
+            descendants = [0] * len(courses)
+            for i, bitset in enumerate(ancestors):
+                for j in bits(bitset):
+                    descendants[j] |= 1 << i
+        self.descendants = descendants
+
+    @classmethod
+    def from_courses(cls, courses):
+        """
+        args:
+            courses (list(dict)): Course documents from CourseScraper. Requisites
+                that weren't scraped, e.g. MATH courses on a CSC-only scrape, are
+                still added as courses
+
+        returns:
+            CourseGraph
+        """
+        index = dict()
+
+        def number(code):
+            if code not in index:
+                index[code] = len(index)
+            return index[code]
+
+        adjacency = {kind: dict() for kind in REQUISITE_FIELDS}
+        for course in courses:
+            i = number(f"{course['DEPARTMENT']} {course['COURSE_NUM']}")
+            for kind, field in REQUISITE_FIELDS.items():
+                # Documents saved in manifests before course codes were parsed lack these fields
+                targets = [number(code) for code in course.get(field) or ()]
+                if targets:
+                    adjacency[kind].setdefault(i, []).extend(targets)
+
+        edges = dict()
+        for kind, lists in adjacency.items():
+            offsets, targets = array('l', [0]), array('l')
+            for i in range(len(index)):
+                targets.extend(lists.get(i, ()))
+                offsets.append(len(targets))
+            edges[kind] = (offsets, targets)
+        return cls(list(index), edges)
+
+    def neighbors(self, i, kind='prerequisites'):
+        offsets, targets = self.edges[kind]
+        return targets[offsets[i]:offsets[i + 1]]
+
+    def transitive_closure(self):
+        """
+        Computes the transitive prerequisites of every course. Courses are visited
+        in topological order so each bitset is built from finished ones; courses in
+        a prerequisite cycle are then iterated until their bitsets stop changing.
+
+        returns:
+            list(int): Bitset of transitive prerequisites for each course
+        """
+        n = len(self.courses)
+        offsets, targets = self.edges['prerequisites']
+        dependent_offsets, dependents = self.dependents
+        # Kahn's algorithm from courses without prerequisites upwards
+        remaining = [offsets[i + 1] - offsets[i] for i in range(n)]
+        ready = [i for i in range(n) if remaining[i] == 0]
+        ancestors = [0] * n
+        done = [False] * n
+
+        def merge(i):
+            bitset = 0
+            for j in targets[offsets[i]:offsets[i + 1]]:
+                bitset |= ancestors[j] | (1 << j)
+            return bitset
+
+        while ready:
+            i = ready.pop()
+            done[i] = True
+            ancestors[i] = merge(i)
+            for d in dependents[dependent_offsets[i]:dependent_offsets[i + 1]]:
+                remaining[d] -= 1
+                if remaining[d] == 0:
+                    ready.append(d)
+
+        cyclic = [i for i in range(n) if not done[i]]
+        changed = True
+        while changed:
+            changed = False
+            for i in cyclic:
+                bitset = merge(i)
+                if bitset != ancestors[i]:
+                    ancestors[i] = bitset
+                    changed = True
+        # A course in a cycle isn't its own prerequisite
+        for i in cyclic:
+            ancestors[i] &= ~(1 << i)
+        return ancestors
+
+    def _codes(self, numbers):
+        return [self.courses[i] for i in numbers]
+
+    def requisites(self, course, kind='prerequisites'):
+        """
+        args:
+            course (str): Course code, e.g. 'CSC 357'
+            kind (str): 'prerequisites', 'corequisites' or 'concurrent'
+
+        returns:
+            list(str): Direct requisites of the course, empty if it's unknown
+        """
+        i = self.index.get(course)
+        return [] if i is None else self._codes(self.neighbors(i, kind))
+
+    def prerequisites(self, course, transitive=True):
+        """
+        args:
+            course (str): Course code, e.g. 'CSC 357'
+            transitive (bool): Includes prerequisites of prerequisites if True
+
+        returns:
+            list(str): Prerequisites of the course, empty if it's unknown
+        """
+        if not transitive:
+            return self.requisites(course)
+        i = self.index.get(course)
+        return [] if i is None else self._codes(bits(self.ancestors[i]))
+
+    def unlocks(self, course, transitive=True):
+        """
+        args:
+            course (str): Course code, e.g. 'CSC 202'
+            transitive (bool): Includes courses unlocked by unlocked courses if True
+
+        returns:
+            list(str): Courses that list the course as a prerequisite
+        """
+        i = self.index.get(course)
+        if i is None:
+            return []
+        if transitive:
+            return self._codes(bits(self.descendants[i]))
+        offsets, targets = self.dependents
+        return self._codes(targets[offsets[i]:offsets[i + 1]])
+
+    def requires(self, course, prerequisite):
+        """
+        returns:
+            bool: True if prerequisite is a transitive prerequisite of course
+        """
+        i = self.index.get(course)
+        j = self.index.get(prerequisite)
+        return i is not None and j is not None and bool(self.ancestors[i] >> j & 1)
+
+    def to_dict(self):
+        """
+        returns:
+            dict: JSON-serializable graph. Bitsets are stored as hex strings
+        """
+        return {
+            'courses': self.courses,
+            'edges': {kind: {'offsets': offsets.tolist(), 'targets': targets.tolist()}
+                      for kind, (offsets, targets) in self.edges.items()},
+            'ancestors': [format(bitset, 'x') for bitset in self.ancestors],
+            'descendants': [format(bitset, 'x') for bitset in self.descendants],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        edges = {kind: (array('l', e['offsets']), array('l', e['targets'])) for kind, e in data['edges'].items()}
+        return cls(data['courses'], edges,
+                   [int(bitset, 16) for bitset in data['ancestors']],
+                   [int(bitset, 16) for bitset in data['descendants']])
+
+    def save(self, path):
+        """
+        Writes the graph to a JSON file
+        """
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
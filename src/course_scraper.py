@@ -8,20 +8,28 @@ Description: Scrapes course data from the Cal Poly website
 
 # Added course descriptions
 
-import json
 import requests
-from barometer import barometer, SUCCESS, ALERT, INFO, DEBUG
+from barometer import barometer, log, span, SUCCESS, ALERT, INFO, DEBUG
 import scraper_base
+from course_graph import CourseGraph
+from manifest import Manifest
+from uploader import Uploader
 import pandas as pd
-from time import sleep
+from bs4 import SoupStrainer
+from requisite_parser import parse_requisites
 import re
 
 
 class CourseScraper:
 
     def __init__(self):
-        self.REST_TIME = 100
+        self.REST_TIME = 100  # Average time between requests in ms
         self.COURSES_API = 'http://0.0.0.0:8080/new_data/courses'
+        scraper_base.set_rate_limit('catalog.calpoly.edu', 1000 / self.REST_TIME)
+        # Only course blocks are built when parsing department pages
+        self.COURSEBLOCKS = SoupStrainer("div", class_="courseblock")
+        # Dependency graph of the last scrape
+        self.graph = None
 
     @staticmethod
     def transform_course_to_db(course: dict):
@@ -33,6 +41,10 @@ class CourseScraper:
             'raw_prerequisites_text': course['PREREQUISITES'],
             'raw_concurrent_text': course['CONCURRENT'],
             'raw_recommended_text': course['RECOMMENDED'],
+            'prerequisite_courses': course['PREREQUISITE_COURSES'],
+            'corequisite_courses': course['COREQUISITE_COURSES'],
+            'concurrent_courses': course['CONCURRENT_COURSES'],
+            'recommended_courses': course['RECOMMENDED_COURSES'],
             'terms_offered': course['TERMS_TYPICALLY_OFFERED'],
             'ge_areas': course['GE_AREAS'],
             'desc': course['COURSE_DESC']
@@ -40,30 +52,114 @@ class CourseScraper:
 
         return db_course
 
+    @staticmethod
+    def course_key(course: dict):
+        return f"{course['DEPARTMENT']} {course['COURSE_NUM']}"
+
+    def parse_department(self, dep_name, dep_soup):
+        """
+        Parses every course on a department's catalog page
+
+        args:
+            dep_name (str): Department code, e.g. 'CSC'
+            dep_soup (BeautifulSoup): Parsed department page. May be parsed with
+                parse_only=COURSEBLOCKS to build only the course blocks
+
+        returns:
+            list(dict): One document per course
+        """
+        courses = dep_soup.find_all("div", class_="courseblock")
+        log(DEBUG, "Found %s courses", len(courses))
+        return [self.parse_courseblock(dep_name, course) for course in courses]
+
+    def parse_courseblock(self, dep_name, course):
+        """
+        Parses a single course block, visiting its paragraphs and divs once
+
+        args:
+            dep_name (str): Department code, e.g. 'CSC'
+            course (bs4.Tag): A <div class="courseblock"> element
+
+        returns:
+            dict: The course document
+        """
+        title = None
+        extended = None
+        paragraphs = []
+        for tag in course.find_all(('p', 'div')):
+            classes = tag.get('class') or ()
+            if tag.name == 'p':
+                paragraphs.append(tag)
+                if title is None and 'courseblocktitle' in classes:
+                    title = tag
+            elif extended is None and 'courseextendedwrap' in classes:
+                extended = tag
+
+        full_course_name, course_units = title.get_text().splitlines()
+        full_course_name_split = full_course_name.split('. ', 1)
+        course_num = full_course_name_split[0].split('\xa0')[1]
+        course_name = full_course_name_split[1]
+        log(DEBUG, "Found %s", course_name)
+        course_units = course_units.split(' ', 1)[0]
+        if len(paragraphs) == 5:
+            ge_areas = re.findall(r'Area (\w+)', paragraphs[1].text)
+        else:
+            ge_areas = None
+        course_desc = paragraphs[-1].text
+
+        requisites = parse_requisites(extended.get_text())
+        na = (lambda x: 'NA' if x is None else x)
+        ge_areas = ', '.join(ge_areas) if ge_areas else 'NA'
+
+        document = {
+            "DEPARTMENT": dep_name,
+            "COURSE_NUM": course_num,
+            "COURSE_NAME": course_name,
+            "UNITS": course_units,
+            "PREREQUISITES": na(requisites['prerequisites']),
+            "COREQUISITES": na(requisites['corequisites']),
+            "CONCURRENT": na(requisites['concurrent']),
+            "RECOMMENDED": na(requisites['recommended']),
+            "TERMS_TYPICALLY_OFFERED": requisites['terms'] or ['NA'],
+            "GE_AREAS": ge_areas,
+            "COURSE_DESC": course_desc,
+            "PREREQUISITE_COURSES": requisites['prerequisites_courses'],
+            "COREQUISITE_COURSES": requisites['corequisites_courses'],
+            "CONCURRENT_COURSES": requisites['concurrent_courses'],
+            "RECOMMENDED_COURSES": requisites['recommended_courses'],
+        }
+
+        return document
+
     @barometer
-    def scrape(self, all_departments=False):
+    def scrape(self, all_departments=False, manifest=None, graph=None):
         """
         Scrapes course information and requirements to CSV
 
         args:
             all_departments (bool): Scrapes all departments if True, or just CPE
             and CSC if False (default False)
+            manifest (str): Path of a manifest file from previous runs. If given,
+                unchanged department pages aren't parsed again and only inserted,
+                updated and deleted courses are uploaded
+            graph (str): Path to save the course dependency graph to, if any. The
+                graph of the last scrape is also kept in self.graph
 
         returns:
             str: A CSV string of scraped data
         """
         # Retrieves department list from Cal Poly
-        print(DEBUG, f"Starting course scrape: all_departments={all_departments}, REST_TIME={self.REST_TIME}")
-        print(INFO, "Starting course scrape")
+        log(DEBUG, "Starting course scrape: all_departments=%s, REST_TIME=%s", all_departments, self.REST_TIME)
+        log(INFO, "Starting course scrape")
         if all_departments:
             top_link = "http://catalog.calpoly.edu/coursesaz/"
-            print(INFO, f"Starting scrape on {top_link}")
+            log(INFO, "Starting scrape on %s", top_link)
             try:
                 top_soup = scraper_base.get_soup(top_link, ver=False)
             except requests.exceptions.RequestException as e:
-                print(ALERT, e)
+                log(ALERT, "%s", e)
                 return None
-            print(SUCCESS, "Retrieved top-level courses page")
+            log(SUCCESS, "Retrieved top-level courses page")
             # Changed scraping method because source for visible links changed, but
             # old links are still in the source and cause some 404 errors
             departments_az = top_soup.find('table')
@@ -71,134 +167,49 @@ class CourseScraper:
                                for department in departments_az.find_all('a')
                                if department.get('href')]
             if not department_urls:
-                print(ALERT, "Couldn't find departments list. Aborting scrape.")
+                log(ALERT, "Couldn't find departments list. Aborting scrape.")
                 return None
-            print(INFO, f"Found URLs for {len(department_urls)} departments")
+            log(INFO, "Found URLs for %s departments", len(department_urls))
         else:
-            print(INFO, "Just scraping CSC and CPE courses")
+            log(INFO, "Just scraping CSC and CPE courses")
             department_urls = ['/coursesaz/csc/', '/coursesaz/cpe/']
 
-        scraped_courses = []
-
-        # Retrieves course info for each department
-        for department in department_urls:
-            # Extracts the department name from the URL
-            dep_name = (department.rsplit('/', 2)[1]).upper()
-            # Gets raw list of courses and info for department
-            dep_link = 'http://catalog.calpoly.edu' + department
+        dep_links = {'http://catalog.calpoly.edu' + department: (department.rsplit('/', 2)[1]).upper()
+                     for department in department_urls}
+        courses_by_link = dict()
+        manifest = Manifest(manifest) if manifest else None
+
+        # Retrieves course info for each department. Pages are parsed in the order they arrive,
+        # but courses are kept in department order.
+        try:
+            for dep_link, response in scraper_base.fetch_many(dep_links, parse=lambda r: r):
+                dep_name = dep_links[dep_link]
+                log(SUCCESS, "Retrieved %s courses from %s", dep_name, dep_link)
+                courses = manifest.unchanged_records(dep_link, response) if manifest else None
+                if courses is None:
+                    with span('parse'):
+                        dep_soup = scraper_base.parse_soup(response, parse_only=self.COURSEBLOCKS)
+                        courses = self.parse_department(dep_name, dep_soup)
+                    if manifest:
+                        manifest.update_source(dep_link, response, courses)
+                courses_by_link[dep_link] = courses
+        except requests.exceptions.RequestException as e:
+            log(ALERT, "%s", e)
+            return None
+        scraped_courses = [course for dep_link in dep_links for course in courses_by_link[dep_link]]
+
+        log(SUCCESS, "Done! Scraped %s courses", len(scraped_courses))
+
+        self.graph = CourseGraph.from_courses(scraped_courses)
+        log(DEBUG, "Built dependency graph of %s courses", len(self.graph.courses))
+        if graph:
             try:
-                dep_soup = scraper_base.get_soup(dep_link)
-                sleep(self.REST_TIME / 1000)
-            except requests.exceptions.RequestException as e:
-                print(ALERT, e)
-                return None
-            print(SUCCESS, f"Retrieved {dep_name} courses from {dep_link}")
-            courses = dep_soup.findAll("div", {"class": "courseblock"})
-            print(DEBUG, f"Found {len(courses)} courses")
-            for course in courses:
-                course_name_and_units = (course.find ("p", {"class": "courseblocktitle"})).get_text()
-                full_course_name, course_units = course_name_and_units.splitlines()
-                full_course_name_split = full_course_name.split('. ', 1)
-                course_num = full_course_name_split[0].split('\xa0')[1]
-                course_name = full_course_name_split[1]
-                print(DEBUG, f"Found {course_name}")
-                course_units = course_units.split(' ', 1)[0]
-                paragraphs = course.findAll('p')
-                if len(paragraphs) == 5:
-                    ge_areas = re.findall(r'Area (\w+)', paragraphs[1].text)
-                else:
-                    ge_areas = None
-                course_desc = paragraphs[-1].text
-                course_terms_and_reqs = (course.find("div", {"class": "noindent courseextendedwrap"})).get_text()
-
-                section = None
-                course_prereqs, course_coreqs, course_conc, course_rec, course_terms = [], [], [], [], []
-                for word in course_terms_and_reqs.split():
-                    if word.endswith(':'):
-                        if word == 'Offered:':
-                            section = 'terms'
-                        # Last term (F,W,SP, etc) will be appended to the front of "Prerequisite:" or whatever category
-                        # comes immediately after terms offered, so "str.endswith(blah)" has to be done instead
-                        # of "str == blah"
-                        elif word.endswith('Prerequisite:'):
-                            try:
-                                course_terms.append((word.split('Pre'))[0])
-                                print(DEBUG, "Found prerequisites")
-                            except IndexError:
-                                pass
-                            section = 'prereq'
-                        elif word.endswith('Corequisite:'):
-                            try:
-                                course_terms.append((word.split('Cor'))[0])
-                                print(DEBUG, "Found corequisites")
-                            except IndexError:
-                                pass
-                            section = 'coreq'
-                        elif word.endswith('Concurrent:'):
-                            try:
-                                course_terms.append((word.split('Con'))[0])
-                                print(DEBUG, "Found concurrent courses")
-                            except IndexError:
-                                pass
-                            section = 'conc'
-                        elif word.endswith('Recommended:'):
-                            try:
-                                course_terms.append((word.split('Rec'))[0])
-                                print(DEBUG, "Found recommended courses")
-                            except IndexError:
-                                pass
-                            section = 'rec'
-                        else:
-                            pass
-
-                    else:
-                        if section == 'prereq':
-                            course_prereqs.append(word)
-                        elif section == 'coreq':
-                            course_coreqs.append(word)
-                        elif section == 'conc':
-                            course_conc.append(word)
-                        elif section == 'rec':
-                            course_rec.append(word)
-                        elif section == 'terms':
-                            course_terms.append(word)
-                        else:
-                            pass
-
-                maybe_join = (lambda x, j: j.join(x) if x else 'NA')
-                course_prereqs = maybe_join(course_prereqs, ' ')
-                course_coreqs = maybe_join(course_coreqs, ' ')
-                course_conc = maybe_join(course_conc, ' ')
-                course_rec = maybe_join(course_rec, ' ')
-                course_terms = maybe_join(course_terms, ', ')
-                ge_areas = maybe_join(ge_areas, ', ')
-
-                course_terms = [term for term in course_terms.split(',')
-                                if len(term) > 0]
-
-                document = {
-                    "DEPARTMENT": dep_name,
-                    "COURSE_NUM": course_num,
-                    "COURSE_NAME": course_name,
-                    "UNITS": course_units,
-                    "PREREQUISITES": course_prereqs,
-                    "COREQUISITES": course_coreqs,
-                    "CONCURRENT": course_conc,
-                    "RECOMMENDED": course_rec,
-                    "TERMS_TYPICALLY_OFFERED": course_terms,
-                    "GE_AREAS": ge_areas,
-                    "COURSE_DESC": course_desc
-                }
-
-                scraped_courses.append(document)
-
-        print(SUCCESS, f"Done! Scraped {len(scraped_courses)} courses")
-
-        courses_request = json.dumps({
-            'courses': [self.transform_course_to_db(course)
-                        for course in scraped_courses]
-        })
-        requests.post(url=self.COURSES_API,
-                      json=courses_request)
+                self.graph.save(graph)
+            except OSError as e:
+                log(ALERT, "Failed to save course graph: %s", e)
+
+        # With a manifest, only changed courses are uploaded
+        Uploader(self.COURSES_API, 'courses').sync(scraped_courses, self.course_key,
+                                                   self.transform_course_to_db, manifest)
 
         return pd.DataFrame(scraped_courses).to_csv(None, index=False)
@@ -7,33 +7,49 @@ Description: Scrapes faculty data from the Cal Poly website. Mostly redundant be
 of schedules_scraper.py. Only unique information scraped is research interests.
 """
 
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+from urllib.parse import urlsplit
+
 import scraper_base
-from time import sleep
+import requests
+from bs4 import BeautifulSoup
+from barometer import capture, log, max_level, replay, span, SUCCESS, ALERT, INFO, DEBUG, NOTICE, WARNING
 import pandas as pd
 
 
 class FacultyScraper:
 
     def __init__(self):
-        self.REST_TIME = 100  # Time between requests in ms
-        self.CSC_TOP_LINK = "https://csc.calpoly.edu/faculty/"
-        self.CPE_TOP_LINK = "https://cpe.calpoly.edu/faculty/"
+        self.REST_TIME = 100  # Average time between requests in ms
+        # Department sites scraped by default. Each lists its employees at /faculty/
+        self.DEPARTMENTS = {
+            'CSC': 'https://csc.calpoly.edu',
+            'CPE': 'https://cpe.calpoly.edu',
+        }
+        # Fewest employee pages parsed in worker processes when workers isn't given.
+        # A page parses in a few milliseconds, so below this starting the workers
+        # takes longer than parsing in this process
+        self.PARALLEL_PARSE_MIN = 1000
 
-    def parse_single_employee(self, url):
+    def parse_single_employee(self, url, soup=None):
         """
         Scrapes data from a single Cal Poly employee.
 
         args:
             url (str)
+            soup (BeautifulSoup): Already fetched page for url. Fetched if None
 
         returns:
             dict(str:str)
         """
 
         # Due to certificate issues with CSC employee pages, verification
-        # is turned off for requests in the scraper module. This leads to
-        # lots of warning during runtime but unaffected data.
-        soup = scraper_base.get_soup(url, ver=False)
+        # is turned off for requests in the scraper module. scraper_base logs
+        # this once per host instead of warning on every request.
+        if soup is None:
+            soup = scraper_base.get_soup(url, ver=False)
         name = soup.find("h1").text
         office = 'NA'
         email = 'NA'
@@ -117,35 +133,181 @@ class FacultyScraper:
 
         return faculty_info
 
+    def listing_url(self, site):
+        """
+        returns:
+            str: URL of a department site's faculty and staff listing
+        """
+        return site.rstrip("/") + "/faculty/"
 
-    def scrape(self):
+    def employee_links(self, site, soup):
         """
-        Scrapes data from all CPE and CSC employees
+        Finds the employee pages linked from a department's listing
 
         args:
-        no_upload (Bool): Used by scraper.py to control uploading vs just returning
-            scraped data
+            site (str): Department site, e.g. 'https://csc.calpoly.edu'
+            soup (BeautifulSoup): The site's listing
 
         returns:
-            str: A CSV string of scraped data
+            list(str): URLs of the employee pages, in listing order
         """
-        scraped_faculty = []
-
-        # Verification turned off; read main note in self.parse_single_employee
-        soup = scraper_base.get_soup(self.CSC_TOP_LINK, ver=False)
+        links = []
         for link in soup.find_all("a", href=True):
             nav = link["href"]
             if (nav.startswith("/faculty/") or nav.startswith("/staff")) and (nav != "/faculty/" and nav != "/staff/"):
-                info = self.parse_single_employee("https://csc.calpoly.edu" + nav)
-                scraped_faculty.append(info)
-                sleep(self.REST_TIME / 1000)
+                links.append(site.rstrip("/") + nav)
+        return links
 
-        soup = scraper_base.get_soup(self.CPE_TOP_LINK)
-        for link in soup.find_all("a", href=True):
-            nav = link["href"]
-            if (nav.startswith("/faculty/") or nav.startswith("/staff")) and (nav != "/faculty/" and nav != "/staff/"):
-                info = self.parse_single_employee("https://cpe.calpoly.edu" + nav)
-                scraped_faculty.append(info)
-                sleep(self.REST_TIME / 1000)
+    @staticmethod
+    def username(url):
+        """
+        returns:
+            str: Campus username an employee page is named after, e.g. 'jdoe' for
+                https://csc.calpoly.edu/faculty/jdoe/. The same across departments
+        """
+        return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1].lower()
+
+    def employee_urls(self, departments):
+        """
+        Fetches the department listings concurrently and collects their employee
+        pages, dropping pages already listed by an earlier department
+
+        args:
+            departments (dict(str:str)): Department name to site
 
+        returns:
+            list(str): Employee page URLs in listing order, or None if a listing
+                couldn't be fetched for a reason other than not existing
+        """
+        listings = {self.listing_url(site): name for name, site in departments.items()}
+        sites = {self.listing_url(site): site for site in departments.values()}
+        soups = dict()
+        # Verification turned off; read main note in self.parse_single_employee
+        for url, soup in scraper_base.fetch_many(listings, ver=False, return_exceptions=True):
+            if isinstance(soup, requests.exceptions.HTTPError):
+                log(NOTICE, "No faculty listing for %s at %s: %s", listings[url], url, soup)
+                continue
+            elif isinstance(soup, Exception):
+                log(ALERT, "%s", soup)
+                return None
+            log(SUCCESS, "Retrieved %s faculty listing", listings[url])
+            soups[url] = soup
+
+        urls = []
+        seen = set()
+        for url in listings:
+            if url not in soups:
+                continue
+            # Different people may share a displayed name, so only URLs and
+            # usernames identify someone
+            for employee_url in self.employee_links(sites[url], soups[url]):
+                username = self.username(employee_url)
+                if employee_url in seen or username in seen:
+                    log(DEBUG, "Skipping %s, already listed", employee_url)
+                    continue
+                seen.update((employee_url, username))
+                urls.append(employee_url)
+        return urls
+
+    def scrape(self, departments=None, workers=None):
+        """
+        Scrapes data from the employees of every department. Listings are fetched
+        concurrently and employees listed by several departments are fetched once;
+        their pages are then fetched concurrently and, for large crawls, parsed in
+        worker processes
+
+        args:
+            departments (dict(str:str)): Department name to site, e.g.
+                {'EE': 'https://ee.calpoly.edu'}. Uses self.DEPARTMENTS if None
+            workers (int): Number of processes parsing employee pages. If None,
+                uses one per CPU when there are several CPUs and at least
+                PARALLEL_PARSE_MIN pages, and parses in this process otherwise.
+                Parses in this process if 1
+
+        returns:
+            str: A CSV string of scraped data
+        """
+        departments = departments or self.DEPARTMENTS
+        for site in departments.values():
+            scraper_base.set_rate_limit(site, 1000 / self.REST_TIME)
+        log(INFO, "Starting faculty scrape of %s", ", ".join(departments))
+
+        employee_urls = self.employee_urls(departments)
+        if employee_urls is None:
+            return None
+        log(INFO, "Found %s employees", len(employee_urls))
+
+        # Pages are parsed as they arrive and kept in listing order. Workers are
+        # spawned rather than forked and their messages are logged here, as in
+        # schedules_scraper
+        if workers is None:
+            parallel = (os.cpu_count() or 1) > 1 and len(employee_urls) >= self.PARALLEL_PARSE_MIN
+        else:
+            parallel = workers > 1
+        executor = None
+        if parallel:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            # Workers get the page's bytes; otherwise soups are built in the fetching threads
+            kwargs = {'parse': lambda r: r.content}
+        else:
+            kwargs = dict()
+        parsed = dict()
+        try:
+            for url, page in scraper_base.fetch_many(dict.fromkeys(employee_urls), ver=False,
+                                                     return_exceptions=True, **kwargs):
+                if isinstance(page, requests.exceptions.HTTPError):
+                    log(NOTICE, "Skipping %s: %s", url, page)
+                    continue
+                elif isinstance(page, Exception):
+                    log(ALERT, "%s", page)
+                    return None
+                if executor:
+                    parsed[url] = executor.submit(capture, max_level(), parse_employee_page, url, page)
+                else:
+                    with span('parse'):
+                        parsed[url] = parse_employee_page(url, page)
+            if executor:
+                # Worker processes don't report metrics, so only the wait for them is timed
+                for url, future in parsed.items():
+                    with span('parse_wait'):
+                        parsed[url], records = future.result()
+                    replay(records)
+        finally:
+            if executor:
+                executor.shutdown()
+        results = [parsed[url] for url in employee_urls if url in parsed]
+
+        # People whose pages differ in URL only across departments are kept once
+        scraped_faculty = []
+        names = set()
+        for info in results:
+            if info is None or (info["NAME"], info["EMAIL"]) in names:
+                continue
+            names.add((info["NAME"], info["EMAIL"]))
+            scraped_faculty.append(info)
+        if not scraped_faculty:
+            log(ALERT, "Didn't scrape any employees.")
+            return None
+        log(SUCCESS, "Done! Scraped %s employees", len(scraped_faculty))
         return pd.DataFrame(scraped_faculty).to_csv(None, index=False)
+
+
+def parse_employee_page(url, page):
+    """
+    Parses one employee page. Module-level so it can run in worker processes.
+
+    args:
+        url (str)
+        page (bytes or BeautifulSoup): HTML of the page, or the page already parsed
+
+    returns:
+        dict(str:str): See FacultyScraper.parse_single_employee, or None if the
+            page isn't laid out like an employee page
+    """
+    if not isinstance(page, BeautifulSoup):
+        page = BeautifulSoup(page, "lxml")
+    try:
+        return FacultyScraper().parse_single_employee(url, page)
+    except (AttributeError, IndexError) as e:
+        log(WARNING, "Couldn't parse %s: %s", url, e)
+        return None
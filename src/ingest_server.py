@@ -0,0 +1,137 @@
+"""
+Title: Ingestion stand-in server
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Local stand-in for the new_data ingestion API. Accepts the uploads sent
+by uploader.Uploader (chunked, optionally gzipped) and keeps them in memory so
+uploads can be checked without the real backend.
+"""
+
+import gzip
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+
+    def read_body(self):
+        """
+        returns:
+            bytes: The request body, decoding chunked transfer encoding and gzip
+        """
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers up to the final empty line
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = b''.join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def respond(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        collection = self.path.rstrip('/').rsplit('/', 1)[-1]
+        body = self.read_body()
+        with server.lock:
+            server.requests += 1
+            if server.failures > 0:
+                server.failures -= 1
+                headers = None if server.retry_after is None else {'Retry-After': str(server.retry_after)}
+                self.respond(server.failure_status, {'error': 'simulated failure'}, headers)
+                return
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            self.respond(400, {'error': str(e)})
+            return
+        if not isinstance(payload, dict) or collection not in payload:
+            self.respond(400, {'error': f'expected an object with a "{collection}" key'})
+            return
+        with server.lock:
+            server.received.setdefault(collection, []).extend(payload[collection])
+            server.deleted.setdefault(collection, []).extend(payload.get('deleted', []))
+        self.respond(200, {'received': len(payload[collection])})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class IngestServer(ThreadingHTTPServer):
+    """
+    In-memory ingestion API. Records posted to /new_data/<collection> are kept
+    in received[collection] and deleted keys in deleted[collection].
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, failures=0, verbose=False, failure_status=503,
+                 retry_after=None):
+        """
+        args:
+            host (str)
+            port (int): Port to listen on. Picks a free port if 0
+            failures (int): Number of requests answered with failure_status
+                before accepting uploads, to exercise retries
+            verbose (bool): Logs every request to stderr if True
+            failure_status (int): Status of the failed requests
+            retry_after (num): Retry-After header sent with failed requests, if any
+        """
+        super().__init__((host, port), IngestHandler)
+        self.lock = threading.Lock()
+        self.received = dict()
+        self.deleted = dict()
+        self.requests = 0
+        self.failures = failures
+        self.failure_status = failure_status
+        self.retry_after = retry_after
+        self.verbose = verbose
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/new_data'
+
+    def start(self):
+        """
+        Serves requests on a daemon thread
+
+        returns:
+            IngestServer: self
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    server = IngestServer('0.0.0.0', port, verbose=True)
+    print(f'Listening on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -5,13 +5,25 @@ Date: 2/3/2020
 Organization: Cal Poly CSAI
 Description: Downloads Cal Poly map data in .kmz format and converts it to CSV
 """
-import json
 
 import requests
+import scraper_base
+from campus_index import CampusIndex, placemark_kind, to_location, POINT, LINE, SHAPE
+from manifest import Manifest
+from uploader import Uploader
 from zipfile import ZipFile
 from io import BytesIO
+import tempfile
 import xml.sax.handler
-from barometer import barometer, SUCCESS, ALERT, INFO, DEBUG, ERR
+from barometer import barometer, log, span, SUCCESS, ALERT, DEBUG, ERR
+
+
+# Downloads larger than this many bytes are spooled to disk
+SPOOL_SIZE = 2 ** 20
+# Bytes of .kml fed to the parser at a time
+CHUNK_SIZE = 64 * 1024
+# Element key of the coordinates of a shape's holes, see PlacemarkHandler
+INNER_COORDINATES = 'innerBoundaryIs coordinates'
 
 
 class LocationScraper:
@@ -19,6 +31,8 @@ class LocationScraper:
     def __init__(self):
         self.LOCATIONS_API = 'http://0.0.0.0:8080/new_data/locations'
         self.TOP_LINK = 'https://afd.calpoly.edu/facilities/campus-maps/docs/Cal_Poly_Buildings.kmz'
+        # Spatial index of the last scrape
+        self.index = None
 
     @staticmethod
     def transform_location_to_db(location: str):
@@ -32,85 +46,181 @@ class LocationScraper:
 
         return db_location
 
-    @barometer
-    def scrape(self):
+    @staticmethod
+    def location_key(location: dict):
+        return f"{location['building_number']} {location['name']}"
+
+    @staticmethod
+    def placemark_record(key, elements):
         """
-        Downloads and parses a .kmz file from Cal Poly containing location data
+        args:
+            key (str): Placemark name
+            elements (dict(str:str)): Element texts of the placemark
 
         returns:
-            str: A CSV string of parsed data
+            dict(str:str): The placemark's name, kind and coordinates of its
+                outer boundary without the last height, which is all its CSV row and index entry need. Stored
+                in manifests so unchanged maps aren't parsed again
         """
-        print(DEBUG, f"Starting location data scrape: TOP_LINK={self.TOP_LINK}")
-        try:
-            page = requests.get(self.TOP_LINK)
-        except requests.exceptions.RequestException as e:
-            print(ALERT, e)
+        return {'key': key, 'kind': placemark_kind(elements),
+                # Removes unused height coordinate
+                'coordinates': elements.get('coordinates', '').rsplit(',', 1)[0]}
+
+    @staticmethod
+    def placemark_records(records):
+        """
+        returns:
+            list(dict): records, or None if they were stored by a run before
+                manifests kept whole placemarks and the map needs parsing again
+        """
+        if records and 'kind' not in records[0]:
             return None
-        print(SUCCESS, f"Retrieved location data from {self.TOP_LINK}")
+        return records
+
+    @barometer
+    def scrape(self, manifest=None):
+        """
+        Downloads and parses a .kmz file from Cal Poly containing location data.
+        The download is spooled to a temporary file and the .kml inside it is
+        parsed as it's decompressed, so memory use doesn't grow with the map.
+        A spatial index of the locations is kept in self.index.
 
-        # I don't know the ways the rest of this can fail, so no useful log messages here
+        args:
+            manifest (str): Path of a manifest file from previous runs. If given,
+                an unchanged .kmz file isn't parsed again and only inserted, updated
+                and deleted locations are uploaded
 
-        # Extract contents of .kmz file
-        archive = ZipFile(BytesIO(page.content), 'r')
+        returns:
+            str: A CSV string of parsed data
+        """
+        log(DEBUG, "Starting location data scrape: TOP_LINK=%s", self.TOP_LINK)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as kmz:
+            try:
+                page = scraper_base.download(self.TOP_LINK, kmz)
+            except requests.exceptions.RequestException as e:
+                log(ALERT, "%s", e)
+                return None
+            log(SUCCESS, "Retrieved location data from %s", self.TOP_LINK)
+
+            manifest = Manifest(manifest) if manifest else None
+            placemarks = self.placemark_records(manifest.unchanged_records(self.TOP_LINK, page)) if manifest else None
+            if placemarks is None:
+                kmz.seek(0)
+                with span('parse'):
+                    placemarks = self.read_kmz(kmz)
+                if manifest:
+                    manifest.update_source(self.TOP_LINK, page, placemarks)
+
+        # An unchanged map's table and index are rebuilt from its stored placemarks
+        # without parsing it again
+        output = self.build_table(placemarks)
+        locations = [self.transform_location_to_db(location) for location in output.split('\n')[1:-1]]
+        with span('index'):
+            self.index = CampusIndex([self.to_location(record) for record in placemarks])
+
+        # With a manifest, only changed locations are uploaded
+        Uploader(self.LOCATIONS_API, 'locations').sync(locations, self.location_key, manifest=manifest)
 
+        return output
+
+    @staticmethod
+    def open_kml(archive):
+        """
+        returns:
+            file: doc.kml of a .kmz archive, or None if it's missing
+        """
         try:
             kml = archive.open('doc.kml', 'r')
         except KeyError as e:
-            print(ERR, f"Item not found: {e}")
-        else:
-            print(SUCCESS, "Found doc.kml")
+            log(ERR, "Item not found: %s", e)
+            return None
+        log(SUCCESS, "Found doc.kml")
+        return kml
 
-        # .kmz files holds a .kml file that just contains styled XML
-        try:
-            parser = xml.sax.make_parser()
-        except Exception as e:
-            print(ERR, f"Failed to create parser: {e}")
-        else:
-            print(SUCCESS, "Created parser")
-        try:
-            handler = PlacemarkHandler()
-        except Exception as e:
-            print(ERR, f"Failed to create handler: {e}")
-        else:
-            print(SUCCESS, "Created handler")
+    def build_index(self, kmz):
+        """
+        args:
+            kmz (bytes or file): The .kmz file, or a binary file holding it
 
-        parser.setContentHandler(handler)
+        returns:
+            CampusIndex: Index of the file's placemarks
+        """
+        if isinstance(kmz, bytes):
+            kmz = BytesIO(kmz)
+        with ZipFile(kmz, 'r') as archive:
+            kml = self.open_kml(archive)
+            if kml is None:
+                return CampusIndex([])
+            with kml:
+                return CampusIndex.from_placemarks(iter_placemarks(kml))
+
+    def read_kmz(self, kmz):
+        """
+        Parses the placemarks of a .kmz file
 
-        try:
-            parser.parse(kml)
-        except Exception as e:
-            print(ERR, f"Failed to parse .kml file: {e}")
-        archive.close()
+        args:
+            kmz (bytes or file): The .kmz file, or a binary file holding it
 
-        output = self.build_table(handler.mapping)
+        returns:
+            list(dict): See placemark_record. A placemark replaces earlier ones with
+                the same name
+        """
+        if isinstance(kmz, bytes):
+            kmz = BytesIO(kmz)
+
+        # .kmz files hold a .kml file that just contains styled XML
+        with ZipFile(kmz, 'r') as archive:
+            kml = self.open_kml(archive)
+            if kml is None:
+                return []
+            with kml:
+                # Only the record of each placemark is kept, not its elements
+                records = dict()
+                for key, elements in iter_placemarks(kml):
+                    records[key] = self.placemark_record(key, elements)
+        return list(records.values())
+
+    def parse_kmz(self, kmz):
+        """
+        Parses the placemarks of a .kmz file, keeping a spatial index of them in
+        self.index
 
-        locations_request = json.dumps({
-            'locations': [self.transform_location_to_db(location)
-                          for location in output.split('\n')[1:-1]]
-        })
-        requests.post(url=self.LOCATIONS_API,
-                      json=locations_request)
+        args:
+            kmz (bytes or file): The .kmz file, or a binary file holding it
 
-        return output
+        returns:
+            str: A CSV string of parsed data
+        """
+        placemarks = self.read_kmz(kmz)
+        self.index = CampusIndex([self.to_location(record) for record in placemarks])
+        return self.build_table(placemarks)
 
     @staticmethod
-    def build_table(mapping):
+    def to_location(record):
+        """
+        returns:
+            campus_index.Location: Index entry of a placemark record
         """
-        Creates a CSV string from a dict containing .kmz data
+        return to_location(record['key'], {'coordinates': record['coordinates']}, record['kind'])
+
+    @staticmethod
+    def build_table(placemarks):
+        """
+        Creates a CSV string from placemark records. Points come first, then lines,
+        then shapes.
 
         args:
-            mapping (dict(str:str)): A dict whose keys are building names and keys are coordinates
+            placemarks (list(dict)): See placemark_record
 
         returns:
             str: A CSV string of parsed data
         """
         sep = ','
 
-        output = f'BUILDING_NUMBER{sep}NAME{sep}LONGITUDE{sep}LATITUDE\n'
-        points = ''
-        lines = ''
-        shapes = ''
-        for key in mapping:
+        # Points, then lines, then shapes
+        tables = {POINT: [], LINE: [], SHAPE: []}
+        for record in placemarks:
+            key = record['key']
 
             # Separates building numbers and names
             try:
@@ -118,35 +228,60 @@ class LocationScraper:
             except ValueError:
                 building_number = key
                 name = 'NA'
-            coord_str = mapping[key]['coordinates'] + sep
-
-            # Removes unused height coordinate
-            coord_str = coord_str[0:-1].rsplit(',',1)[0]
 
-            stem = f'{building_number}{sep}{name}{sep}{coord_str}\n'
-            if 'LookAt' in mapping[key]: #points
-                points += stem
-            elif 'LineString' in mapping[key]: #lines
-                lines += stem
-            else: #shapes
-                shapes += stem
-        output += f'{points}{lines}{shapes}'
+            tables[record['kind']].append(f"{building_number}{sep}{name}{sep}{record['coordinates']}\n")
+        output = f'BUILDING_NUMBER{sep}NAME{sep}LONGITUDE{sep}LATITUDE\n' + ''.join(
+            row for table in tables.values() for row in table)
 
-        print(SUCCESS, f"Done! Scraped {len(output.splitlines())} locations")
+        log(SUCCESS, "Done! Scraped %s locations", len(placemarks))
         return output
 
 
+def iter_placemarks(kml, chunk_size=CHUNK_SIZE):
+    """
+    Parses placemarks from a .kml file as it's read, so only the placemark being
+    parsed is held in memory. Logs parse errors and stops at them.
+
+    args:
+        kml (file): Binary .kml file
+        chunk_size (int): Bytes fed to the parser at a time
+
+    yields:
+        (str, dict(str:str)): A placemark's name and the text of each element in
+            it, keyed by element name
+    """
+    parser = xml.sax.make_parser()
+    handler = PlacemarkHandler()
+    parser.setContentHandler(handler)
+    try:
+        for chunk in iter(lambda: kml.read(chunk_size), b''):
+            parser.feed(chunk)
+            yield from handler.placemarks
+            handler.placemarks.clear()
+        parser.close()
+    except Exception as e:
+        log(ERR, "Failed to parse .kml file: %s", e)
+    yield from handler.placemarks
+    handler.placemarks.clear()
+
+
 class PlacemarkHandler(xml.sax.handler.ContentHandler):
     """
-    Simple API for XML (SAX) handler for parsing the XML contained in .kml files
+    Simple API for XML (SAX) handler for parsing the XML contained in .kml files.
+    Finished placemarks collect in placemarks until the caller takes them.
+
+    The coordinates of a shape's holes are kept under INNER_COORDINATES instead of
+    coordinates, so coordinates only holds the outer boundary.
     """
 
     def __init__(self):
         self.inName = False
         self.inPlacemark = False
-        self.mapping = {}
-        self.buffer = ""
+        self.placemarks = []
+        self.elements = {}
+        self.buffer = []
         self.name_tag = ""
+        self.inner_depth = 0  # Number of open <innerBoundaryIs> elements
 
     def startElement(self, name, attributes):
         """
@@ -157,10 +292,14 @@ class PlacemarkHandler(xml.sax.handler.ContentHandler):
         """
         if name == "Placemark": # on start Placemark tag
             self.inPlacemark = True
-            self.buffer = ""
+            self.buffer = []
+            self.elements = {}
+            self.inner_depth = 0
         if self.inPlacemark:
             if name == "name": # on start title tag
                 self.inName = True # save name text to follow
+            elif name == "innerBoundaryIs":
+                self.inner_depth += 1
 
     def characters(self, data):
         """
@@ -170,7 +309,7 @@ class PlacemarkHandler(xml.sax.handler.ContentHandler):
             data (str): Text between elements
         """
         if self.inPlacemark: # on text within tag
-            self.buffer += data # save text if in title
+            self.buffer.append(data) # joined once the element ends
 
     def endElement(self, name):
         """
@@ -179,19 +318,25 @@ class PlacemarkHandler(xml.sax.handler.ContentHandler):
         args:
             name (str): Element name to be parsed
         """
-        self.buffer = self.buffer.strip('\n\t')
+        text = ''.join(self.buffer).strip('\n\t')
+        self.buffer = []
 
         if name == "Placemark":
             self.inPlacemark = False
+            if self.name_tag:
+                self.placemarks.append(
+                    (self.name_tag, {key: ' '.join(texts) for key, texts in self.elements.items()}))
+            self.elements = {}
             self.name_tag = "" #clear current name
 
         elif name == "name" and self.inPlacemark:
             self.inName = False # on end title tag
-            self.name_tag = self.buffer.strip()
-            self.mapping[self.name_tag] = {}
+            self.name_tag = text.strip()
         elif self.inPlacemark:
-            if name in self.mapping[self.name_tag]:
-                self.mapping[self.name_tag][name] += self.buffer
-            else:
-                self.mapping[self.name_tag][name] = self.buffer
-        self.buffer = ""
+            if name == "innerBoundaryIs":
+                self.inner_depth -= 1
+            elif name == "coordinates" and self.inner_depth:
+                name = INNER_COORDINATES
+            # Repeated elements, like the rings of a shape, are joined with spaces
+            # so the last number of one doesn't run into the first of the next
+            self.elements.setdefault(name, []).append(text)
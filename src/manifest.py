@@ -0,0 +1,190 @@
+"""
+Title: Scrape manifest
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Remembers content hashes of scraped pages and records between runs so
+scrapers can skip parsing unchanged pages and upload only changed records
+"""
+
+import hashlib
+import json
+import os
+
+from barometer import log, DEBUG, INFO, WARNING
+
+
+class Delta:
+    """
+    Records that changed since the last run
+    """
+
+    def __init__(self, inserted, updated, deleted):
+        """
+        args:
+            inserted (list(dict)): Records whose keys weren't seen last run
+            updated (list(dict)): Records whose contents changed
+            deleted (list(str)): Keys of records that disappeared
+        """
+        self.inserted = inserted
+        self.updated = updated
+        self.deleted = deleted
+
+    @property
+    def upserted(self):
+        return self.inserted + self.updated
+
+    def __bool__(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def __str__(self):
+        return f'{len(self.inserted)} inserted, {len(self.updated)} updated, {len(self.deleted)} deleted'
+
+
+class Manifest:
+    """
+    Content hashes of every source URL and record from the previous run, stored as
+    JSON. Sources also keep their parsed records so unchanged pages don't have to
+    be parsed again. Changes are only written to disk by save(), which scrapers
+    call once their upload succeeded.
+    """
+
+    def __init__(self, path):
+        """
+        args:
+            path (str): JSON file the manifest is stored in. Starts empty if missing
+        """
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = dict()
+        self.sources = data.get('sources', dict())
+        self.records = data.get('records', dict())
+
+    @staticmethod
+    def hash(data):
+        """
+        args:
+            data (bytes or str or JSON-serializable object)
+
+        returns:
+            str: SHA-1 hex digest of data
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        elif not isinstance(data, bytes):
+            data = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
+
+    @classmethod
+    def page_hash(cls, response):
+        """
+        returns:
+            str: Hash of a fetched page's body
+        """
+        digest = getattr(response, 'digest', None)
+        return digest if digest is not None else cls.hash(response.content)
+
+    def unchanged_records(self, url, response):
+        """
+        Checks whether a page is the same as last run
+
+        args:
+            url (str)
+            response (requests.Response): Fetched page. Pages streamed with
+                scraper_base.download are compared by their digest attribute
+
+        returns:
+            list(dict): Records parsed from the page last run if it's unchanged, else None
+        """
+        source = self.sources.get(url)
+        if source is None:
+            return None
+        # Pages served from the response cache are hashed too: the cache is updated on
+        # every fetch but the manifest only once an upload succeeds, so a 304 can
+        # carry a body the manifest hasn't seen
+        if source['hash'] == self.page_hash(response):
+            log(DEBUG, "%s unchanged since last run", url)
+            return source['records']
+        return None
+
+    def source_records(self, url):
+        """
+        Looks up the records of a page without fetching it, for pages that can't
+        change anymore
+
+        returns:
+            list(dict): Records parsed from the page last time it was scraped, or
+                None if it never was
+        """
+        source = self.sources.get(url)
+        return None if source is None else source['records']
+
+    def update_source(self, url, response, records):
+        """
+        Stores the hash and parsed records of a changed page. Warns if a page that
+        used to produce records now produces none, which usually means the site's
+        format changed.
+
+        args:
+            url (str)
+            response (requests.Response): Fetched page
+            records (list(dict)): Records parsed from the page
+        """
+        previous = self.sources.get(url)
+        if previous is not None and previous['records'] and not records:
+            log(WARNING, "No records parsed from %s, which had %s last run. The page format may have changed.",
+                url, len(previous['records']))
+        self.sources[url] = {'hash': self.page_hash(response), 'records': records}
+
+    def diff(self, kind, records, key):
+        """
+        Compares records to the ones from last run and remembers the new hashes.
+        Warns if the records' fields changed, which usually means the site's format
+        changed.
+
+        args:
+            kind (str): Name of the record collection, e.g. 'courses'
+            records (list(dict)): All records from this run
+            key (function): A function of type dict -> str giving each record's unique key
+
+        returns:
+            Delta
+        """
+        previous = self.records.get(kind, {'fields': None, 'hashes': dict()})
+        old_hashes = previous['hashes']
+        fields = sorted({field for record in records for field in record})
+        if previous['fields'] is not None and fields != previous['fields']:
+            log(WARNING, "Fields of %s changed from %s to %s. The page format may have changed.",
+                kind, previous['fields'], fields)
+
+        new_hashes = dict()
+        inserted, updated = [], []
+        for record in records:
+            k = key(record)
+            h = self.hash(record)
+            new_hashes[k] = h
+            if k not in old_hashes:
+                inserted.append(record)
+            elif old_hashes[k] != h:
+                updated.append(record)
+        deleted = [k for k in old_hashes if k not in new_hashes]
+        self.records[kind] = {'fields': fields, 'hashes': new_hashes}
+
+        delta = Delta(inserted, updated, deleted)
+        log(INFO, "%s since last run: %s", kind, delta)
+        return delta
+
+    def save(self):
+        """
+        Writes the manifest to disk
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'sources': self.sources, 'records': self.records}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,239 @@
+"""
+Title: Rate limiter
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Per-host token bucket rate limiting shared by all scrapers. Backs off
+when a server answers 429 or 503 and recovers gradually afterwards.
+"""
+
+import datetime
+import email.utils
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# Statuses that mean the server wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value, now=None):
+    """
+    args:
+        value (str): Retry-After header, either a number of seconds or an HTTP date
+        now (float): Current UNIX time. Uses time.time() if None
+
+    returns:
+        float: Number of seconds to wait, or None if value can't be parsed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = time.time() if now is None else now
+    return max(0.0, date.timestamp() - now)
+
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average with bursts of up to capacity
+    requests. Tokens are reserved ahead of time, so callers are told how long to
+    wait instead of being blocked.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        """
+        args:
+            rate (num): Tokens added per second
+            capacity (num): Maximum number of stored tokens
+            clock (function): Source of the current time in seconds
+        """
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        # Time tokens were last counted. Lies in the future while the bucket is blocked
+        self.updated = clock()
+        self.failures = 0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def set_rate(self, rate, capacity):
+        """
+        Changes the base rate and capacity, keeping stored tokens, any block
+        and how far the bucket is throttled below its base rate
+
+        args:
+            rate (num): Tokens added per second
+            capacity (num): Maximum number of stored tokens
+        """
+        self._refill(self.clock())
+        self.rate = self.rate * rate / self.base_rate
+        self.base_rate = rate
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+
+    def reserve(self):
+        """
+        Takes a token, going into debt if none are available
+
+        returns:
+            float: Number of seconds to wait before using the token
+        """
+        now = self.clock()
+        self._refill(now)
+        self.tokens -= 1
+        wait = max(0.0, self.updated - now)
+        if self.tokens < 0:
+            wait += -self.tokens / self.rate
+        return wait
+
+    def throttle(self, retry_after=None, factor=0.5, min_rate=0.05):
+        """
+        Slows the bucket down after the server signalled overload. Halves the rate
+        and blocks until retry_after, or an exponential backoff if it's unknown.
+
+        args:
+            retry_after (num): Seconds the server asked us to wait
+            factor (num): Multiplier applied to the rate
+            min_rate (num): Lowest rate the bucket is slowed to
+        """
+        self.failures += 1
+        if retry_after is None:
+            retry_after = min(60.0, 2 ** (self.failures - 1))
+        now = self.clock()
+        self._refill(now)
+        self.rate = max(min_rate, self.rate * factor)
+        # Requests resume one at a time once the block is over
+        self.tokens = min(self.capacity, 1)
+        self.updated = max(self.updated, now + retry_after)
+
+    def recover(self, step=0.1):
+        """
+        Speeds a throttled bucket back up after a successful response
+
+        args:
+            step (num): Fraction of the base rate added back per success
+        """
+        self.failures = 0
+        if self.rate < self.base_rate:
+            now = self.clock()
+            self._refill(now)
+            self.rate = min(self.base_rate, self.rate + self.base_rate * step)
+
+
+class RateLimiter:
+    """
+    Keeps a TokenBucket per host. Thread-safe; reserve() never blocks, so it can be
+    used from both threads and an asyncio event loop.
+    """
+
+    def __init__(self, rate=10, capacity=2, clock=time.monotonic):
+        """
+        args:
+            rate (num): Default requests per second for hosts without their own limit
+            capacity (num): Default burst size
+            clock (function): Source of the current time in seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        # Requests never wait if False, e.g. when pages are served offline
+        self.enabled = True
+        self._buckets = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url):
+        """
+        returns:
+            str: The host of url, or url itself if it's already a host name
+        """
+        return urlsplit(url).netloc or url
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity, self.clock)
+            self._buckets[host] = bucket
+        return bucket
+
+    def set_rate(self, url, rate, capacity=None):
+        """
+        Sets the request rate for a host. A host that already has a bucket keeps
+        it, so a Retry-After block or backoff in progress still applies
+
+        args:
+            url (str): A URL or host name
+            rate (num): Requests per second
+            capacity (num): Burst size. Uses the default if None
+        """
+        host = self.host(url)
+        capacity = self.capacity if capacity is None else capacity
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                self._buckets[host] = TokenBucket(rate, capacity, self.clock)
+            else:
+                bucket.set_rate(rate, capacity)
+
+    def reserve(self, url):
+        """
+        returns:
+            float: Number of seconds to wait before requesting url
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            return self._bucket(self.host(url)).reserve()
+
+    def acquire(self, url):
+        """
+        Blocks until a request to url is allowed
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def feedback(self, url, status_code, retry_after=None):
+        """
+        Adjusts a host's rate after a response
+
+        args:
+            url (str)
+            status_code (int): HTTP status of the response
+            retry_after (str): Retry-After header of the response, if any
+
+        returns:
+            bool: True if the server throttled the request and it should be retried
+        """
+        host = self.host(url)
+        with self._lock:
+            bucket = self._bucket(host)
+            if status_code in THROTTLE_STATUSES:
+                bucket.throttle(parse_retry_after(retry_after))
+                return True
+            bucket.recover()
+            return False
+
+    def stats(self):
+        """
+        returns:
+            dict(str:float): Current requests per second of each host
+        """
+        with self._lock:
+            return {host: bucket.rate for host, bucket in self._buckets.items()}
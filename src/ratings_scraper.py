@@ -10,22 +10,22 @@ Description: Scrapes professor ratings from calpolyratings.com
 # Doesn't compute average rating/difficulty from reviews
 
 import scraper_base
-from barometer import barometer, DEBUG, SUCCESS, ALERT, INFO, NOTICE, WARNING
+from barometer import barometer, log, span, DEBUG, SUCCESS, ALERT, NOTICE, WARNING
 import requests
 import pandas as pd
-from time import sleep
 
 
 class RatingsScraper:
 
     def __init__(self):
         self.TOP_LINK = 'https://calpolyratings.com'
-        self.REST_TIME = 200  # Time between requests in ms
+        self.REST_TIME = 200  # Average time between requests in ms
+        scraper_base.set_rate_limit(self.TOP_LINK, 1000 / self.REST_TIME)
 
     @barometer
     def scrape(self):
         data = []
-        print(DEBUG, f"Starting calpolyratings scrape: TOP_LINK={self.TOP_LINK}, REST_TIME={self.REST_TIME}ms")
+        log(DEBUG, "Starting calpolyratings scrape: TOP_LINK=%s, REST_TIME=%sms", self.TOP_LINK, self.REST_TIME)
         page_num = 1
         while True:
             try:
@@ -33,39 +33,47 @@ class RatingsScraper:
             except requests.exceptions.RequestException as e:
                 # Keep trying to get new pages until 404. On 404, return existing data
                 if str(e).startswith('404 Client Error'):
-                    print(NOTICE, f"Page {page_num} not found. Ending scrape")
-                    print(SUCCESS, f"Done! Scraped ratings for {len(data)} professors")
+                    log(NOTICE, "Page %s not found. Ending scrape", page_num)
+                    log(SUCCESS, "Done! Scraped ratings for %s professors", len(data))
                     return pd.DataFrame(data).to_csv(None, index=False)
-                print(ALERT, e)
+                log(ALERT, "%s", e)
                 return None
             else:
-                print(SUCCESS, f"Retrieved page {page_num}")
+                log(SUCCESS, "Retrieved page %s", page_num)
                 page_num += 1
                 links = (a['href'] for a in soup.find_all('a', href=True))
-                prof_links = [a for a in links if a.startswith('/') and not a.endswith('/')]
-                for prof in prof_links:
-                    sleep(self.REST_TIME / 1000)
-                    page = self.get_prof_page(prof)
-                    if page:
-                        data.append(page)
+                prof_urls = [f"{self.TOP_LINK}{a}" for a in links if a.startswith('/') and not a.endswith('/')]
+                # Professor pages are fetched concurrently, then kept in listing order
+                pages = dict()
+                for url, prof_page in scraper_base.fetch_many(dict.fromkeys(prof_urls), return_exceptions=True):
+                    if isinstance(prof_page, requests.exceptions.RequestException):
+                        log(WARNING, "Failed scraping %s: %s", url, prof_page)
+                        continue
+                    elif isinstance(prof_page, Exception):
+                        raise prof_page
+                    log(DEBUG, "Retrieved professor page from %s", url)
+                    with span('parse'):
+                        pages[url] = self.parse_prof_page(prof_page)
+                data.extend(pages[url] for url in prof_urls if url in pages)
 
-    def get_prof_page(self, extension):
-        try:
-            prof_page = scraper_base.get_soup(f"{self.TOP_LINK}{extension}")
-        except requests.exceptions.RequestException as e:
-            print(WARNING, f"Failed scraping {self.TOP_LINK}{extension}: {e}")
-            return None
-        else:
-            print(DEBUG, f"Retrieved professor page from {self.TOP_LINK}{extension}")
-            prof_name = prof_page.title.text.strip()
-            # Why is all relevant data in a button block? I have no idea.
-            main_block = prof_page.findAll('button')[2]
-            prof_rating = main_block.find("span", {"class": "teacher-rating"}).text
-            prof_difficulty = main_block.find("span", {"class": "evals-span"}).text
-            if prof_difficulty:
-                prof_difficulty = prof_difficulty.split()[1]
-            p = {"NAME": prof_name,
-                 "RATING": prof_rating,
-                 "DIFFICULTY": prof_difficulty}
-            return p
+    @staticmethod
+    def parse_prof_page(prof_page):
+        """
+        args:
+            prof_page (BeautifulSoup): A professor's calpolyratings page
+
+        returns:
+            dict(str:str): The professor's name, rating and difficulty
+        """
+        prof_name = prof_page.title.text.strip()
+        # Why is all relevant data in a button block? I have no idea.
+        main_block = prof_page.findAll('button')[2]
+        prof_rating = main_block.find("span", {"class": "teacher-rating"}).text
+        prof_difficulty = main_block.find("span", {"class": "evals-span"}).text
+        if prof_difficulty:
+            prof_difficulty = prof_difficulty.split()[1]
+        p = {"NAME": prof_name,
+             "RATING": prof_rating,
+             "DIFFICULTY": prof_difficulty}
+        return p
 
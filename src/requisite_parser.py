@@ -0,0 +1,102 @@
+"""
+Title: Requisite parser
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Single-pass parser for the terms offered and requisite sections of
+catalog course blocks
+"""
+
+import re
+
+
+# Section labels and the field each one fills. Labels can be glued to the end of
+# the previous section, e.g. 'F, W, SPPrerequisite:', so there's no left word boundary.
+SECTIONS = {
+    'Offered': 'terms',
+    'Prerequisite': 'prerequisites',
+    'Corequisite': 'corequisites',
+    'Concurrent': 'concurrent',
+    'Recommended': 'recommended',
+}
+# Key each requisite section's course codes are stored under
+COURSES = {
+    'prerequisites': 'prerequisites_courses',
+    'corequisites': 'corequisites_courses',
+    'concurrent': 'concurrent_courses',
+    'recommended': 'recommended_courses',
+}
+SECTION_LABEL = re.compile(r'(Offered|Prerequisite|Corequisite|Concurrent|Recommended):')
+# Course codes like 'CSC 357' or 'CSC/CPE 225' (department and number groups), and
+# the bare numbers listed right after one like the '203' in 'CSC 202 or 203', which
+# belong to the same department (third group). Numbers of units, hours or quarters
+# aren't courses.
+COURSE_CODE = re.compile(r'([A-Z][A-Z/]+) (\d\d\d)\b(?!-)'
+                         r'((?:\s*(?:,|/|&|\band\b|\bor\b)\s*(?:(?:and|or)\s+)?'
+                         r'\d\d\d\b(?!-|\s*(?:units?|hours?|quarters?|credits?)\b))*)')
+COURSE_NUMBER = re.compile(r'\d\d\d')
+TERM = re.compile(r'[^\s,]+')
+
+
+def parse_course_codes(text):
+    """
+    args:
+        text (str): Requisite text, e.g. 'CSC/CPE 225 or CPE 233; and CSC 202 or 203.'
+
+    returns:
+        list(str): Course codes in order of first appearance,
+            e.g. ['CSC 225', 'CPE 225', 'CPE 233', 'CSC 202', 'CSC 203']
+    """
+    codes = dict()
+    for dept, num, listed in COURSE_CODE.findall(text):
+        departments = dept.strip('/').split('/')
+        for num in [num] + COURSE_NUMBER.findall(listed):
+            for dept in departments:
+                codes[f'{dept} {num}'] = None
+    return list(codes)
+
+
+def parse_requisites(text, course_codes=True):
+    """
+    Splits the extended info of a course block into its sections in one pass
+
+    args:
+        text (str): Text of a course's extended info block, e.g.
+            'Term Typically Offered: F, W, SPPrerequisite: CSC 202 or CSC 203.'
+        course_codes (bool): Finds the course codes each section mentions if True
+
+    returns:
+        dict: 'terms' (list(str)), e.g. ['F', 'W', 'SP'], and for each of 'prerequisites',
+            'corequisites', 'concurrent' and 'recommended' the section's text (str or None)
+            and the course codes it mentions under '<section>_courses' (list(str), empty
+            unless course_codes is True)
+    """
+    parsed = {
+        'terms': [],
+        'prerequisites': None, 'prerequisites_courses': [],
+        'corequisites': None, 'corequisites_courses': [],
+        'concurrent': None, 'concurrent_courses': [],
+        'recommended': None, 'recommended_courses': [],
+    }
+
+    # [text before the first label, label, section, label, section, ...]
+    parts = SECTION_LABEL.split(text)
+    for i in range(1, len(parts), 2):
+        field = SECTIONS[parts[i]]
+        if field == 'terms':
+            parsed['terms'].extend(TERM.findall(parts[i + 1]))
+            continue
+        body = ' '.join(parts[i + 1].split())
+        if not body:
+            continue
+        if parsed[field] is None:
+            parsed[field] = body
+            if course_codes:
+                parsed[COURSES[field]] = parse_course_codes(body)
+        else:
+            # Repeated labels are joined like one section
+            parsed[field] = f'{parsed[field]} {body}'
+            if course_codes:
+                courses = parsed[COURSES[field]]
+                courses.extend(code for code in parse_course_codes(body) if code not in courses)
+    return parsed
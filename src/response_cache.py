@@ -0,0 +1,287 @@
+"""
+Title: Response cache
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Persistent on-disk HTTP response cache used by scraper_base. Stores
+response bodies with their validators (ETag / Last-Modified) so unchanged pages
+can be revalidated with a conditional request instead of downloaded again.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# Seconds a file left behind by an unfinished store is kept before it's removed,
+# so stores in progress in other processes sharing the directory aren't disturbed
+ORPHAN_AGE = 3600
+
+
+class CacheEntry:
+
+    def __init__(self, url, etag, last_modified, encoding, content_type, stored_at, size):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoding = encoding
+        self.content_type = content_type
+        self.stored_at = stored_at
+        self.accessed_at = stored_at
+        self.size = size
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d):
+        entry = cls(d['url'], d.get('etag'), d.get('last_modified'), d.get('encoding'),
+                    d.get('content_type'), d['stored_at'], d['size'])
+        entry.accessed_at = d.get('accessed_at', entry.stored_at)
+        return entry
+
+
+class ResponseCache:
+    """
+    Stores response bodies as files in a directory, one body file and one
+    metadata file per URL. The metadata file is written last, so an entry only
+    exists once its body is complete. Entries not stored or revalidated for ttl
+    are evicted, and the least recently used entries are evicted once the total
+    body size exceeds max_size.
+    """
+
+    def __init__(self, directory='.scraper_cache', ttl=7 * 24 * 3600, max_size=256 * 2 ** 20):
+        """
+        args:
+            directory (str): Directory the cache is stored in. Created if missing
+            ttl (num): Seconds an entry is kept after it was last stored or
+                revalidated before it's evicted. Never evicted by age if None
+            max_size (int): Maximum total size of cached bodies in bytes. Unbounded if None
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, f'{key}.{ext}')
+
+    def _load(self):
+        """
+        Reads every metadata file in the cache directory on first use, and
+        removes files left behind by a store that didn't finish: temporary files
+        and bodies without metadata
+        """
+        if self._entries is not None:
+            return
+        self._entries = dict()
+        os.makedirs(self.directory, exist_ok=True)
+        filenames = os.listdir(self.directory)
+        now = time.time()
+        for filename in filenames:
+            orphan = filename.endswith('.body') and f'{filename[:-len(".body")]}.json' not in filenames
+            if filename.endswith('.tmp') or orphan:
+                path = os.path.join(self.directory, filename)
+                try:
+                    if now - os.path.getmtime(path) > ORPHAN_AGE:
+                        os.remove(path)
+                except OSError:
+                    pass
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+            key = filename[:-len('.json')]
+            try:
+                with open(self._path(key, 'json'), 'r') as f:
+                    entry = CacheEntry.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError):
+                self._remove(key)
+                continue
+            if os.path.exists(self._path(key, 'body')):
+                self._entries[key] = entry
+            else:
+                self._remove(key)
+
+    def _remove(self, key):
+        for ext in ('json', 'body'):
+            try:
+                os.remove(self._path(key, ext))
+            except OSError:
+                pass
+        if self._entries is not None:
+            self._entries.pop(key, None)
+
+    def _write(self, path, data, mode):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _copy(self, path, file):
+        """
+        Like _write, but copies the rest of a file
+
+        returns:
+            int: Number of bytes copied
+        """
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(file, f)
+            size = f.tell()
+        os.replace(tmp_path, path)
+        return size
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry.stored_at > self.ttl
+
+    def lookup(self, url):
+        """
+        args:
+            url (str)
+
+        returns:
+            CacheEntry: The stored entry for url, or None if there isn't a fresh one
+        """
+        key = self.key(url)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, time.time()):
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+            return entry
+
+    def conditional_headers(self, url):
+        """
+        returns:
+            dict(str:str): If-None-Match / If-Modified-Since headers for url, or
+                an empty dict if url isn't cached
+        """
+        entry = self.lookup(url)
+        headers = dict()
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def read(self, url):
+        """
+        Reads a cached body after the server answered 304 Not Modified, or for a
+        page known not to change anymore. Either way the body is current, so the
+        entry's age starts over
+
+        returns:
+            (CacheEntry, bytes): The entry and its body, or (None, None) if it's missing
+        """
+        key = self.key(url)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            try:
+                with open(self._path(key, 'body'), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                self._remove(key)
+                self.misses += 1
+                return None, None
+            self.hits += 1
+            entry.stored_at = entry.accessed_at = time.time()
+            self._write(self._path(key, 'json'), json.dumps(entry.to_dict()), 'w')
+            return entry, body
+
+    def store(self, url, response, file=None):
+        """
+        Stores a 200 response if it carries an ETag or Last-Modified validator
+
+        args:
+            url (str)
+            response (requests.Response)
+            file (file): Binary file positioned at the start of the body, for
+                streamed responses whose content wasn't read. Uses response.content if None
+        """
+        with self._lock:
+            self.misses += 1
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if not etag and not last_modified:
+                return
+            self._load()
+            key = self.key(url)
+            # The old metadata goes first, so a crash before the new metadata is
+            # written leaves a body that's swept instead of one under old validators
+            if self._entries.pop(key, None) is not None:
+                try:
+                    os.remove(self._path(key, 'json'))
+                except OSError:
+                    pass
+            if file is None:
+                body = response.content
+                self._write(self._path(key, 'body'), body, 'wb')
+                size = len(body)
+            else:
+                size = self._copy(self._path(key, 'body'), file)
+            entry = CacheEntry(url, etag, last_modified, response.encoding,
+                               response.headers.get('Content-Type'), time.time(), size)
+            self._write(self._path(key, 'json'), json.dumps(entry.to_dict()), 'w')
+            self._entries[key] = entry
+            self._evict()
+
+    def _evict(self):
+        """
+        Removes expired entries, then least recently used entries until the
+        cache fits in max_size
+        """
+        now = time.time()
+        for key, entry in list(self._entries.items()):
+            if self._expired(entry, now):
+                self._remove(key)
+                self.evictions += 1
+        if self.max_size is None:
+            return
+        total = sum(entry.size for entry in self._entries.values())
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1].accessed_at):
+            if total <= self.max_size:
+                break
+            total -= entry.size
+            self._remove(key)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Removes every cached entry
+        """
+        with self._lock:
+            self._load()
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self):
+        """
+        returns:
+            dict(str:int): Hit, miss and eviction counters and current cache size
+        """
+        with self._lock:
+            self._load()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size': sum(entry.size for entry in self._entries.values()),
+            }
@@ -6,16 +6,28 @@ Organization: Cal Poly CSAI
 Description: Scrapes class and professor data from the Cal Poly schedules site
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+import multiprocessing
+import re
+from urllib.parse import urljoin
+
+import numpy as np
 import pandas as pd
 import scraper_base
 import requests
-from barometer import barometer, SUCCESS, ALERT, INFO, DEBUG, ERR
+from barometer import barometer, capture, log, max_level, replay, span, SUCCESS, ALERT, INFO, DEBUG, ERR, NOTICE, WARNING
 
 
 class SchedulesScraper:
 
     def __init__(self):
         self.TOP_LINK = 'https://schedules.calpoly.edu/depts_52-CENG_curr.htm'
+        self.ROOT_LINK = 'https://schedules.calpoly.edu/'
+        # Current and upcoming terms. Upcoming term pages only exist once they're published
+        self.TERMS = ('curr', 'next')
+        # College pages hold one sub-table per department, e.g. depts_52-CENG_curr.htm
+        self.COLLEGE_PAGE = re.compile(r'depts_\d+-(\w+)_(curr|next)\.htm$')
 
     def separate_dfs(self, df, add_name=False):
         """
@@ -33,52 +45,51 @@ class SchedulesScraper:
         returns:
             A list of sub-tables (or the original table if there are none)
         """
-        print(DEBUG, f"Calling separate_dfs: add_name={add_name}")
+        log(DEBUG, "Calling separate_dfs: add_name=%s", add_name)
 
         # name_df : DataFrame -> str -> None
         def name_df(d, s):
             if add_name:
                 d.name = s
 
-        # Finds indicies of rows where all values are equal
-        indicies = list(df[df.eq(df.iloc[:, 0], axis=0).all(1)].index)
+        # Finds positions of rows where all values are equal in one pass
+        separators = np.flatnonzero(df.eq(df.iloc[:, 0], axis=0).all(axis=1).to_numpy())
 
         # If there's no separation or MultiIndex, return original df
-        if len(indicies) == 0 or type(df.columns) != pd.core.indexes.multi.MultiIndex:
-            print(DEBUG, f"No sub-dfs. Returning original.")
+        if len(separators) == 0 or type(df.columns) != pd.core.indexes.multi.MultiIndex:
+            log(DEBUG, "No sub-dfs. Returning original.")
             return [df]
         else:
             # Find which header is all the same value (sub-table identifying header)
-            header_one = [a for a,b in df.columns]
-            header_two = [b for a,b in df.columns]
-            if len(set(header_one)) == 1:
-                if len(set(header_two)) == 1:
-                    print(ERR, "MultiIndex with no multi-valued headers")
+            header_one = df.columns.get_level_values(0)
+            header_two = df.columns.get_level_values(1)
+            if header_one.nunique() == 1:
+                if header_two.nunique() == 1:
+                    log(ERR, "MultiIndex with no multi-valued headers")
                     raise ValueError('MultiIndex with no multi-valued headers')
                 else:
                     df_name = header_one[0]
-                    df.columns = header_two
-            elif len(set(header_two)) == 1:
+                    df.columns = list(header_two)
+            elif header_two.nunique() == 1:
                 df_name = header_two[0]
-                df.columns = header_one
+                df.columns = list(header_one)
             else:
-                print(ERR, "MultiIndex with multiple multi-valued headers")
+                log(ERR, "MultiIndex with multiple multi-valued headers")
                 raise ValueError('MultiIndex with multiple multi-valued headers')
-            print(DEBUG, "Found sub-table identifying header")
+            log(DEBUG, "Found sub-table identifying header")
 
-            prev_index = -1
+            # Each separator row names the sub-table after it
+            names = [df_name] + list(df.iloc[separators, 0])
+            starts = np.concatenate(([0], separators + 1))
+            ends = np.concatenate((separators, [len(df)]))
             dfs = []
-            num_processed_dfs = 0
-            for i in indicies + [len(df)]:
-                num_processed_dfs += 1
-                sub_df = df.iloc[prev_index+1:i,:].reset_index(drop=True)
-                name_df(sub_df, df_name)
-                df_name = df.iloc[i%len(df),:][0]
-                print(DEBUG, f"Found sub-df {df_name} from indicies {prev_index + 1} to {i}")
+            for name, start, end in zip(names, starts, ends):
+                sub_df = df.iloc[start:end, :].reset_index(drop=True)
+                name_df(sub_df, name)
+                log(DEBUG, "Found sub-df %s from indicies %s to %s", name, start, end)
                 dfs.append(sub_df)
-                prev_index = i
 
-        print(DEBUG, f"Separated df into {len(dfs)} sub-dfs")
+        log(DEBUG, "Separated df into %s sub-dfs", len(dfs))
         return dfs
 
 
@@ -92,35 +103,30 @@ class SchedulesScraper:
         returns:
             A processed DataFrame
         """
-        print(DEBUG, f"Calling preprocess_schedules: df={df.name}")
+        name = df.name
+        log(DEBUG, "Calling preprocess_schedules: df=%s", name)
         # Remove extraneous "Unnamed*" columns introduced by Pandas
-        df.dropna(axis='columns', how='all', inplace=True)
+        df = df.dropna(axis='columns', how='all')
         # If first row is the same as the header, drop it
-        if all(df.iloc[0,:] == df.columns):
-            print(DEBUG, "First row is the same as the header. Dropping it.")
-            df.drop(0, inplace=True)
-            df.reset_index(drop=True, inplace=True)
-
-        # Combine 'Course' and 'Sect" columns as 'Course'
-        for i in range(len(df)):
-            c = df['Course'][i]
-            s = df['Sect'][i]
-            if pd.isna(c) or pd.isna(s):
-                continue
-            else:
-                df['Course'][i] = f'{c}_{s}'
-
-        df['Department'] = [df.name] * len(df)
+        if len(df) and (df.iloc[0, :] == df.columns).all():
+            log(DEBUG, "First row is the same as the header. Dropping it.")
+            df = df.iloc[1:, :].reset_index(drop=True)
 
-        # Drop 'Sect' column
-        df.drop('Sect', axis='columns', inplace=True)
+        # Combine 'Course' and 'Sect" columns as 'Course' where both are present
+        course = df['Course']
+        sect = df['Sect']
+        combined = course.astype(str) + '_' + sect.astype(str)
+        course = combined.where(course.notna() & sect.notna(), course)
 
+        dropped = ['Sect']
         if 'Office Hours' in df:
-            print(DEBUG, "Found office hours column. Dropping it.")
-            df.drop('Office Hours', axis='columns', inplace=True)
+            log(DEBUG, "Found office hours column. Dropping it.")
+            dropped.append('Office Hours')
+        df = df.drop(columns=dropped).assign(Course=course, Department=name)
 
         # Make column headings uppercase
-        df.columns = [s.upper() for s in df.columns]
+        df.columns = df.columns.str.upper()
+        df.name = name
 
         return df
 
@@ -136,45 +142,163 @@ class SchedulesScraper:
         returns:
             A list of scraped DataFrames
         """
-        print(DEBUG, f"Calling scrape_schedules_from_html: preprocess={preprocess}")
-        dfs = pd.read_html(html)
+        log(DEBUG, "Calling scrape_schedules_from_html: preprocess=%s", preprocess)
+        # Literal HTML has to be wrapped in a file-like object for newer pandas
+        dfs = pd.read_html(StringIO(html))
         if not dfs:
-            print(ALERT, "Didn't find any tables on page. Aborting scrape.")
+            log(ALERT, "Didn't find any tables on page. Aborting scrape.")
             return None
-        print(INFO, f"Found {len(dfs)} table(s)")
+        log(INFO, "Found %s table(s)", len(dfs))
         separated = []
         for df in dfs:
             separated.extend(self.separate_dfs(df, add_name=True))
-        print(INFO, f"Split {len(dfs)} df(s) into {len(separated)} sub-df(s)")
+        log(INFO, "Split %s df(s) into %s sub-df(s)", len(dfs), len(separated))
         if preprocess is not None:
             separated = [preprocess(d) for d in separated]
         return separated
 
+    def scrape_schedules_from_bytes(self, content, preprocess=None):
+        """
+        Scrapes schedule from a raw HTML document. Only the document's tables
+        are handed to the table parser.
+
+        args:
+            content (bytes): HTML document
+            preprocess: A function of type DataFrame -> DataFrame that
+                will be applied to each parsed DataFrame before scraping
+
+        returns:
+            A list of scraped DataFrames
+        """
+        with span('parse'):
+            tables = scraper_base.read_tables(content)
+            if not tables:
+                log(ALERT, "Didn't find any tables on page. Aborting scrape.")
+                return None
+            return self.scrape_schedules_from_html(tables, preprocess)
+
     def scrape_schedules_from_url(self, url, verify=True, preprocess=None):
         try:
-            soup = scraper_base.get_soup(url, verify)
+            content = scraper_base.get_content(url, verify)
         except requests.exceptions.RequestException as e:
-            print(ALERT, e)
+            log(ALERT, "%s", e)
             return None
-        print(SUCCESS, "Retrieved schedules page")
-        return self.scrape_schedules_from_html(str(soup), preprocess)
+        log(SUCCESS, "Retrieved schedules page")
+        return self.scrape_schedules_from_bytes(content, preprocess)
 
     def scrape_schedules_from_file(self, path, preprocess=None):
-        with open(path, 'r') as f:
-            text = f.read()
-        return self.scrape_schedules_from_html(text, preprocess)
+        with open(path, 'rb') as f:
+            content = f.read()
+        return self.scrape_schedules_from_bytes(content, preprocess)
+
+    def discover_college_pages(self):
+        """
+        Finds the schedule page of every college for every term in TERMS
+
+        returns:
+            list(str): College page URLs. Always contains TOP_LINK
+        """
+        pages = {self.TOP_LINK}
+        for link in (self.ROOT_LINK, self.TOP_LINK):
+            try:
+                soup = scraper_base.get_soup(link)
+            except requests.exceptions.RequestException as e:
+                log(WARNING, "Couldn't search %s for college pages: %s", link, e)
+                continue
+            for a in soup.find_all('a', href=True):
+                url = urljoin(link, a['href'])
+                if self.COLLEGE_PAGE.search(url):
+                    pages.add(url)
+        # Every college is tried for every term, even if only one term is linked
+        for url in list(pages):
+            term = self.COLLEGE_PAGE.search(url).group(2)
+            for other_term in self.TERMS:
+                pages.add(url[:-len(f'{term}.htm')] + f'{other_term}.htm')
+        return sorted(pages)
 
     @barometer
-    def scrape(self):
+    def scrape(self, all_colleges=False, workers=None):
         """
         Scrapes data from schedules.calpoly.edu to CSV
 
+        args:
+            all_colleges (bool): Scrapes every college for the current and upcoming
+                terms if True, or just CENG for the current term if False (default False)
+            workers (int): Number of processes parsing pages when scraping all
+                colleges. Uses one per CPU if None
+
         returns:
             A CSV string of scraped data
         """
-        print(INFO, f"Starting scrape on {self.TOP_LINK}")
-        dfs = self.scrape_schedules_from_url(self.TOP_LINK, preprocess=self.preprocess_schedules)
-        all_em = pd.concat(dfs)
-        print(SUCCESS, f"Done! Scraped {len(all_em)} sections")
-        csv_str = all_em.to_csv(None, index=False)
-        return csv_str
+        if not all_colleges:
+            log(INFO, "Starting scrape on %s", self.TOP_LINK)
+            dfs = self.scrape_schedules_from_url(self.TOP_LINK, preprocess=self.preprocess_schedules)
+            all_em = pd.concat(dfs)
+            log(SUCCESS, "Done! Scraped %s sections", len(all_em))
+            csv_str = all_em.to_csv(None, index=False)
+            return csv_str
+
+        log(INFO, "Starting scrape on every college from %s", self.ROOT_LINK)
+        pages = self.discover_college_pages()
+        log(INFO, "Found %s college pages", len(pages))
+
+        # Pages are fetched concurrently here, so rate limits are shared, and parsed
+        # in worker processes as they arrive since read_html is CPU-bound.
+        # Workers are spawned rather than forked so they don't inherit open log
+        # files or pooled connections. Workers have no logger of their own, so
+        # their messages are sent back and logged here.
+        level = max_level()
+        futures = dict()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for url, content in scraper_base.fetch_many(pages, parse=lambda r: r.content, return_exceptions=True):
+                if isinstance(content, requests.exceptions.HTTPError):
+                    log(NOTICE, "No schedule at %s: %s", url, content)
+                    continue
+                elif isinstance(content, Exception):
+                    log(ALERT, "%s", content)
+                    return None
+                log(SUCCESS, "Retrieved schedules page %s", url)
+                college, term = self.COLLEGE_PAGE.search(url).groups()
+                futures[url] = executor.submit(capture, level, parse_schedules_page, content, college, term)
+            # Worker processes don't report metrics, so only the wait for them is timed
+            frames = []
+            for url in pages:
+                if url in futures:
+                    with span('parse_wait'):
+                        frame, records = futures[url].result()
+                    replay(records)
+                    frames.append(frame)
+
+        frames = [frame for frame in frames if frame is not None]
+        if not frames:
+            log(ALERT, "Didn't scrape any schedules.")
+            return None
+        all_em = pd.concat(frames, ignore_index=True)
+        log(SUCCESS, "Done! Scraped %s sections from %s pages", len(all_em), len(frames))
+        return all_em.to_csv(None, index=False)
+
+
+def parse_schedules_page(content, college, term):
+    """
+    Parses one college's schedule page into a single DataFrame. Module-level so it
+    can run in worker processes.
+
+    args:
+        content (bytes): HTML of the page
+        college (str): College abbreviation, e.g. 'CENG'
+        term (str): 'curr' or 'next'
+
+    returns:
+        A DataFrame with COLLEGE and TERM columns added, or None if the page
+        has no tables
+    """
+    scraper = SchedulesScraper()
+    try:
+        dfs = scraper.scrape_schedules_from_bytes(content, preprocess=scraper.preprocess_schedules)
+    except ValueError as e:
+        # separate_dfs raises on unexpected headers
+        log(WARNING, "Couldn't parse %s %s schedule: %s", college, term, e)
+        return None
+    if not dfs:
+        return None
+    return pd.concat(dfs, ignore_index=True).assign(COLLEGE=college, TERM=term)
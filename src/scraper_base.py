@@ -6,12 +6,509 @@ Organization: Cal Poly CSAI
 Description: Stores functions common to all Cal Poly scrapers
 """
 
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InsecureRequestWarning
 from bs4 import BeautifulSoup
+from io import BytesIO
+from lxml import etree
+
+from barometer import get_metrics, log, span, NOTICE
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+
+USER_AGENT = 'NimbusScraper/1.0 (Cal Poly CSAI; +https://github.com/calpoly-csai)'
+# Number of distinct hosts to keep connection pools for
+POOL_CONNECTIONS = 16
+# Number of keep-alive connections kept open per host
+POOL_MAXSIZE = 8
+# Default request timeout in seconds
+TIMEOUT = 30
+# Default number of concurrent requests per host for fetch_many
+CONCURRENCY_PER_HOST = 4
+# Number of times a request is retried after a 429 or 503 response
+MAX_RETRIES = 3
+# Bytes read from the connection at a time by download()
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Every request made through this module waits on its host's token bucket
+RATE_LIMITER = RateLimiter()
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+# Sends requests instead of the shared session if set. See set_fetcher
+_fetcher = None
+# Snapshot being recorded or replayed and its mode. See use_snapshot
+_snapshot = None
+_snapshot_mode = None
+# Hosts requested without certificate verification, the number of such requests
+# in flight and the warnings.catch_warnings silencing them. See _unverified
+_unverified_hosts = set()
+_unverified_requests = 0
+_insecure_warnings = None
+
+
+def configure_session(user_agent=None, pool_connections=None, pool_maxsize=None, timeout=None):
+    """
+    Changes the settings of the shared session. The current session is closed
+    and a new one is created on the next request.
+
+    args:
+        user_agent (str): User-Agent header sent with every request
+        pool_connections (int): Number of per-host connection pools to cache
+        pool_maxsize (int): Maximum number of connections kept alive per host
+        timeout (num): Default number of seconds until request timeout
+    """
+    global USER_AGENT, POOL_CONNECTIONS, POOL_MAXSIZE, TIMEOUT
+    if user_agent is not None:
+        USER_AGENT = user_agent
+    if pool_connections is not None:
+        POOL_CONNECTIONS = pool_connections
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+    if timeout is not None:
+        TIMEOUT = timeout
+    close_session()
+
+
+def get_session():
+    """
+    returns:
+        requests.Session: The session shared by all scrapers. Connections are
+            pooled per host and kept alive between requests.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+        return _session
+
+
+def close_session():
+    """
+    Closes all pooled connections of the shared session
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def set_fetcher(fetcher):
+    """
+    Replaces the layer that sends GET requests, e.g. to serve recorded pages
+    without network access. Rate limits, retries, the response cache and metrics
+    still apply to every request.
+
+    args:
+        fetcher (function): A function of type (url, **kwargs) -> requests.Response,
+            called with the same arguments as requests.Session.get, or None to send
+            requests through the shared session again
+
+    returns:
+        function: The previous fetcher, or None
+    """
+    global _fetcher
+    previous = _fetcher
+    _fetcher = fetcher
+    return previous
+
+
+def use_snapshot(path, mode='replay'):
+    """
+    Records every response into a snapshot file, or serves every request from
+    one. Replays aren't rate limited, so parsers run at full speed.
+
+    args:
+        path (str): SQLite snapshot file, or None to stop recording or replaying
+        mode (str): 'record' to fetch from the network and store responses, or
+            'replay' to serve stored responses. Requests for URLs that weren't
+            recorded raise snapshot.SnapshotMiss
+
+    returns:
+        snapshot.Snapshot: The snapshot in use, or None
+    """
+    # Imported here because snapshot builds its responses with this module
+    from snapshot import Snapshot
+
+    global _snapshot, _snapshot_mode
+    if _snapshot is not None:
+        _snapshot.close()
+        _snapshot = None
+        _snapshot_mode = None
+    RATE_LIMITER.enabled = True
+    if path is None:
+        set_fetcher(None)
+        return None
+
+    snapshot = Snapshot(path)
+    if mode == 'record':
+        set_fetcher(snapshot.recorder(lambda url, **kwargs: get_session().get(url, **kwargs)))
+    elif mode == 'replay':
+        set_fetcher(snapshot.replay)
+        RATE_LIMITER.enabled = False
+    else:
+        raise ValueError(f"mode must be 'record' or 'replay', not {mode!r}")
+    _snapshot = snapshot
+    _snapshot_mode = mode
+    return snapshot
+
+
+def build_response(url, status, content, headers=None, encoding=None):
+    """
+    Builds a response that didn't come from the network, for fetchers
+
+    args:
+        url (str): Requested URL
+        status (int): HTTP status
+        content (bytes): Body
+        headers (dict): Response headers, if any
+        encoding (str): Encoding of content. Guessed from headers and content if None
+
+    returns:
+        requests.Response
+    """
+    r = requests.Response()
+    r.url = url
+    r.status_code = status
+    r.reason = requests.status_codes._codes.get(status, ('',))[0].replace('_', ' ').title()
+    r._content = content
+    r._content_consumed = True
+    r.headers.update(headers or {})
+    r.encoding = encoding if encoding is not None else requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+
+def configure_cache(directory='.scraper_cache', ttl=7 * 24 * 3600, max_size=256 * 2 ** 20):
+    """
+    Enables the persistent response cache for all requests made through get()
+
+    args:
+        directory (str): Directory the cache is stored in. Disables the cache if None
+        ttl (num): Seconds a cached response is kept
+        max_size (int): Maximum total size of cached responses in bytes
+
+    returns:
+        ResponseCache: The new cache, or None if it was disabled
+    """
+    global _cache
+    _cache = None if directory is None else ResponseCache(directory, ttl, max_size)
+    return _cache
+
+
+def settings():
+    """
+    Collects what configure_session, configure_cache and use_snapshot set, which
+    spawned worker processes don't inherit. See apply_settings
+
+    returns:
+        dict: Picklable settings
+    """
+    return {
+        'session': {'user_agent': USER_AGENT, 'pool_connections': POOL_CONNECTIONS,
+                    'pool_maxsize': POOL_MAXSIZE, 'timeout': TIMEOUT},
+        'cache': None if _cache is None else {'directory': _cache.directory, 'ttl': _cache.ttl,
+                                              'max_size': _cache.max_size},
+        'snapshot': None if _snapshot is None else {'path': _snapshot.path, 'mode': _snapshot_mode},
+    }
+
+
+def apply_settings(settings):
+    """
+    Configures this module like the process settings() was called in
+
+    args:
+        settings (dict): Returned by settings()
+    """
+    configure_session(**settings['session'])
+    if settings['cache'] is None:
+        configure_cache(None)
+    else:
+        configure_cache(**settings['cache'])
+    if settings['snapshot'] is None:
+        use_snapshot(None)
+    else:
+        use_snapshot(**settings['snapshot'])
+
+
+def get_cache():
+    """
+    returns:
+        ResponseCache: The response cache, or None if caching is disabled
+    """
+    return _cache
+
+
+def cached(url):
+    """
+    Reads a page from the response cache without sending a request, for pages
+    known not to change anymore. Reading it keeps it from expiring
+
+    returns:
+        requests.Response: The cached page with from_cache set, or None if the
+            cache is disabled or doesn't have url
+    """
+    if _cache is None:
+        return None
+    entry, body = _cache.read(url)
+    if entry is None:
+        return None
+    headers = {'Content-Type': entry.content_type}
+    if entry.etag:
+        headers['ETag'] = entry.etag
+    if entry.last_modified:
+        headers['Last-Modified'] = entry.last_modified
+    r = build_response(url, 200, body, headers, entry.encoding)
+    r.from_cache = True
+    return r
+
+
+def set_rate_limit(url, rate, burst=None):
+    """
+    Sets how many requests per second are made to a host. Scrapers call this
+    when they're constructed; a throttled host stays throttled
+
+    args:
+        url (str): A URL or host name
+        rate (num): Requests per second
+        burst (num): Number of requests that may be made back-to-back
+    """
+    RATE_LIMITER.set_rate(url, rate, burst)
 
 
-# TODO: Add support for user agent headers
-def get_soup(url, ver=True, to=30):
+def get(url, ver=True, to=None, use_cache=True, **kwargs):
+    """
+    Sends a GET request through the shared session and raises
+    exceptions for scraping modules. Requests wait on the host's rate limit and
+    are retried up to MAX_RETRIES times when the server answers 429 or 503.
+    When the response cache is enabled, sends a conditional request and serves
+    the cached body on 304 Not Modified. Responses carry a from_cache attribute
+    so callers can skip re-parsing unchanged pages.
+
+    args:
+        url (str): URL to request
+        ver (bool): Skips certificate verification when set to False
+        to (num): Number of seconds until request timeout. Uses TIMEOUT if None
+        use_cache (bool): Bypasses the response cache when set to False
+
+    returns:
+        requests.Response
+    """
+    return _get(url, ver, to, use_cache, False, **kwargs)
+
+
+def _get(url, ver, to, use_cache, reserved, **kwargs):
+    """
+    Implements get(). If reserved is True, the caller already waited on the rate
+    limiter for the first attempt.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if not reserved or attempt > 0:
+            with span('rate_limit'):
+                RATE_LIMITER.acquire(url)
+        r = _request(url, ver, to, use_cache, **kwargs)
+        throttled = RATE_LIMITER.feedback(url, r.status_code, r.headers.get('Retry-After'))
+        if not throttled:
+            break
+        r.close()
+    r.raise_for_status()
+    return r
+
+
+def _request(url, ver, to, use_cache, **kwargs):
+    """
+    Sends a single GET request, going through the response cache if it's enabled.
+    Streamed responses are recorded and cached by download() once their body is read.
+    """
+    stream = kwargs.get('stream', False)
+    cache = _cache if use_cache else None
+    request_kwargs = kwargs
+    if cache is not None:
+        headers = dict(kwargs.get('headers') or {})
+        headers.update(cache.conditional_headers(url))
+        request_kwargs = dict(kwargs, headers=headers)
+    start = time.perf_counter()
+    try:
+        with span('fetch'):
+            send = _fetcher or get_session().get
+            with contextlib.nullcontext() if ver else _unverified(url):
+                r = send(url, verify=ver, timeout=TIMEOUT if to is None else to, **request_kwargs)
+    except requests.exceptions.RequestException:
+        record_request(url, None, 0, time.perf_counter() - start)
+        raise
+    if not stream:
+        record_request(url, r.status_code, len(r.content), time.perf_counter() - start, r.status_code == 304)
+    r.from_cache = False
+    if cache is not None:
+        if r.status_code == 304:
+            entry, body = cache.read(url)
+            if entry is not None:
+                r.status_code = 200
+                r._content = body
+                r._content_consumed = True
+                r.encoding = entry.encoding
+                r.from_cache = True
+            else:
+                # Cached body vanished between the request and the read; fetch without validators
+                return _request(url, ver, to, False, **kwargs)
+        elif r.status_code == 200 and not stream:
+            cache.store(url, r)
+    return r
+
+
+def download(url, file, ver=True, to=None, use_cache=True, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Streams the body of a URL into a file instead of holding it in memory, with
+    the same rate limiting, retries and caching as get(). The response's content
+    isn't loaded; it carries a digest attribute with the SHA-1 hex digest of the
+    body (see Manifest.hash) next to from_cache.
+
+    args:
+        url (str): URL to fetch
+        file (file): Binary file the body is written to
+        ver (bool): Skips certificate verification when set to False
+        to (num): Number of seconds until request timeout. Uses TIMEOUT if None
+        use_cache (bool): Bypasses the response cache when set to False
+        chunk_size (int): Bytes read from the connection at a time
+
+    returns:
+        requests.Response
+    """
+    start = time.perf_counter()
+    r = _get(url, ver, to, use_cache, False, stream=True)
+    digest = hashlib.sha1()
+    size = 0
+    position = file.tell()
+    try:
+        with span('fetch'):
+            for chunk in r.iter_content(chunk_size):
+                file.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+    finally:
+        r.close()
+    record_request(url, r.status_code, size, time.perf_counter() - start, r.from_cache)
+    r.digest = digest.hexdigest()
+
+    cache = _cache if use_cache else None
+    if cache is not None and not r.from_cache:
+        file.seek(position)
+        cache.store(url, r, file)
+        file.seek(position + size)
+    return r
+
+
+@contextlib.contextmanager
+def _unverified(url):
+    """
+    Silences urllib3's InsecureRequestWarning during a request without certificate
+    verification, logging once per host instead. Warning filters are process-wide
+    and requests run in threads, so one warnings.catch_warnings is entered by the
+    first of the requests in flight and exited with the last. Verified requests
+    never raise the warning, so they aren't affected.
+    """
+    global _unverified_requests, _insecure_warnings
+    host = urlsplit(url).netloc
+    with _session_lock:
+        first = host not in _unverified_hosts
+        _unverified_hosts.add(host)
+        if _unverified_requests == 0:
+            _insecure_warnings = warnings.catch_warnings()
+            _insecure_warnings.__enter__()
+            warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+        _unverified_requests += 1
+    if first:
+        log(NOTICE, "Not verifying certificates of %s", host)
+    try:
+        yield
+    finally:
+        with _session_lock:
+            _unverified_requests -= 1
+            if _unverified_requests == 0:
+                _insecure_warnings.__exit__(None, None, None)
+                _insecure_warnings = None
+
+
+def record_request(url, status, size, seconds, cached=False):
+    """
+    Adds a request to the metrics of the running decorated function, if any
+
+    args:
+        url (str): Requested URL
+        status (int): Response status, or None if the request failed
+        size (int): Bytes received
+        seconds (num): Time until the response was read
+        cached (bool): True if the server answered 304 Not Modified
+    """
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.add_request(urlsplit(url).netloc, status, size, seconds, cached)
+
+
+def get_content(url, ver=True, to=None):
+    """
+    Fetches the raw body of a URL without decoding or parsing it and
+    raises exceptions for scraping modules
+
+    args:
+        url (str): URL to fetch
+        ver (bool): Skips certificate verification when set to False
+        to (num): Number of seconds until request timeout. Uses TIMEOUT if None
+
+    returns:
+        bytes
+    """
+    return get(url, ver, to).content
+
+
+def read_tables(content, encoding=None):
+    """
+    Extracts the top-level <table> elements of an HTML document. Streams the
+    document through lxml and discards everything outside tables as it goes,
+    so only table subtrees are ever built.
+
+    args:
+        content (bytes): HTML document
+        encoding (str): Encoding of content. Detected by lxml if None
+
+    returns:
+        str: HTML of every top-level table, in document order
+    """
+    tables = []
+    with span('soup'):
+        for _, table in etree.iterparse(BytesIO(content), events=('end',), tag='table',
+                                        html=True, encoding=encoding, recover=True):
+            # Nested tables are serialized with their outer table
+            if next(table.iterancestors('table'), None) is not None:
+                continue
+            tables.append(etree.tostring(table, method='html', encoding='unicode', with_tail=False))
+            # Frees the table and everything parsed before it
+            table.clear()
+            parent = table.getparent()
+            while parent is not None and table.getprevious() is not None:
+                del parent[0]
+    return ''.join(tables)
+
+
+def get_soup(url, ver=True, to=None):
     """
     Turns a URL into a parsed BeautifulSoup object and
     raises exceptions for scraping modules
@@ -19,9 +516,114 @@ def get_soup(url, ver=True, to=30):
     args:
         url (str): URL to parse
         ver (bool): Skips certificate verification when set to False
-        to (num): Number of seconds until request timeout
+        to (num): Number of seconds until request timeout. Uses TIMEOUT if None
     """
-    r = requests.get(url, verify=ver, timeout=to)
-    r.raise_for_status()
+    r = get(url, ver, to)
     # lxml used for speed
-    return BeautifulSoup(r.text, 'lxml')
+    with span('soup'):
+        return BeautifulSoup(r.text, 'lxml')
+
+
+def parse_soup(response, parse_only=None):
+    """
+    Default document parser for fetch_many
+
+    args:
+        response (requests.Response)
+        parse_only (SoupStrainer): Only builds matching elements if given
+
+    returns:
+        BeautifulSoup
+    """
+    with span('soup'):
+        return BeautifulSoup(response.text, 'lxml', parse_only=parse_only)
+
+
+async def afetch_many(urls, ver=True, to=None, per_host=None, parse=parse_soup,
+                      return_exceptions=False, max_workers=None):
+    """
+    Fetches and parses many URLs concurrently, yielding documents as they complete.
+    Requests run on a thread pool through the shared session. At most per_host
+    requests are in flight to one host at a time, and each host's rate limit is
+    waited on in the event loop, so politeness delays overlap with parsing.
+    Different hosts don't wait on each other.
+
+    args:
+        urls (iterable(str)): URLs to fetch
+        ver (bool): Skips certificate verification when set to False
+        to (num): Number of seconds until request timeout. Uses TIMEOUT if None
+        per_host (int): Maximum concurrent requests per host. Uses CONCURRENCY_PER_HOST if None
+        parse (function): A function of type requests.Response -> document, run on
+            the thread pool
+        return_exceptions (bool): Yields (url, exception) for failed URLs if True.
+            Otherwise the first exception is raised and pending fetches are cancelled
+        max_workers (int): Size of the thread pool. Uses POOL_MAXSIZE * 2 if None
+
+    yields:
+        (str, document): Each URL and its parsed document, in completion order
+    """
+    urls = list(urls)
+    if not urls:
+        return
+    per_host = CONCURRENCY_PER_HOST if per_host is None else per_host
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_workers or POOL_MAXSIZE * 2)
+    semaphores = dict()
+    done = asyncio.Queue()
+    metrics = get_metrics()
+
+    def fetch(url):
+        return parse(_get(url, ver, to, True, True))
+
+    async def worker(url):
+        host = urlsplit(url).netloc
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(per_host)
+        async with semaphores[host]:
+            wait = RATE_LIMITER.reserve(url)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if metrics is not None:
+                metrics.add_time('rate_limit', wait)
+            try:
+                # Runs in a copy of the task's context so parse functions log to the caller's barometer
+                document = await loop.run_in_executor(executor, contextvars.copy_context().run, fetch, url)
+            except Exception as e:
+                await done.put((url, e, True))
+            else:
+                await done.put((url, document, False))
+
+    tasks = [loop.create_task(worker(url)) for url in urls]
+    try:
+        for _ in range(len(tasks)):
+            url, result, failed = await done.get()
+            if failed and not return_exceptions:
+                raise result
+            yield url, result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        executor.shutdown(wait=False)
+
+
+def fetch_many(urls, **kwargs):
+    """
+    Synchronous wrapper around afetch_many for scrapers' page loops. Takes the
+    same arguments.
+
+    yields:
+        (str, document): Each URL and its parsed document, in completion order
+    """
+    loop = asyncio.new_event_loop()
+    agen = afetch_many(urls, **kwargs)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
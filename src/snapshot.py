@@ -0,0 +1,171 @@
+"""
+Title: Snapshot
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Stores fetched responses in an SQLite file so a night's scrape can be
+replayed later without network access. See scraper_base.use_snapshot.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+
+import scraper_base
+
+
+# Request headers dropped while recording, so servers always send the full body
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+# Response headers describing the encoded transfer, which don't apply to the stored body
+TRANSFER_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    encoding TEXT,
+    content BLOB NOT NULL,
+    fetched REAL NOT NULL
+)
+'''
+
+
+class SnapshotMiss(requests.exceptions.ConnectionError):
+    pass
+
+
+class Snapshot:
+    """
+    Responses keyed by URL, with zlib-compressed bodies. Every response is kept,
+    including errors like the 404 that ends the calendar scrape, and the latest
+    response to a URL replaces earlier ones. Safe to use from several threads;
+    processes forked after opening get their own connection.
+    """
+
+    def __init__(self, path):
+        """
+        args:
+            path (str): SQLite file. Created if missing
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def store(self, url, response, compressed=None):
+        """
+        args:
+            url (str): Requested URL. Redirected responses are stored under it
+            response (requests.Response)
+            compressed (bytes): The body already compressed with zlib. Compresses
+                response.content if None
+        """
+        if compressed is None:
+            compressed = zlib.compress(response.content)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in TRANSFER_HEADERS}
+        row = (url, response.status_code, json.dumps(headers), response.encoding, compressed, time.time())
+        with self._lock:
+            connection = self._connect()
+            connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)', row)
+            connection.commit()
+
+    def load(self, url):
+        """
+        returns:
+            requests.Response: The recorded response to url, or None
+        """
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT status, headers, encoding, content FROM responses WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        status, headers, encoding, content = row
+        return scraper_base.build_response(url, status, zlib.decompress(content), json.loads(headers), encoding)
+
+    def urls(self):
+        """
+        returns:
+            list(str): Every recorded URL
+        """
+        with self._lock:
+            return [url for url, in self._connect().execute('SELECT url FROM responses ORDER BY url')]
+
+    def recorder(self, fetcher):
+        """
+        args:
+            fetcher (function): Fetcher that sends the actual requests
+
+        returns:
+            function: Fetcher that stores every response fetcher returns.
+                Streamed responses are stored once their body is read to the end
+        """
+        def record(url, **kwargs):
+            headers = kwargs.get('headers')
+            if headers:
+                kwargs['headers'] = {k: v for k, v in headers.items() if k not in CONDITIONAL_HEADERS}
+            r = fetcher(url, **kwargs)
+            if kwargs.get('stream'):
+                self._record_stream(url, r)
+            else:
+                self.store(url, r)
+            return r
+        return record
+
+    def _record_stream(self, url, response):
+        """
+        Makes a streamed response compress its body as it's read, like
+        scraper_base.download reads it, so only the compressed body is held.
+        The response is stored once iter_content reaches the end of the body.
+        """
+        iter_content = response.iter_content
+
+        def recording_iter_content(chunk_size=1, decode_unicode=False):
+            compressor = zlib.compressobj()
+            parts = []
+            for chunk in iter_content(chunk_size, decode_unicode):
+                parts.append(compressor.compress(chunk))
+                yield chunk
+            parts.append(compressor.flush())
+            self.store(url, response, b''.join(parts))
+
+        response.iter_content = recording_iter_content
+
+    def replay(self, url, **kwargs):
+        """
+        Fetcher serving recorded responses
+
+        returns:
+            requests.Response
+
+        raises:
+            SnapshotMiss: url wasn't recorded
+        """
+        r = self.load(url)
+        if r is None:
+            raise SnapshotMiss(f'{url} is not in snapshot {self.path}')
+        return r
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
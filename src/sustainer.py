@@ -11,30 +11,177 @@ from club_scraper import ClubScraper
 from course_scraper import CourseScraper
 from schedules_scraper import SchedulesScraper
 from location_scraper import LocationScraper
+import barometer
+import scraper_base
 
-import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import json
+import multiprocessing
+import os.path
+import traceback
 
 
-def scrape_all(filename, log_level=8, verbosity=8):
+# Maps each key of the JSON output to the scraper that produces it
+SCRAPERS = {
+    'calendar_data': CalendarScraper,
+    'club_scraper': ClubScraper,
+    'course_scraper': CourseScraper,
+    'schedules_scraper': SchedulesScraper,
+    'location_scraper': LocationScraper,
+}
+# Scrapers that can skip unchanged pages and upload only changes with a manifest
+INCREMENTAL_SCRAPERS = ('calendar_data', 'club_scraper', 'course_scraper', 'location_scraper')
+
+
+def run_scraper(key, filename, log_level=8, verbosity=8, manifest_dir=None, graph_file=None, export_dir=None,
+                settings=None):
+    """
+    Runs a single scraper. Module-level so it can be sent to worker processes.
+
+    args:
+        key (str): Key of the scraper in SCRAPERS
+        filename (str): Log file for the scraper
+        manifest_dir (str): Directory of the scrapers' manifest files. Runs a
+            full scrape and upload if None
+        graph_file (str): File the course scraper saves its dependency graph to, if any
+        export_dir (str): Directory the calendar scraper writes calendar.ics and its
+            change feed, calendar_feed.jsonl, to, if any
+        settings (dict): Settings of the parent process to apply first, for
+            workers that don't inherit them (see worker_settings)
+
+    returns:
+        str: The scraper's CSV string
+    """
+    if settings is not None:
+        barometer.configure_logfiles(**settings['logfiles'])
+        scraper_base.apply_settings(settings['scraper_base'])
+    kwargs = dict()
+    # Nightly runs cover every college for the current and upcoming terms, not just CENG
+    if key == 'schedules_scraper':
+        kwargs['all_colleges'] = True
+    if manifest_dir is not None and key in INCREMENTAL_SCRAPERS:
+        kwargs['manifest'] = os.path.join(manifest_dir, f'{key}.json')
+    if graph_file is not None and key == 'course_scraper':
+        kwargs['graph'] = graph_file
+    if export_dir is not None and key == 'calendar_data':
+        kwargs['ics'] = os.path.join(export_dir, 'calendar.ics')
+        kwargs['feed'] = os.path.join(export_dir, 'calendar_feed.jsonl')
+    return SCRAPERS[key]().scrape(logfile=filename, log_level=log_level, verbosity=verbosity, **kwargs)
+
+
+def worker_settings():
+    """
+    returns:
+        dict: The log file, session, cache and snapshot settings of this process,
+            which spawned worker processes don't inherit. See run_scraper
+    """
+    return {'logfiles': barometer.logfile_settings(), 'scraper_base': scraper_base.settings()}
+
+
+@barometer.barometer
+def report_failures(failures):
+    """
+    Logs scrapers that raised in a worker instead of returning, e.g. because
+    their worker process died
+
+    args:
+        failures (dict(str:str)): Traceback of each failed scraper's key
+    """
+    for key, tb in failures.items():
+        barometer.log(barometer.ERR, "%s failed:\n%s", key, tb)
+
+
+def scraper_logfile(filename, key):
+    """
+    returns:
+        str: filename with the scraper key inserted before the extension,
+            e.g. 'scraper.txt' -> 'scraper.course_scraper.txt'
+    """
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{key}{ext}'
+
+
+def scrape_all(filename, log_level=8, verbosity=8, concurrent=False, workers=None, use_processes=False,
+               manifest_dir=None, graph_file=None, export_dir=None, snapshot=None, snapshot_mode='replay'):
     """
     Runs all scrapers
 
+    args:
+        filename (str): Log file name
+        concurrent (bool): Runs the scrapers at the same time in a worker pool
+            if True. Each scraper then logs to its own file (see scraper_logfile),
+            and a scraper that fails leaves None in the output without affecting
+            the others
+        workers (int): Number of workers. Uses one per scraper if None
+        use_processes (bool): Uses a process pool instead of a thread pool, so
+            CPU-bound parsing isn't serialized by the GIL. Workers are spawned
+            and configured with this process' settings (see worker_settings)
+        manifest_dir (str): Directory of manifest files from previous runs. If
+            given, scrapers that support it skip unchanged pages and upload only
+            changed records
+        graph_file (str): File to save the course dependency graph to, if any
+        export_dir (str): Directory to write calendar exports to, if any (see run_scraper)
+        snapshot (str): Snapshot file to run against (see scraper_base.use_snapshot).
+            Uses the network if None
+        snapshot_mode (str): 'replay' serves every page from the snapshot without
+            network access; 'record' fetches pages and stores them in it
+
     returns:
         str: A json string containing the data from each scraper
     """
+    if snapshot is not None:
+        scraper_base.use_snapshot(snapshot, snapshot_mode)
+    try:
+        return _scrape_all(filename, log_level, verbosity, concurrent, workers, use_processes, manifest_dir,
+                           graph_file, export_dir)
+    finally:
+        if snapshot is not None:
+            scraper_base.use_snapshot(None)
+
+
+def _scrape_all(filename, log_level, verbosity, concurrent, workers, use_processes, manifest_dir, graph_file,
+                export_dir):
+    """
+    Implements scrape_all()
+    """
     data = dict()
-    data['calendar_data'] = CalendarScraper().scrape(logfile=filename, log_level=log_level, verbosity=verbosity)
-    data['club_scraper'] = ClubScraper().scrape(logfile=filename, log_level=log_level, verbosity=verbosity)
-    data['course_scraper'] = CourseScraper().scrape(logfile=filename, log_level=log_level, verbosity=verbosity)
-    data['schedules_scraper'] = SchedulesScraper().scrape(logfile=filename, log_level=log_level, verbosity=verbosity)
-    data['location_scraper'] = LocationScraper().scrape(logfile=filename, log_level=log_level, verbosity=verbosity)
+    if not concurrent:
+        for key in SCRAPERS:
+            data[key] = run_scraper(key, filename, log_level, verbosity, manifest_dir, graph_file, export_dir)
+        return json.dumps(data)
+
+    # Workers are spawned on every platform, so they behave the same on Linux as
+    # on macOS and Windows, and get the settings of this process explicitly
+    if use_processes:
+        executor = ProcessPoolExecutor(max_workers=workers or len(SCRAPERS),
+                                       mp_context=multiprocessing.get_context('spawn'))
+        settings = worker_settings()
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers or len(SCRAPERS))
+        settings = None
+    failures = dict()
+    with executor:
+        futures = {key: executor.submit(run_scraper, key, scraper_logfile(filename, key), log_level, verbosity,
+                                      manifest_dir, graph_file, export_dir, settings)
+                   for key in SCRAPERS}
+        for key, future in futures.items():
+            try:
+                data[key] = future.result()
+            except Exception:
+                failures[key] = traceback.format_exc()
+                data[key] = None
+    if failures:
+        report_failures(failures, logfile=filename, log_level=log_level, verbosity=verbosity, metrics=False)
     return json.dumps(data)
 
 
 if __name__=='__main__':
-    now = datetime.datetime.now()
-    filename = f'{now.strftime("%Y-%m-%d")}.txt'
-    data = scrape_all(filename)
+    # Logs are streamed to scraper.txt and rotated daily, keeping a month of gzipped logs
+    barometer.configure_logfiles(max_bytes=50 * 1024 * 1024, interval=24 * 60 * 60, compress=True, backups=30)
+    filename = 'scraper.txt'
+    # Unchanged pages are revalidated instead of downloaded again on nightly runs
+    scraper_base.configure_cache()
+    data = scrape_all(filename, concurrent=True, manifest_dir='.scraper_manifest', graph_file='course_graph.json',
+                      export_dir='exports')
     with open('data.json', 'w') as d:
         d.write(data)
@@ -0,0 +1,200 @@
+"""
+Title: Uploader
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Uploads scraped records to the new_data ingestion API in gzipped,
+streamed batches over the shared session, retrying failed batches
+"""
+
+import json
+import time
+import zlib
+
+import requests
+
+import scraper_base
+from barometer import count, log, span, timed, ALERT, DEBUG, INFO, WARNING
+from rate_limiter import parse_retry_after
+
+
+# Number of records sent per POST
+BATCH_SIZE = 500
+# Number of times a failed batch is retried
+RETRIES = 3
+# Seconds before the first retry; doubles after every failed attempt
+BACKOFF = 1.0
+# Statuses worth retrying; anything else in 4xx means the payload is bad
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class UploadError(requests.exceptions.RequestException):
+    pass
+
+
+def batched(iterable, size):
+    """
+    Splits an iterable into lists of at most size items without reading ahead
+
+    yields:
+        list
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Uploader:
+    """
+    Posts records to one collection of the ingestion API. Each batch is sent as
+    {"<collection>": [records...]} with the JSON generated and compressed while
+    it's sent, so only one batch of records is held at a time.
+    """
+
+    def __init__(self, url, collection, batch_size=None, compress=True, retries=None, backoff=None,
+                 timeout=60):
+        """
+        args:
+            url (str): Ingestion API endpoint, e.g. 'http://0.0.0.0:8080/new_data/courses'
+            collection (str): Key the records are sent under, e.g. 'courses'
+            batch_size (int): Number of records per POST. Uses BATCH_SIZE if None
+            compress (bool): Sends gzip-encoded bodies if True
+            retries (int): Number of retries per batch. Uses RETRIES if None
+            backoff (num): Seconds before the first retry. Uses BACKOFF if None
+            timeout (num): Number of seconds until request timeout
+        """
+        self.url = url
+        self.collection = collection
+        self.batch_size = BATCH_SIZE if batch_size is None else batch_size
+        self.compress = compress
+        self.retries = RETRIES if retries is None else retries
+        self.backoff = BACKOFF if backoff is None else backoff
+        self.timeout = timeout
+
+    def generate_body(self, batch, deleted=None):
+        """
+        Generates the JSON body of one batch in chunks
+
+        args:
+            batch (list(dict)): Records to send
+            deleted (list(str)): Keys of deleted records to send, if any
+
+        yields:
+            bytes
+        """
+        compressor = zlib.compressobj(wbits=31) if self.compress else None
+
+        def encode(text):
+            data = text.encode('utf-8')
+            return compressor.compress(data) if compressor else data
+
+        yield encode(f'{{{json.dumps(self.collection)}: [')
+        for i, record in enumerate(batch):
+            yield encode(f'{"," if i else ""}{json.dumps(record)}')
+        yield encode(']')
+        if deleted is not None:
+            yield encode(f', "deleted": {json.dumps(deleted)}')
+        yield encode('}')
+        if compressor:
+            yield compressor.flush()
+
+    def post_batch(self, batch, deleted=None):
+        """
+        Sends one batch, retrying with exponential backoff on connection errors
+        and retryable statuses
+
+        args:
+            batch (list(dict)): Records to send
+            deleted (list(str)): Keys of deleted records to send, if any
+
+        returns:
+            requests.Response
+        """
+        headers = {'Content-Type': 'application/json'}
+        if self.compress:
+            headers['Content-Encoding'] = 'gzip'
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt
+            start = time.perf_counter()
+            try:
+                with span('upload'):
+                    r = scraper_base.get_session().post(self.url, data=self.generate_body(batch, deleted),
+                                                        headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                scraper_base.record_request(self.url, None, 0, time.perf_counter() - start)
+                error = e
+            else:
+                scraper_base.record_request(self.url, r.status_code, len(r.content), time.perf_counter() - start)
+                if r.status_code not in RETRY_STATUSES:
+                    r.raise_for_status()
+                    return r
+                error = UploadError(f'{r.status_code} response from {self.url}')
+                delay = parse_retry_after(r.headers.get('Retry-After')) or delay
+            if attempt < self.retries:
+                log(WARNING, "Upload to %s failed (%s). Retrying in %ss", self.url, error, delay)
+                time.sleep(delay)
+        raise UploadError(f'Upload to {self.url} failed after {self.retries + 1} attempts: {error}')
+
+    def upload(self, records, deleted=None):
+        """
+        Sends records in batches. Deleted keys are sent with the last batch
+
+        args:
+            records (iterable(dict)): Records to send. Read one batch at a time
+            deleted (list(str)): Keys of deleted records, if any
+
+        returns:
+            int: Number of records sent
+        """
+        sent = 0
+        pending = None
+        for batch in batched(records, self.batch_size):
+            if pending is not None:
+                self.post_batch(pending)
+                sent += len(pending)
+                count('records_uploaded', len(pending))
+            pending = batch
+        if pending is not None or deleted:
+            self.post_batch(pending or [], deleted)
+            sent += len(pending or [])
+            count('records_uploaded', len(pending or []))
+        log(DEBUG, "Uploaded %s %s to %s", sent, self.collection, self.url)
+        return sent
+
+    def sync(self, records, key=None, transform=None, manifest=None):
+        """
+        Uploads records, or only the ones that changed since the last run if a
+        manifest is given. The manifest is saved only after a successful upload,
+        so failed uploads are retried next run.
+
+        args:
+            records (list(dict)): All scraped records
+            key (function): A function of type dict -> str giving each record's
+                unique key. Required with a manifest
+            transform (function): A function of type dict -> dict applied to each
+                record before it's sent
+            manifest (Manifest): Manifest from the previous run, if any
+
+        returns:
+            bool: True if the upload succeeded
+        """
+        transform = timed('transform', transform) if transform else (lambda record: record)
+        try:
+            if manifest is None:
+                self.upload(transform(record) for record in records)
+            else:
+                delta = manifest.diff(self.collection, records, key)
+                if delta:
+                    self.upload((transform(record) for record in delta.upserted), delta.deleted)
+                else:
+                    log(INFO, "No %s changed since last run. Skipping upload.", self.collection)
+                manifest.save()
+        except requests.exceptions.RequestException as e:
+            log(ALERT, "Failed to upload %s: %s", self.collection, e)
+            return False
+        return True
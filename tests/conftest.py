@@ -0,0 +1,13 @@
+"""
+Title: Test configuration
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Puts src/ on the import path so tests import modules the way the
+scrapers import each other. Run from the repository root: python -m pytest
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,214 @@
+"""
+Title: Barometer tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Message filtering and formatting, log file rotation and buffering,
+and run metrics
+"""
+
+import glob
+import gzip
+import json
+import os
+
+import barometer as barometer_module
+from barometer import barometer, count, log, span, timed, LogFile, DEBUG, ERR, INFO, WARNING
+from scraper_base import record_request
+
+
+class Message:
+    """
+    Counts how often it's converted to str
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.conversions = 0
+
+    def __str__(self):
+        self.conversions += 1
+        return self.text
+
+
+@barometer
+def log_messages(messages):
+    for msg_type, msg, args in messages:
+        log(msg_type, msg, *args)
+
+
+def run(messages, level=INFO):
+    _, lines = log_messages(messages, verbosity=False, log_level=level, add_timestamp=False, logfile=None,
+                            metrics=False)
+    return lines
+
+
+def test_filtered_messages_are_not_converted():
+    msg, arg = Message('skipped %s'), Message('argument')
+    assert 'skipped' not in run([(DEBUG, msg, (arg,))])
+    assert msg.conversions == 0
+    assert arg.conversions == 0
+
+
+def test_kept_messages_are_formatted():
+    msg, arg = Message('kept %s'), Message('argument')
+    lines = run([(WARNING, msg, (arg,)), (INFO, 'plain', ()), (DEBUG, 'hidden', ())])
+    assert lines.splitlines()[:2] == [f'{WARNING.icon} kept argument', f'{INFO.icon} plain']
+    assert 'hidden' not in lines
+    assert msg.conversions == 1
+
+
+def test_messages_without_type_use_default(capsys):
+    # The default NO_LOG type is only displayed, never logged
+    lines = run([('percent %s kept', 'signs', ())], level=DEBUG)
+    assert 'percent signs kept' not in lines
+    assert 'percent signs kept' in capsys.readouterr().out
+
+
+def lines(n):
+    return [f'line {i:02d} {"x" * 21}\n' for i in range(n)]
+
+
+def read_logs(tmp_path):
+    """
+    returns:
+        (list(str), str): Contents of the rotated files, oldest first, and of the current file
+    """
+    rotated = []
+    for path in sorted(glob.glob(str(tmp_path / 'scraper.*.txt*')), key=os.path.getmtime):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            rotated.append(f.read())
+    with open(tmp_path / 'scraper.txt') as f:
+        return rotated, f.read()
+
+
+def test_rotates_at_size_limit(tmp_path):
+    log_file = LogFile(str(tmp_path / 'scraper.txt'), max_bytes=100, buffer_size=0)
+    for line in lines(10):
+        log_file.write(line)
+    log_file.close()
+    rotated, current = read_logs(tmp_path)
+    # 30 byte lines, so 3 fit in each file
+    assert [len(text) for text in rotated] == [90, 90, 90]
+    assert ''.join(rotated) + current == ''.join(lines(10))
+
+
+def test_keeps_backup_count(tmp_path):
+    log_file = LogFile(str(tmp_path / 'scraper.txt'), max_bytes=30, backups=2, compress=True, buffer_size=0)
+    for line in lines(6):
+        log_file.write(line)
+    log_file.close()
+    rotated, current = read_logs(tmp_path)
+    assert all(path.endswith('.gz') for path in glob.glob(str(tmp_path / 'scraper.*.txt*')))
+    # The newest rotated files are kept
+    assert rotated == lines(6)[3:5]
+    assert current == lines(6)[5]
+
+
+def test_rotates_by_interval(tmp_path, monkeypatch):
+    now = [86400 * 100 + 10.0]
+    monkeypatch.setattr(barometer_module.time, 'time', lambda: now[0])
+    log_file = LogFile(str(tmp_path / 'scraper.txt'), interval=86400, buffer_size=0)
+    log_file.write('monday\n')
+    now[0] += 86400
+    log_file.write('tuesday\n')
+    log_file.close()
+    assert read_logs(tmp_path) == (['monday\n'], 'tuesday\n')
+
+    # A file left from an earlier period is rotated when it's opened again
+    os.utime(tmp_path / 'scraper.txt', (now[0], now[0]))
+    now[0] += 86400
+    LogFile(str(tmp_path / 'scraper.txt'), interval=86400).close()
+    rotated, current = read_logs(tmp_path)
+    assert sorted(rotated) == ['monday\n', 'tuesday\n']
+    assert current == ''
+
+
+def test_buffers_until_flush_or_close(tmp_path):
+    path = tmp_path / 'scraper.txt'
+    log_file = LogFile(str(path), buffer_size=2 ** 20, flush_interval=3600)
+    log_file.write('buffered\n')
+    assert path.read_text() == ''
+    log_file.write('urgent\n', flush=True)
+    assert path.read_text() == 'buffered\nurgent\n'
+    log_file.write('at close\n')
+    log_file.close()
+    assert path.read_text() == 'buffered\nurgent\nat close\n'
+    # Closing twice is harmless
+    log_file.close()
+
+
+@barometer
+def log_error_then_check(path):
+    log(INFO, 'buffered')
+    log(ERR, 'failed')
+    with open(path) as f:
+        return f.read()
+
+
+def test_errors_are_written_at_once(tmp_path):
+    path = str(tmp_path / 'scraper.txt')
+    barometer_module.configure_logfiles(buffer_size=2 ** 20, flush_interval=3600)
+    try:
+        written = log_error_then_check(path, verbosity=False, log_level=INFO, add_timestamp=False,
+                                       logfile=path, metrics=False)
+    finally:
+        barometer_module.configure_logfiles()
+    assert written.splitlines() == [f'{INFO.icon} buffered', f'{ERR.icon} failed']
+
+
+@barometer
+def staged_run(clock):
+    for _ in range(2):
+        with span('fetch'):
+            clock[0] += 0.5
+    parse = timed('parse', lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    parse(2.0)
+    parse(1.0)
+    count('records', 40)
+    count('records', 2)
+    record_request('https://catalog.calpoly.edu/coursesaz/', 200, 1000, 0.2)
+    record_request('https://catalog.calpoly.edu/coursesaz/csc/', 304, 0, 0.1, cached=True)
+    record_request('https://catalog.calpoly.edu/missing/', 404, 10, 0.3)
+    record_request('https://schedules.calpoly.edu/', None, 0, 5.0)
+
+
+def test_metrics_summary(tmp_path, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(barometer_module.time, 'perf_counter', lambda: clock[0])
+    path = tmp_path / 'scraper.metrics.jsonl'
+    staged_run(clock, verbosity=False, log_level=False, metrics=str(path))
+    staged_run(clock, verbosity=False, log_level=False, metrics=str(path))
+
+    summaries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(summaries) == 2
+    summary = summaries[0]
+    assert summary['function'] == 'staged_run'
+    assert summary['wall_time'] == 4.0
+    assert summary['spans'] == {'fetch': {'count': 2, 'total': 1.0, 'max': 0.5},
+                                'parse': {'count': 2, 'total': 3.0, 'max': 2.0}}
+    assert summary['counters'] == {'records': 42}
+
+    catalog = summary['hosts']['catalog.calpoly.edu']
+    assert catalog['requests'] == 3
+    assert catalog['errors'] == 1
+    assert catalog['cached'] == 1
+    assert catalog['bytes'] == 1010
+    assert catalog['statuses'] == {'200': 1, '304': 1, '404': 1}
+    assert abs(catalog['latency_mean'] - 0.2) < 1e-9
+    assert catalog['latency_max'] == 0.3
+    assert summary['hosts']['schedules.calpoly.edu']['statuses'] == {'None': 1}
+    assert summary['hosts']['schedules.calpoly.edu']['errors'] == 1
+
+
+def test_spans_outside_decorated_functions_do_nothing():
+    with span('fetch'):
+        count('records')
+    record_request('https://catalog.calpoly.edu/', 200, 10, 0.1)
+    assert timed('parse', lambda: 'parsed')() == 'parsed'
+
+
+def test_finished_line_is_debug():
+    assert 'Finished in' not in run([], level=INFO)
+    assert 'Finished in' in run([], level=DEBUG)
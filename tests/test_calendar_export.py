@@ -0,0 +1,101 @@
+"""
+Title: Calendar export tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: iCalendar output and the change feed between runs
+"""
+
+import datetime
+import io
+import json
+import os
+
+from calendar_export import CalendarFeed, escape_text, fold, iter_ics, write_ics
+from calendar_model import Event
+
+STAMP = datetime.datetime(2020, 6, 1, 12, 0, tzinfo=datetime.timezone.utc)
+BREAK = Event(datetime.date(2020, 3, 21), datetime.date(2020, 3, 29), 'Spring break; no classes')
+FINALS = Event(datetime.date(2020, 6, 8), datetime.date(2020, 6, 12), 'Final examinations')
+DAY = Event(datetime.date(2020, 7, 3), datetime.date(2020, 7, 3), 'Independence Day observed, campus closed')
+
+
+def test_fold_keeps_lines_short_and_characters_whole():
+    line = 'SUMMARY:' + 'é' * 100
+    folded = fold(line)
+    lines = folded.split('\r\n')[:-1]
+    assert all(len(part.encode('utf-8')) <= 75 for part in lines)
+    assert all(part.startswith(' ') for part in lines[1:])
+    assert ''.join(part[1:] if i else part for i, part in enumerate(lines)) == line
+    assert fold('VERSION:2.0') == 'VERSION:2.0\r\n'
+
+
+def test_escape_text():
+    assert escape_text('a,b;c\\d\ne') == r'a\,b\;c\\d\ne'
+
+
+def test_ics_has_one_all_day_event_per_event():
+    text = ''.join(iter_ics([BREAK, FINALS, BREAK], stamp=STAMP))
+    assert text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n')
+    assert text.count('BEGIN:VEVENT') == 2
+    assert 'DTSTART;VALUE=DATE:20200321\r\n' in text
+    # DTEND is the day after an all-day event ends
+    assert 'DTEND;VALUE=DATE:20200330\r\n' in text
+    assert 'SUMMARY:Spring break\\; no classes\r\n' in text
+    assert 'DTSTAMP:20200601T120000Z\r\n' in text
+
+
+def test_write_ics(tmp_path):
+    path = str(tmp_path / 'calendar' / 'academic.ics')
+    write_ics([FINALS], path, stamp=STAMP)
+    with open(path, 'rb') as f:
+        assert f.read().decode('utf-8') == ''.join(iter_ics([FINALS], stamp=STAMP))
+    assert os.listdir(tmp_path / 'calendar') == ['academic.ics']
+
+
+def test_feed_records_changes_between_runs(tmp_path):
+    feed = CalendarFeed(str(tmp_path / 'feed.jsonl'))
+    first = feed.record([BREAK, FINALS], STAMP)
+    assert first['run'] == 1 and len(first['added']) == 2 and first['removed'] == []
+    second = feed.record([FINALS, DAY], STAMP)
+    assert [record['summary'] for record in second['added']] == [DAY.text]
+    assert len(second['removed']) == 1
+    assert feed.record([FINALS, DAY], STAMP)['added'] == []
+
+    run, events = feed.current()
+    assert run == 3
+    assert sorted(record['summary'] for record in events.values()) == [FINALS.text, DAY.text]
+
+
+def test_changes_since_nets_out_changes(tmp_path):
+    feed = CalendarFeed(str(tmp_path / 'feed.jsonl'))
+    feed.record([BREAK, FINALS], STAMP)
+    feed.record([FINALS, DAY], STAMP)
+    feed.record([BREAK, FINALS], STAMP)
+
+    # BREAK was removed and added back, DAY added and removed again
+    assert feed.changes_since(1) == {'since': 1, 'run': 3, 'added': [], 'removed': []}
+    changes = feed.changes_since(2)
+    assert [record['summary'] for record in changes['added']] == [BREAK.text]
+    assert len(changes['removed']) == 1
+    assert len(feed.changes_since(0)['added']) == 2
+
+    out = io.StringIO()
+    feed.write_changes(2, out)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines[0] == {'since': 2, 'run': 3}
+    assert lines[1] == {'added': changes['added'][0]}
+    assert lines[2] == {'removed': changes['removed'][0]}
+
+
+def test_feed_state_is_rebuilt_when_stale(tmp_path):
+    feed = CalendarFeed(str(tmp_path / 'feed.jsonl'))
+    feed.record([BREAK], STAMP)
+    feed.record([BREAK, FINALS], STAMP)
+    expected = feed.current()
+    with open(feed.state_path, 'w') as f:
+        json.dump({'run': 1, 'size': 1, 'events': {}}, f)
+    assert feed.current() == expected
+    os.remove(feed.state_path)
+    assert feed.current() == expected
+    assert feed.record([BREAK, FINALS], STAMP)['added'] == []
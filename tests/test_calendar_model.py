@@ -0,0 +1,70 @@
+"""
+Title: Calendar model tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Date and week queries and per-day rows, checked against expanding
+every event into its days
+"""
+
+import datetime
+import random
+
+from calendar_model import CalendarModel, Event, ONE_DAY, legacy_date
+
+
+def random_events(n, seed=0):
+    rng = random.Random(seed)
+    first = datetime.date(2020, 9, 1)
+    events = []
+    for i in range(n):
+        start = first + rng.randrange(300) * ONE_DAY
+        # Mostly single days, some quarter-long
+        length = rng.choice([0, 0, 0, 1, 4, 30, 90])
+        events.append(Event(start, start + length * ONE_DAY, f'Event {i}'))
+    return events
+
+
+def expected_on(events, date):
+    return sorted((e for e in events if e.start <= date <= e.end), key=lambda e: (e.start, events.index(e)))
+
+
+def test_on_matches_scan():
+    events = random_events(300)
+    model = CalendarModel(events)
+    date = datetime.date(2020, 8, 1)
+    while date < datetime.date(2021, 10, 1):
+        assert model.on(date) == expected_on(events, date)
+        date += ONE_DAY
+
+
+def test_week():
+    events = [
+        Event(datetime.date(2020, 3, 29), datetime.date(2020, 3, 29), 'Sunday before'),
+        Event(datetime.date(2020, 3, 30), datetime.date(2020, 3, 30), 'Monday'),
+        Event(datetime.date(2020, 1, 6), datetime.date(2020, 6, 12), 'Quarter'),
+        Event(datetime.date(2020, 4, 5), datetime.date(2020, 4, 6), 'Sunday into Monday'),
+        Event(datetime.date(2020, 4, 6), datetime.date(2020, 4, 6), 'Monday after'),
+    ]
+    texts = [event.text for event in CalendarModel(events).week(datetime.date(2020, 4, 2))]
+    assert texts == ['Quarter', 'Monday', 'Sunday into Monday']
+
+
+def test_daily_rows_match_expanded_days():
+    events = random_events(100, seed=1)
+    days = dict()
+    for event in events:
+        date = event.start
+        while date <= event.end:
+            days.setdefault(date, []).append(event.text)
+            date += ONE_DAY
+    rows = list(CalendarModel(events).daily_rows())
+    assert [row['DATE'] for row in rows] == [legacy_date(date) for date in sorted(days)]
+    assert [row['EVENTS'] for row in rows] == [days[date] for date in sorted(days)]
+    assert rows[0]['MONTH'] == sorted(days)[0].strftime('%B')
+
+
+def test_records_round_trip():
+    event = Event(datetime.date(2020, 3, 30), datetime.date(2020, 4, 3), 'Spring break')
+    assert event.to_record() == {'START_DATE': '2020-03-30', 'END_DATE': '2020-04-03', 'EVENT': 'Spring break'}
+    assert Event.from_record(event.to_record()) == event
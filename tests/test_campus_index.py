@@ -0,0 +1,89 @@
+"""
+Title: Campus index tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Nearest-location and point-in-shape queries, checked against
+scanning every location
+"""
+
+import math
+import random
+
+import pytest
+
+from campus_index import LINE, POINT, SHAPE, CampusIndex, Location, to_location
+
+
+def square(lon, lat, size):
+    return [(lon, lat), (lon + size, lat), (lon + size, lat + size), (lon, lat + size)]
+
+
+def random_locations(n, seed=0):
+    rng = random.Random(seed)
+    locations = []
+    for i in range(n):
+        lon, lat = -120.665 + rng.random() / 100, 35.30 + rng.random() / 100
+        kind = (POINT, LINE, SHAPE)[i % 3]
+        if kind == POINT:
+            coordinates = [(lon, lat)]
+        elif kind == LINE:
+            coordinates = [(lon, lat), (lon + rng.random() / 2000, lat + rng.random() / 2000)]
+        else:
+            coordinates = square(lon, lat, rng.random() / 2000)
+        locations.append(Location(f'{i} Building {i}', str(i), f'Building {i}', kind, coordinates))
+    return locations
+
+
+def test_to_location():
+    location = to_location('14 Frank E. Pilling', {'coordinates': '-120.66,35.30,0 -120.65,35.31,0',
+                                                   'LineString': ''})
+    assert location == Location('14 Frank E. Pilling', '14', 'Frank E. Pilling', LINE,
+                                [(-120.66, 35.30), (-120.65, 35.31)])
+    assert to_location('Annex', {'LookAt': ''}).building_number == 'Annex'
+    assert to_location('Annex', {'LookAt': ''}).kind == POINT
+
+
+def test_at_finds_smallest_containing_shape():
+    index = CampusIndex([
+        Location('1 Campus', '1', 'Campus', SHAPE, square(-120.67, 35.30, 0.01)),
+        Location('2 Library', '2', 'Library', SHAPE, square(-120.665, 35.305, 0.001)),
+        Location('3 Flagpole', '3', 'Flagpole', POINT, [(-120.6645, 35.3055)]),
+    ])
+    assert index.at(-120.6645, 35.3055).key == '2 Library'
+    assert [l.key for l in index.containing(-120.6645, 35.3055)] == ['2 Library', '1 Campus']
+    assert index.at(-120.668, 35.301).key == '1 Campus'
+    assert index.at(-121.0, 35.0) is None
+
+
+@pytest.mark.parametrize('cell_size', [None, 5.0, 500.0])
+def test_nearest_matches_scan(cell_size):
+    locations = random_locations(150)
+    index = CampusIndex(locations, cell_size)
+    rng = random.Random(1)
+    for _ in range(100):
+        # Some queries fall outside the map
+        lon, lat = -120.67 + rng.random() / 50, 35.295 + rng.random() / 50
+        x, y = index.project(lon, lat)
+        distances = sorted((index._distance(i, x, y), l.key) for i, l in enumerate(index.locations))
+        found = index.nearest(lon, lat, k=3)
+        assert [d for _, d in found] == pytest.approx([d for d, _ in distances[:3]])
+        shapes = index.nearest(lon, lat, kinds={SHAPE})
+        assert shapes[0][0].kind == SHAPE
+
+
+def test_nearest_distance_in_meters():
+    index = CampusIndex([Location('1 A', '1', 'A', POINT, [(-120.66, 35.30)]),
+                         Location('2 B', '2', 'B', POINT, [(-120.66, 35.31)])])
+    (location, distance), = index.nearest(-120.66, 35.301)
+    assert location.key == '1 A'
+    # A thousandth of a degree of latitude is about 111 m
+    assert math.isclose(distance, 111.2, rel_tol=0.01)
+
+
+def test_later_locations_replace_earlier_ones():
+    index = CampusIndex([Location('1 A', '1', 'A', POINT, [(-120.66, 35.30)]),
+                         Location('1 A', '1', 'A', POINT, [(-120.65, 35.30)]),
+                         Location('2 B', '2', 'B', POINT, [])])
+    assert [l.coordinates for l in index.locations] == [[(-120.65, 35.30)]]
+    assert index.nearest(-120.66, 35.30)[0][0].coordinates == [(-120.65, 35.30)]
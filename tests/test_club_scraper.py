@@ -0,0 +1,89 @@
+"""
+Title: Club scraper tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Club directory parsing on a hand-checked listing page and on flat,
+row and container layouts
+"""
+
+import os
+from io import BytesIO
+
+import pytest
+
+from club_scraper import ClubScraper
+
+LISTING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'club_listing.html')
+
+
+def spans(*lines):
+    return ''.join(f'<span>{line}</span>' for line in lines)
+
+
+def parse(body):
+    return list(ClubScraper().iter_clubs(BytesIO(f'<html><body>{body}</body></html>'.encode('utf-8'))))
+
+
+def test_listing():
+    with open(LISTING, 'rb') as f:
+        clubs = list(ClubScraper().iter_clubs(f))
+    assert [club['NAME'] for club in clubs] == ['Aerospace & Rocketry Club', 'Chess Club', 'Society of Women Engineers']
+    assert clubs[0] == {
+        'CONTACT_PERSON': 'Jordan Lee',
+        'CONTACT_EMAIL': 'jlee@calpoly.edu',
+        'CONTACT_PHONE': '805-756-1234',
+        'BOX': '42',
+        'ADVISOR': 'Dr. Ada Byron',
+        'ADVISOR_PHONE': 'NA',
+        'ADVISOR_EMAIL': 'abyron@calpoly.edu',
+        'AFFILIATION': 'College of Engineering',
+        'TYPES': 'Academic, Engineering',
+        'DESCRIPTION': 'Designs and launches high-power rockets.',
+        'CONTACT_EMAIL_2': 'rocketry@calpoly.edu',
+        'NAME': 'Aerospace & Rocketry Club',
+    }
+    assert clubs[1]['CONTACT_PHONE'] == 'NA'
+    assert clubs[1]['ADVISOR_EMAIL'] == 'NA'
+    assert clubs[1]['CONTACT_EMAIL_2'] == 'chess@calpoly.edu'
+    assert clubs[2]['TYPES'] == 'Professional, Cultural'
+
+
+def test_flat_layout():
+    clubs = parse(f'<div>{spans("Club Directory", "Alpha", "Box:", "1", "Contact Email:", "a@x", "Beta", "Box:", "2")}</div>')
+    assert clubs == [{'BOX': '1', 'CONTACT_EMAIL': 'a@x', 'NAME': 'Alpha'}, {'BOX': '2', 'NAME': 'Beta'}]
+
+
+def test_flat_layout_one_span_per_element():
+    lines = ['Club Directory', 'Alpha', 'Website', 'Box:', '1', 'Contact Email:', 'a@x', 'Contact Email:',
+             'Beta', 'Box:', '2', 'Associated Students, Inc.']
+    clubs = parse(''.join(f'<div>{spans(line)}</div>' for line in lines))
+    # The club's own email is missing, so the next club's name isn't taken as it
+    assert clubs == [{'BOX': '1', 'CONTACT_EMAIL': 'a@x', 'CONTACT_EMAIL_2': 'NA', 'NAME': 'Alpha'},
+                     {'BOX': '2', 'NAME': 'Beta'}]
+
+
+@pytest.mark.parametrize('heading', ['', f'<h2>{spans("Club Directory")}</h2>'])
+def test_row_layout(heading):
+    clubs = parse(f'{heading}'
+                  f'<div class=club><p>{spans("Alpha", "Box:", "1")}</p><p>{spans("Contact Person:", "Bob")}</p></div>'
+                  f'<div class=club><p>{spans("Beta", "Box:", "2")}</p></div>')
+    assert clubs == [{'BOX': '1', 'CONTACT_PERSON': 'Bob', 'NAME': 'Alpha'}, {'BOX': '2', 'NAME': 'Beta'}]
+
+
+def test_container_layout():
+    clubs = parse(f'<h2>{spans("Club Directory")}</h2>' + ''.join(
+        f'<div class=club><div>{spans(name)}</div><div>{spans("Website")}</div>'
+        f'<div>{spans("Box:")}</div><div>{spans(box)}</div></div>'
+        for name, box in (('Alpha', '1'), ('Beta', '2'))))
+    assert clubs == [{'BOX': '1', 'NAME': 'Alpha'}, {'BOX': '2', 'NAME': 'Beta'}]
+
+
+def test_missing_value_ends_with_container():
+    clubs = parse(f'<div class=club>{spans("Alpha", "Box:", "1", "Description:")}</div>'
+                  f'<div class=club>{spans("Beta", "Description:", "Chess")}</div>')
+    assert clubs == [{'BOX': '1', 'DESCRIPTION': 'NA', 'NAME': 'Alpha'}, {'DESCRIPTION': 'Chess', 'NAME': 'Beta'}]
+
+
+def test_text_without_fields_is_not_a_club():
+    assert parse(spans('Club Directory', 'Associated Students, Inc.')) == []
@@ -0,0 +1,83 @@
+"""
+Title: Course graph tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Direct and transitive prerequisite queries, cycles and saving
+"""
+
+import pytest
+
+from course_graph import CourseGraph
+
+
+def course(code, prerequisites=(), corequisites=()):
+    department, number = code.split(' ')
+    return {'DEPARTMENT': department, 'COURSE_NUM': number,
+            'PREREQUISITE_COURSES': list(prerequisites), 'COREQUISITE_COURSES': list(corequisites),
+            'CONCURRENT_COURSES': []}
+
+
+@pytest.fixture
+def graph():
+    return CourseGraph.from_courses([
+        course('CSC 101'),
+        course('CSC 202', ['CSC 101']),
+        course('CSC 203', ['CSC 202']),
+        course('CSC 357', ['CSC 202', 'CPE 233'], ['CSC 358']),
+        course('CSC 453', ['CSC 357', 'CSC 203']),
+    ])
+
+
+def test_direct_requisites(graph):
+    assert graph.prerequisites('CSC 357', transitive=False) == ['CSC 202', 'CPE 233']
+    assert graph.requisites('CSC 357', 'corequisites') == ['CSC 358']
+    assert sorted(graph.unlocks('CSC 202', transitive=False)) == ['CSC 203', 'CSC 357']
+
+
+def test_transitive_queries(graph):
+    assert sorted(graph.prerequisites('CSC 453')) == ['CPE 233', 'CSC 101', 'CSC 202', 'CSC 203', 'CSC 357']
+    assert sorted(graph.unlocks('CSC 101')) == ['CSC 202', 'CSC 203', 'CSC 357', 'CSC 453']
+    assert graph.requires('CSC 453', 'CSC 101')
+    assert not graph.requires('CSC 101', 'CSC 453')
+    # Corequisites aren't prerequisites
+    assert not graph.requires('CSC 357', 'CSC 358')
+
+
+def test_unscraped_requisites_are_courses(graph):
+    assert graph.prerequisites('CPE 233') == []
+    assert graph.unlocks('CPE 233') == ['CSC 357', 'CSC 453']
+
+
+def test_unknown_course(graph):
+    assert graph.prerequisites('ART 101') == []
+    assert graph.unlocks('ART 101') == []
+    assert not graph.requires('ART 101', 'CSC 101')
+
+
+def test_cycles():
+    graph = CourseGraph.from_courses([
+        course('EE 1', ['EE 2']),
+        course('EE 2', ['EE 3']),
+        course('EE 3', ['EE 1', 'EE 0']),
+        course('EE 4', ['EE 3']),
+    ])
+    assert sorted(graph.prerequisites('EE 1')) == ['EE 0', 'EE 2', 'EE 3']
+    assert sorted(graph.prerequisites('EE 4')) == ['EE 0', 'EE 1', 'EE 2', 'EE 3']
+    assert sorted(graph.unlocks('EE 0')) == ['EE 1', 'EE 2', 'EE 3', 'EE 4']
+
+
+def test_save_and_load(graph, tmp_path):
+    path = str(tmp_path / 'graph.json')
+    graph.save(path)
+    loaded = CourseGraph.load(path)
+    for code in graph.courses:
+        assert loaded.prerequisites(code) == graph.prerequisites(code)
+        assert loaded.unlocks(code) == graph.unlocks(code)
+        assert loaded.requisites(code, 'corequisites') == graph.requisites(code, 'corequisites')
+
+
+def test_documents_without_course_codes():
+    graph = CourseGraph.from_courses([{'DEPARTMENT': 'CSC', 'COURSE_NUM': '101'}])
+    assert graph.courses == ['CSC 101']
+    assert graph.prerequisites('CSC 101') == []
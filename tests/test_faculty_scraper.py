@@ -0,0 +1,99 @@
+"""
+Title: Faculty scraper tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Employees listed by several departments are scraped once, while different
+people who share a name stay separate
+"""
+
+from io import StringIO
+
+import pandas as pd
+import pytest
+
+import scraper_base
+from faculty_scraper import FacultyScraper
+
+HTML = {'Content-Type': 'text/html; charset=utf-8'}
+DEPARTMENTS = {'CSC': 'https://csc.calpoly.edu', 'CPE': 'https://cpe.calpoly.edu'}
+
+
+def listing(*links):
+    anchors = ''.join(f'<a href="{href}">{text}</a>' for href, text in links)
+    return f'<html><body><a href="/faculty/">Faculty</a>{anchors}</body></html>'
+
+
+def employee(name, username, office='14-235'):
+    return (f'<html><body><h1>{name}</h1><div id="facultyMainBlock">\n'
+            f'Office: {office}\nPhone 805-756-1234\nEmail:\xa0{username}(at)calpoly.edu\n'
+            '<table><tr><th>Days</th></tr></table></div>'
+            '<div class="facultyBlock"><span>Compilers</span></div></body></html>')
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """
+    Serves pages from a dict instead of the network. Returns every requested URL
+    """
+    requested = []
+
+    def start(pages):
+        def fetcher(url, **kwargs):
+            requested.append(url)
+            if url not in pages:
+                return scraper_base.build_response(url, 404, b'Not Found', HTML)
+            return scraper_base.build_response(url, 200, pages[url].encode('utf-8'), HTML)
+
+        scraper_base.set_fetcher(fetcher)
+        return requested
+
+    monkeypatch.setattr(scraper_base.RATE_LIMITER, 'enabled', False)
+    yield start
+    scraper_base.set_fetcher(None)
+
+
+def scrape():
+    return pd.read_csv(StringIO(FacultyScraper().scrape(DEPARTMENTS, workers=1)))
+
+
+def test_same_username_across_departments_is_fetched_once(serve):
+    requested = serve({
+        'https://csc.calpoly.edu/faculty/': listing(('/faculty/jdoe/', 'Jane Doe'), ('/faculty/asmith/', 'Al Smith')),
+        'https://cpe.calpoly.edu/faculty/': listing(('/faculty/JDoe/', 'Dr. Jane Doe')),
+        'https://csc.calpoly.edu/faculty/jdoe/': employee('Jane Doe', 'jdoe'),
+        'https://csc.calpoly.edu/faculty/asmith/': employee('Al Smith', 'asmith'),
+        'https://cpe.calpoly.edu/faculty/JDoe/': employee('Jane Doe', 'jdoe'),
+    })
+    df = scrape()
+    assert list(df['NAME']) == ['Jane Doe', 'Al Smith']
+    assert 'https://cpe.calpoly.edu/faculty/JDoe/' not in requested
+
+
+def test_same_person_under_different_usernames_is_kept_once(serve):
+    requested = serve({
+        'https://csc.calpoly.edu/faculty/': listing(('/faculty/jdoe/', 'Jane Doe')),
+        'https://cpe.calpoly.edu/faculty/': listing(('/faculty/jane-doe/', 'Jane Doe')),
+        'https://csc.calpoly.edu/faculty/jdoe/': employee('Jane Doe', 'jdoe'),
+        'https://cpe.calpoly.edu/faculty/jane-doe/': employee('Jane Doe', 'jdoe', office='20-101'),
+    })
+    df = scrape()
+    # Both pages are fetched, and the first department's row is kept
+    assert 'https://cpe.calpoly.edu/faculty/jane-doe/' in requested
+    assert list(df['NAME']) == ['Jane Doe']
+    assert list(df['OFFICE']) == ['14-235']
+
+
+def test_different_people_sharing_link_text_are_kept(serve):
+    requested = serve({
+        'https://csc.calpoly.edu/faculty/': listing(('/faculty/asmith/', 'A. Smith'), ('/faculty/alsmith/', 'A. Smith')),
+        'https://cpe.calpoly.edu/faculty/': listing(('/faculty/asmith2/', 'A. Smith')),
+        'https://csc.calpoly.edu/faculty/asmith/': employee('Alex Smith', 'asmith'),
+        'https://csc.calpoly.edu/faculty/alsmith/': employee('Alice Smith', 'alsmith'),
+        # Same displayed name as the first, but a different person
+        'https://cpe.calpoly.edu/faculty/asmith2/': employee('Alex Smith', 'asmith2'),
+    })
+    df = scrape()
+    assert list(df['NAME']) == ['Alex Smith', 'Alice Smith', 'Alex Smith']
+    assert list(df['EMAIL']) == ['asmith@calpoly.edu', 'alsmith@calpoly.edu', 'asmith2@calpoly.edu']
+    assert len(requested) == 5
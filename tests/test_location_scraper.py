@@ -0,0 +1,70 @@
+"""
+Title: Location scraper tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Placemarks parsed from .kml and .kmz files, including shapes with holes
+"""
+
+import zipfile
+from io import BytesIO
+
+from campus_index import SHAPE
+from location_scraper import INNER_COORDINATES, LocationScraper, iter_placemarks
+
+
+def ring(lon, lat, size):
+    corners = ((0, 0), (size, 0), (size, size), (0, size), (0, 0))
+    return ' '.join(f'{lon + dx},{lat + dy},0' for dx, dy in corners)
+
+
+def kml(*placemarks):
+    return ('<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+            f'{"".join(placemarks)}</Document></kml>').encode('utf-8')
+
+
+def polygon(name, outer, *inner):
+    holes = ''.join(f'<innerBoundaryIs><LinearRing><coordinates>{r}</coordinates></LinearRing></innerBoundaryIs>'
+                    for r in inner)
+    return (f'<Placemark><name>{name}</name><Polygon><outerBoundaryIs><LinearRing><coordinates>\n\t{outer}\n'
+            f'</coordinates></LinearRing></outerBoundaryIs>{holes}</Polygon></Placemark>')
+
+
+def kmz(data):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('doc.kml', data)
+    return buffer.getvalue()
+
+
+COURTYARD = polygon('52 Science', ring(-120.66, 35.30, 0.001), ring(-120.6597, 35.3003, 0.0004))
+
+
+def test_holes_are_kept_apart_from_the_outer_boundary():
+    (name, elements), = iter_placemarks(BytesIO(kml(COURTYARD)))
+    assert name == '52 Science'
+    assert elements['coordinates'] == ring(-120.66, 35.30, 0.001)
+    assert elements[INNER_COORDINATES] == ring(-120.6597, 35.3003, 0.0004)
+
+
+def test_repeated_rings_dont_run_together():
+    shapes = ('<Placemark><name>1 East</name><MultiGeometry>'
+              f'<Polygon><outerBoundaryIs><LinearRing><coordinates>{ring(120.1, 35.1, 0.001)}</coordinates>'
+              '</LinearRing></outerBoundaryIs></Polygon>'
+              f'<Polygon><outerBoundaryIs><LinearRing><coordinates>{ring(120.2, 35.1, 0.001)}</coordinates>'
+              '</LinearRing></outerBoundaryIs></Polygon></MultiGeometry></Placemark>')
+    (_, elements), = iter_placemarks(BytesIO(kml(shapes)))
+    assert elements['coordinates'] == f'{ring(120.1, 35.1, 0.001)} {ring(120.2, 35.1, 0.001)}'
+
+
+def test_index_contains_by_outer_boundary():
+    scraper = LocationScraper()
+    output = scraper.parse_kmz(kmz(kml(COURTYARD)))
+    assert output.splitlines()[1] == f'52,Science,{ring(-120.66, 35.30, 0.001).rsplit(",", 1)[0]}'
+    location, = scraper.index.locations
+    assert location.kind == SHAPE
+    assert len(location.coordinates) == 5
+    # Inside the outer boundary, both outside and inside the hole
+    assert scraper.index.at(-120.6598, 35.3009).key == '52 Science'
+    assert scraper.index.at(-120.6595, 35.3005).key == '52 Science'
+    assert scraper.index.at(-120.6585, 35.3005) is None
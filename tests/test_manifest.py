@@ -0,0 +1,121 @@
+"""
+Title: Manifest tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Unchanged pages, record deltas, format change warnings and saving
+only after a successful upload
+"""
+
+import requests
+
+from barometer import capture, DEBUG, WARNING_ID
+from manifest import Manifest
+from scraper_base import build_response
+from uploader import Uploader
+
+URL = 'https://catalog.calpoly.edu/coursesaz/csc/'
+
+
+def page(body):
+    return build_response(URL, 200, body)
+
+
+def key(record):
+    return record['NAME']
+
+
+def warnings(records):
+    return [msg for identifier, msg in records if identifier == WARNING_ID]
+
+
+def test_unchanged_page_reuses_records(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    manifest = Manifest(path)
+    assert manifest.unchanged_records(URL, page(b'v1')) is None
+    manifest.update_source(URL, page(b'v1'), [{'NAME': 'CSC 101'}])
+    manifest.save()
+
+    manifest = Manifest(path)
+    assert manifest.unchanged_records(URL, page(b'v1')) == [{'NAME': 'CSC 101'}]
+    assert manifest.unchanged_records(URL, page(b'v2')) is None
+    assert manifest.source_records(URL) == [{'NAME': 'CSC 101'}]
+    assert manifest.source_records('https://catalog.calpoly.edu/') is None
+
+
+def test_streamed_pages_compare_by_digest(tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    manifest.update_source(URL, page(b'v1'), [{'NAME': 'CSC 101'}])
+    streamed = build_response(URL, 200, None)
+    streamed.digest = Manifest.hash(b'v1')
+    assert manifest.unchanged_records(URL, streamed) == [{'NAME': 'CSC 101'}]
+
+
+def test_diff_finds_inserted_updated_and_deleted(tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    first = manifest.diff('clubs', [{'NAME': 'A', 'BOX': '1'}, {'NAME': 'B', 'BOX': '2'}], key)
+    assert len(first.inserted) == 2 and not first.updated and not first.deleted
+
+    delta = manifest.diff('clubs', [{'NAME': 'A', 'BOX': '1'}, {'NAME': 'B', 'BOX': '3'},
+                                    {'NAME': 'C', 'BOX': '4'}], key)
+    assert delta.inserted == [{'NAME': 'C', 'BOX': '4'}]
+    assert delta.updated == [{'NAME': 'B', 'BOX': '3'}]
+    assert delta.deleted == []
+    assert delta.upserted == delta.inserted + delta.updated
+
+    delta = manifest.diff('clubs', [{'NAME': 'A', 'BOX': '1'}], key)
+    assert not delta.inserted and not delta.updated
+    assert sorted(delta.deleted) == ['B', 'C']
+
+    delta = manifest.diff('clubs', [{'NAME': 'A', 'BOX': '1'}], key)
+    assert not delta
+    assert str(delta) == '0 inserted, 0 updated, 0 deleted'
+
+
+def test_warns_when_fields_change(tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    _, records = capture(DEBUG, manifest.diff, 'clubs', [{'NAME': 'A', 'BOX': '1'}], key)
+    assert warnings(records) == []
+    _, records = capture(DEBUG, manifest.diff, 'clubs', [{'NAME': 'A', 'ROOM': '1'}], key)
+    assert len(warnings(records)) == 1
+    assert 'Fields of clubs changed' in warnings(records)[0]
+
+
+def test_warns_when_page_stops_producing_records(tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    manifest.update_source(URL, page(b'v1'), [{'NAME': 'A'}])
+    _, records = capture(DEBUG, manifest.update_source, URL, page(b'v2'), [])
+    assert len(warnings(records)) == 1
+    assert 'No records parsed' in warnings(records)[0]
+
+
+class FailingUploader(Uploader):
+
+    def post_batch(self, batch, deleted=None):
+        raise requests.exceptions.ConnectionError('ingestion API is down')
+
+
+class RecordingUploader(Uploader):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+
+    def post_batch(self, batch, deleted=None):
+        self.sent.append((batch, deleted))
+
+
+def test_saved_only_after_upload_succeeds(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    records = [{'NAME': 'A', 'BOX': '1'}, {'NAME': 'B', 'BOX': '2'}]
+    assert not FailingUploader('http://localhost/clubs', 'clubs').sync(records, key, manifest=Manifest(path))
+    assert Manifest(path).records == dict()
+
+    uploader = RecordingUploader('http://localhost/clubs', 'clubs')
+    # The failed run's changes are sent again
+    assert uploader.sync(records, key, manifest=Manifest(path))
+    assert uploader.sent == [(records, [])]
+    assert set(Manifest(path).records['clubs']['hashes']) == {'A', 'B'}
+
+    assert not FailingUploader('http://localhost/clubs', 'clubs').sync(records[:1], key, manifest=Manifest(path))
+    assert set(Manifest(path).records['clubs']['hashes']) == {'A', 'B'}
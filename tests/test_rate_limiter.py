@@ -0,0 +1,114 @@
+"""
+Title: Rate limiter tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Token bucket waits, throttling and Retry-After parsing, on a fake clock
+"""
+
+import pytest
+
+from rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('5', 5.0),
+    (' 2.5 ', 2.5),
+    ('-3', 0.0),
+    ('Thu, 01 Jan 1970 00:01:40 GMT', 40.0),
+    ('Thu, 01 Jan 1970 00:00:10 GMT', 0.0),
+    ('soon', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value, now=60.0) == expected
+
+
+def test_bucket_allows_bursts_then_paces():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    clock.now += 1.5
+    # The reservations in debt are paid back before a new token is free
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.5
+
+
+def test_throttle_blocks_slows_and_recovers():
+    clock = Clock()
+    bucket = TokenBucket(rate=4, capacity=1, clock=clock)
+    bucket.throttle(retry_after=3)
+    assert bucket.rate == 2
+    assert bucket.reserve() == 3.0
+    assert bucket.reserve() == 3.5
+    for _ in range(20):
+        bucket.recover()
+    assert bucket.rate == 4
+
+
+def test_throttle_backs_off_exponentially_without_retry_after():
+    clock = Clock()
+    bucket = TokenBucket(rate=1, clock=clock)
+    waits = []
+    for _ in range(3):
+        bucket.throttle()
+        waits.append(bucket.updated - clock.now)
+    assert waits == [1.0, 2.0, 4.0]
+
+
+def test_limiter_keeps_hosts_apart():
+    limiter = RateLimiter(rate=1, capacity=1, clock=Clock())
+    assert limiter.reserve('https://catalog.calpoly.edu/a') == 0.0
+    assert limiter.reserve('https://catalog.calpoly.edu/b') == 1.0
+    assert limiter.reserve('https://schedules.calpoly.edu/') == 0.0
+
+
+def test_limiter_feedback():
+    limiter = RateLimiter(rate=2, capacity=1, clock=Clock())
+    assert limiter.feedback('https://catalog.calpoly.edu/', 429, '10')
+    assert limiter.stats() == {'catalog.calpoly.edu': 1.0}
+    assert limiter.reserve('https://catalog.calpoly.edu/') == 10.0
+    assert not limiter.feedback('https://catalog.calpoly.edu/', 200)
+    assert limiter.stats() == {'catalog.calpoly.edu': 1.2}
+
+
+def test_disabled_limiter_never_waits():
+    limiter = RateLimiter(rate=1, capacity=1, clock=Clock())
+    limiter.enabled = False
+    assert [limiter.reserve('https://catalog.calpoly.edu/') for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_set_rate_keeps_throttle_and_block():
+    limiter = RateLimiter(rate=2, capacity=1, clock=Clock())
+    limiter.set_rate('catalog.calpoly.edu', 4)
+    limiter.feedback('https://catalog.calpoly.edu/', 429, '10')
+    # Each scraper sets its host's rate again when it's constructed
+    limiter.set_rate('catalog.calpoly.edu', 4)
+    assert limiter.stats() == {'catalog.calpoly.edu': 2.0}
+    assert limiter.reserve('https://catalog.calpoly.edu/') == 10.0
+    assert limiter.reserve('https://catalog.calpoly.edu/') == 10.5
+
+
+def test_set_rate_changes_rate_in_place():
+    clock = Clock()
+    limiter = RateLimiter(rate=2, capacity=2, clock=clock)
+    limiter.set_rate('catalog.calpoly.edu', 4)
+    limiter.feedback('https://catalog.calpoly.edu/', 503, '0')
+    limiter.set_rate('catalog.calpoly.edu', 1, capacity=1)
+    # Still throttled to half the new rate, and recovers up to it
+    assert limiter.stats() == {'catalog.calpoly.edu': 0.5}
+    for _ in range(20):
+        limiter.feedback('https://catalog.calpoly.edu/', 200)
+    assert limiter.stats() == {'catalog.calpoly.edu': 1.0}
+    assert limiter.reserve('https://catalog.calpoly.edu/') == 0.0
+    assert limiter.reserve('https://catalog.calpoly.edu/') == 1.0
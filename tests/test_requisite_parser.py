@@ -0,0 +1,67 @@
+"""
+Title: Requisite parser tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Sections, terms and course codes of catalog course block text
+"""
+
+import pytest
+
+from requisite_parser import parse_course_codes, parse_requisites
+
+
+@pytest.mark.parametrize('text, codes', [
+    ('CSC 202 or 203.', ['CSC 202', 'CSC 203']),
+    ('MATH 141, 142, and 143.', ['MATH 141', 'MATH 142', 'MATH 143']),
+    ('CPE/EE 229.', ['CPE 229', 'EE 229']),
+    ('CSC/CPE 225 or CPE 233; and CSC 202 or 203.', ['CSC 225', 'CPE 225', 'CPE 233', 'CSC 202', 'CSC 203']),
+    ('MATH 118 with a grade of C- or better, or MATH 119.', ['MATH 118', 'MATH 119']),
+    ('Completion of GE Area A.', []),
+])
+def test_course_codes(text, codes):
+    assert parse_course_codes(text) == codes
+
+
+@pytest.mark.parametrize('text, codes', [
+    # Bare numbers that don't continue a list of courses aren't courses
+    ('CSC 357 and 180 units.', ['CSC 357']),
+    ('CSC 357, 180 units of coursework.', ['CSC 357']),
+    ('MATH 143 or 100 hours of tutoring.', ['MATH 143']),
+    ('Junior standing and 120 units.', []),
+    # Course ranges aren't lists
+    ('CSC 101-103 sequence.', []),
+])
+def test_bare_numbers_outside_lists(text, codes):
+    assert parse_course_codes(text) == codes
+
+
+def test_terms_line():
+    parsed = parse_requisites('Term Typically Offered: F, W, SP, SU')
+    assert parsed['terms'] == ['F', 'W', 'SP', 'SU']
+    assert parsed['prerequisites'] is None
+    assert parsed['prerequisites_courses'] == []
+
+
+def test_glued_labels():
+    parsed = parse_requisites('Term Typically Offered: F, W, SPPrerequisite: CSC 202 or 203.'
+                              'Corequisite: CSC 225.Recommended: MATH 141, 142, and 143.')
+    assert parsed['terms'] == ['F', 'W', 'SP']
+    assert parsed['prerequisites'] == 'CSC 202 or 203.'
+    assert parsed['prerequisites_courses'] == ['CSC 202', 'CSC 203']
+    assert parsed['corequisites'] == 'CSC 225.'
+    assert parsed['corequisites_courses'] == ['CSC 225']
+    assert parsed['recommended_courses'] == ['MATH 141', 'MATH 142', 'MATH 143']
+    assert parsed['concurrent'] is None
+
+
+def test_repeated_labels_are_joined():
+    parsed = parse_requisites('Prerequisite: CSC 202. Prerequisite: CSC 202 or CPE/EE 229.')
+    assert parsed['prerequisites'] == 'CSC 202. CSC 202 or CPE/EE 229.'
+    assert parsed['prerequisites_courses'] == ['CSC 202', 'CPE 229', 'EE 229']
+
+
+def test_without_course_codes():
+    parsed = parse_requisites('Prerequisite: CSC 202.', course_codes=False)
+    assert parsed['prerequisites'] == 'CSC 202.'
+    assert parsed['prerequisites_courses'] == []
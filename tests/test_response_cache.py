@@ -0,0 +1,101 @@
+"""
+Title: Response cache tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Storing, revalidating, expiring and evicting cached responses
+"""
+
+import io
+import os
+import time
+
+import response_cache
+from response_cache import ResponseCache
+from scraper_base import build_response
+
+URL = 'https://catalog.calpoly.edu/coursesaz/csc/'
+
+
+def page(body=b'<html>CSC</html>', **headers):
+    return build_response(URL, 200, body, headers, 'utf-8')
+
+
+def test_stores_only_responses_with_validators(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store(URL, page())
+    assert cache.lookup(URL) is None
+    assert cache.conditional_headers(URL) == dict()
+
+    cache.store(URL, page(ETag='"v1"', **{'Last-Modified': 'Mon, 01 Jun 2020 00:00:00 GMT'}))
+    assert cache.conditional_headers(URL) == {'If-None-Match': '"v1"',
+                                              'If-Modified-Since': 'Mon, 01 Jun 2020 00:00:00 GMT'}
+    entry, body = cache.read(URL)
+    assert body == b'<html>CSC</html>'
+    assert entry.encoding == 'utf-8'
+
+
+def test_entries_survive_restarts(tmp_path):
+    ResponseCache(str(tmp_path)).store(URL, page(ETag='"v1"'))
+    ResponseCache(str(tmp_path)).store('https://example.com/', page(b'streamed'), io.BytesIO(b'from file'))
+    cache = ResponseCache(str(tmp_path))
+    assert cache.read(URL)[1] == b'<html>CSC</html>'
+    assert cache.read('https://example.com/') == (None, None)
+    assert cache.stats()['entries'] == 1
+
+
+def test_stored_file_body(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store(URL, page(ETag='"v1"'), io.BytesIO(b'from file'))
+    assert cache.read(URL)[1] == b'from file'
+    assert cache.lookup(URL).size == len(b'from file')
+
+
+def test_read_restarts_age(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=100)
+    cache.store(URL, page(ETag='"v1"'))
+    now = time.time()
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now + 80)
+    assert cache.read(URL)[1] is not None
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now + 160)
+    assert cache.lookup(URL) is not None
+    # The refreshed age is kept on disk too
+    assert ResponseCache(str(tmp_path), ttl=100).lookup(URL) is not None
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now + 200)
+    assert cache.lookup(URL) is None
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_size=25)
+    clock = [time.time()]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: clock[0])
+    for step in (lambda: cache.store('https://a/', page(b'0123456789', ETag='"v1"')),
+                 lambda: cache.store('https://b/', page(b'0123456789', ETag='"v1"')),
+                 lambda: cache.read('https://a/'),
+                 lambda: cache.store('https://c/', page(b'0123456789', ETag='"v1"'))):
+        clock[0] += 1
+        step()
+    assert cache.lookup('https://a/') is not None
+    assert cache.lookup('https://b/') is None
+    assert cache.lookup('https://c/') is not None
+    assert cache.evictions == 1
+
+
+def test_sweeps_old_orphans_only(tmp_path):
+    ResponseCache(str(tmp_path)).store(URL, page(ETag='"v1"'))
+    old = time.time() - response_cache.ORPHAN_AGE - 1
+    for name in ('old.body', 'old.json.1.tmp', 'new.body'):
+        (tmp_path / name).write_bytes(b'partial')
+    for name in ('old.body', 'old.json.1.tmp'):
+        os.utime(tmp_path / name, (old, old))
+    cache = ResponseCache(str(tmp_path))
+    assert cache.read(URL)[1] == b'<html>CSC</html>'
+    assert sorted(os.listdir(tmp_path)) == sorted([f'{cache.key(URL)}.body', f'{cache.key(URL)}.json', 'new.body'])
+
+
+def test_clear(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store(URL, page(ETag='"v1"'))
+    cache.clear()
+    assert cache.lookup(URL) is None
+    assert os.listdir(tmp_path) == []
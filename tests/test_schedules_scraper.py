@@ -0,0 +1,83 @@
+"""
+Title: Schedules scraper tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Parsing a hand-written college schedules page with several departments:
+sub-table splitting, repeated header rows and merged course sections
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from schedules_scraper import SchedulesScraper
+
+COLLEGE_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'schedules_college.html')
+DEPARTMENTS = ['Aerospace Engineering', 'Computer Engineering', 'Computer Science & Software Engineering']
+
+
+def college_page():
+    with open(COLLEGE_PAGE, 'rb') as f:
+        return f.read()
+
+
+def test_bytes_match_whole_page():
+    scraper = SchedulesScraper()
+    content = college_page()
+    from_bytes = scraper.scrape_schedules_from_bytes(content, preprocess=scraper.preprocess_schedules)
+    from_html = scraper.scrape_schedules_from_html(content.decode('utf-8'), preprocess=scraper.preprocess_schedules)
+    assert [df.name for df in from_bytes] == [df.name for df in from_html] == DEPARTMENTS
+    for a, b in zip(from_bytes, from_html):
+        pd.testing.assert_frame_equal(a, b)
+
+
+def test_page_without_tables():
+    assert SchedulesScraper().scrape_schedules_from_bytes(b'<html><body><p>Not published</p></body></html>') is None
+
+
+def test_separate_dfs_names_sub_tables():
+    scraper = SchedulesScraper()
+    dfs = scraper.scrape_schedules_from_bytes(college_page())
+    assert [df.name for df in dfs] == DEPARTMENTS
+    assert [len(df) for df in dfs] == [3, 3, 2]
+    # Separator rows are dropped, and the repeated header rows are kept for preprocessing
+    assert list(dfs[1].iloc[0]) == list(dfs[1].columns)
+    assert list(dfs[1]['Name']) == ['Name', 'Hopper, Grace', 'Hopper, Grace']
+
+
+def test_preprocess_merges_sections_and_drops_header_rows():
+    scraper = SchedulesScraper()
+    dfs = scraper.scrape_schedules_from_bytes(college_page(), preprocess=scraper.preprocess_schedules)
+    assert [df.name for df in dfs] == DEPARTMENTS
+    assert list(dfs[0].columns) == ['NAME', 'COURSE', 'TYPE', 'DAYS', 'START', 'DEPARTMENT']
+    # Rows without a section, like office hours, keep their course as is
+    assert list(dfs[0]['COURSE'].fillna('')) == ['AERO 121_01', 'AERO 121_02', '']
+    assert list(dfs[1]['COURSE']) == ['CPE 101_03', 'CPE 101_04']
+    assert list(dfs[1]['NAME']) == ['Hopper, Grace', 'Hopper, Grace']
+    assert list(dfs[2]['COURSE']) == ['CSC 357_01']
+    assert [set(df['DEPARTMENT']) for df in dfs] == [{name} for name in DEPARTMENTS]
+
+
+def test_separate_dfs_without_multiindex():
+    df = pd.DataFrame({'Name': ['Lee, Jordan', 'CENG'], 'Course': ['AERO 121', 'CENG']})
+    dfs = SchedulesScraper().separate_dfs(df, add_name=True)
+    assert len(dfs) == 1 and dfs[0] is df
+    assert not hasattr(dfs[0], 'name')
+
+
+def test_separate_dfs_second_header_level_names_table():
+    columns = pd.MultiIndex.from_arrays([['Name', 'Course'], ['Aerospace Engineering'] * 2])
+    df = pd.DataFrame([['Lee, Jordan', 'AERO 121'], ['Computer Engineering'] * 2, ['Hopper, Grace', 'CPE 101']],
+                      columns=columns)
+    dfs = SchedulesScraper().separate_dfs(df, add_name=True)
+    assert [d.name for d in dfs] == ['Aerospace Engineering', 'Computer Engineering']
+    assert [list(d['Name']) for d in dfs] == [['Lee, Jordan'], ['Hopper, Grace']]
+
+
+def test_separate_dfs_rejects_ambiguous_headers():
+    columns = pd.MultiIndex.from_arrays([['Name', 'Course'], ['Instructor', 'Class']])
+    df = pd.DataFrame([['Lee, Jordan', 'AERO 121'], ['Computer Engineering'] * 2], columns=columns)
+    with pytest.raises(ValueError):
+        SchedulesScraper().separate_dfs(df)
@@ -0,0 +1,28 @@
+"""
+Title: Scraper base tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Table extraction from raw page bytes
+"""
+
+from scraper_base import read_tables
+
+
+def test_read_tables_keeps_only_top_level_tables():
+    content = (b'<html><head><title>Schedules</title></head><body><p>Before</p>'
+               b'<table id="a"><tr><td>1</td><td><table id="inner"><tr><td>2</td></tr></table></td></tr></table>'
+               b'<div>Between <span>text</span></div>'
+               b'<table id="b"><tr><td>3</td></tr></table><p>After</p></body></html>')
+    assert read_tables(content) == (
+        '<table id="a"><tr><td>1</td><td><table id="inner"><tr><td>2</td></tr></table></td></tr></table>'
+        '<table id="b"><tr><td>3</td></tr></table>')
+
+
+def test_read_tables_without_tables():
+    assert read_tables(b'<html><body><p>No schedules yet</p></body></html>') == ''
+
+
+def test_read_tables_encoding():
+    content = '<html><body><table><tr><td>Peña, José</td></tr></table></body></html>'.encode('cp1252')
+    assert read_tables(content, encoding='cp1252') == '<table><tr><td>Peña, José</td></tr></table>'
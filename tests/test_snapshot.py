@@ -0,0 +1,165 @@
+"""
+Title: Snapshot tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Records responses from a local server into a snapshot and replays them,
+including gzip-encoded streamed downloads and the scraper benchmark's --snapshot runs
+"""
+
+import gzip
+import hashlib
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+import requests
+
+import scraper_base
+from ingest_server import IngestServer
+from snapshot import Snapshot, SnapshotMiss
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import bench_scrapers  # noqa: E402
+
+# Body of the streamed download, large enough to take several chunks
+ARCHIVE = bytes(range(256)) * 4096
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    Serves a page, a gzip-encoded download and a 404 for anything else
+    """
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path == '/page':
+            self.respond(200, 'Café'.encode('utf-8'), {'Content-Type': 'text/html; charset=utf-8', 'ETag': '"v1"'})
+        elif self.path == '/archive.kmz':
+            self.respond(200, gzip.compress(ARCHIVE),
+                         {'Content-Type': 'application/vnd.google-earth.kmz', 'Content-Encoding': 'gzip'})
+        else:
+            self.respond(404, b'Not Found', {'Content-Type': 'text/plain'})
+
+    def respond(self, status, body, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    server.paths = []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, server):
+    server.paths.clear()
+    yield str(tmp_path / 'snapshot.db')
+    scraper_base.use_snapshot(None)
+    scraper_base.close_session()
+
+
+def test_get_round_trip(server, snapshot_path):
+    scraper_base.use_snapshot(snapshot_path, 'record')
+    recorded = scraper_base.get(f'{server.url}/page')
+    with pytest.raises(requests.exceptions.HTTPError):
+        scraper_base.get(f'{server.url}/missing')
+
+    snapshot = scraper_base.use_snapshot(snapshot_path, 'replay')
+    assert snapshot.urls() == [f'{server.url}/missing', f'{server.url}/page']
+    replayed = scraper_base.get(f'{server.url}/page')
+    assert replayed.status_code == 200
+    assert replayed.content == recorded.content
+    assert replayed.text == 'Café'
+    assert replayed.encoding == recorded.encoding
+    assert replayed.headers['ETag'] == '"v1"'
+    # The recorded 404 is served again rather than treated as a miss
+    with pytest.raises(requests.exceptions.HTTPError) as e:
+        scraper_base.get(f'{server.url}/missing')
+    assert e.value.response.status_code == 404
+    assert server.paths == ['/page', '/missing']
+
+
+def test_compressed_download_round_trip(server, snapshot_path):
+    url = f'{server.url}/archive.kmz'
+    scraper_base.use_snapshot(snapshot_path, 'record')
+    recorded = BytesIO()
+    r = scraper_base.download(url, recorded, chunk_size=4096)
+    assert recorded.getvalue() == ARCHIVE
+    assert r.digest == hashlib.sha1(ARCHIVE).hexdigest()
+
+    scraper_base.use_snapshot(snapshot_path, 'replay')
+    replayed = BytesIO()
+    r = scraper_base.download(url, replayed, chunk_size=4096)
+    assert replayed.getvalue() == ARCHIVE
+    assert r.digest == hashlib.sha1(ARCHIVE).hexdigest()
+    # The stored body is decoded, so its transfer headers are dropped
+    assert 'Content-Encoding' not in r.headers
+    assert 'Content-Length' not in r.headers
+    assert r.headers['Content-Type'] == 'application/vnd.google-earth.kmz'
+    assert server.paths == ['/archive.kmz']
+
+
+def test_unfinished_download_is_not_recorded(server, snapshot_path):
+    snapshot = Snapshot(snapshot_path)
+    record = snapshot.recorder(lambda url, **kwargs: requests.get(url, **kwargs))
+    r = record(f'{server.url}/archive.kmz', stream=True)
+    next(r.iter_content(4096))
+    r.close()
+    assert snapshot.urls() == []
+    snapshot.close()
+
+
+def test_recorder_drops_conditional_headers(snapshot_path):
+    sent = []
+
+    def fetcher(url, **kwargs):
+        sent.append(kwargs['headers'])
+        return scraper_base.build_response(url, 200, b'body')
+
+    snapshot = Snapshot(snapshot_path)
+    snapshot.recorder(fetcher)('http://example.com/', headers={'If-None-Match': '"v1"', 'Accept': 'text/html'})
+    assert sent == [{'Accept': 'text/html'}]
+    snapshot.close()
+
+
+def test_replay_miss(snapshot_path):
+    snapshot = scraper_base.use_snapshot(snapshot_path, 'replay')
+    with pytest.raises(SnapshotMiss):
+        scraper_base.get('http://example.com/never-recorded')
+    assert snapshot.urls() == []
+
+
+@pytest.mark.parametrize('name', ['club', 'location'])
+def test_bench_replays_recorded_snapshot(name, tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper_base.RATE_LIMITER, 'enabled', False)
+    snapshot = Snapshot(str(tmp_path / 'snapshot.db'))
+    server = IngestServer().start()
+    try:
+        recorded = bench_scrapers.run(name, 1, server, snapshot=snapshot, record=True)
+        replayed = bench_scrapers.run(name, None, server, snapshot=snapshot)
+    finally:
+        server.stop()
+        snapshot.close()
+    assert recorded['records'] > 0
+    assert replayed['records'] == recorded['records']
+    assert replayed['pages'] == recorded['pages']
+    assert replayed['bytes'] == recorded['bytes']
@@ -0,0 +1,168 @@
+"""
+Title: Uploader tests
+Author: Cal Poly CSAI
+Date: 10/17/2026
+Organization: Cal Poly CSAI
+Description: Uploads to a local ingest_server.IngestServer: retries, body encoding,
+batching and manifest handling
+"""
+
+import gzip
+import json
+
+import pytest
+import requests
+
+import uploader
+from ingest_server import IngestHandler, IngestServer
+from manifest import Manifest
+from uploader import Uploader, UploadError
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    Seconds the uploader slept between attempts, without sleeping
+    """
+    slept = []
+    monkeypatch.setattr(uploader.time, 'sleep', slept.append)
+    return slept
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = IngestServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def start_server(server):
+    """
+    Resets the shared server with new settings for a test
+    """
+    def start(failures=0, failure_status=503, retry_after=None):
+        with server.lock:
+            server.received.clear()
+            server.deleted.clear()
+            server.requests = 0
+            server.failures = failures
+            server.failure_status = failure_status
+            server.retry_after = retry_after
+        return server
+
+    return start
+
+
+@pytest.fixture
+def bodies(monkeypatch):
+    """
+    Headers and decoded JSON body of every request the server reads
+    """
+    seen = []
+    read_body = IngestHandler.read_body
+
+    def recording_read_body(handler):
+        body = read_body(handler)
+        seen.append((dict(handler.headers), json.loads(body)))
+        return body
+
+    monkeypatch.setattr(IngestHandler, 'read_body', recording_read_body)
+    return seen
+
+
+def records(n):
+    return [{'NAME': f'Club {i}', 'BOX': str(i)} for i in range(n)]
+
+
+def test_post_batch_waits_for_retry_after(start_server, sleeps):
+    server = start_server(failures=2, failure_status=429, retry_after=7)
+    Uploader(f'{server.url}/clubs', 'clubs', backoff=0.5).post_batch(records(3))
+    assert sleeps == [7.0, 7.0]
+    assert server.requests == 3
+    assert server.received['clubs'] == records(3)
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_post_batch_backs_off_on_server_errors(start_server, sleeps, status):
+    server = start_server(failures=2, failure_status=status)
+    Uploader(f'{server.url}/clubs', 'clubs', backoff=0.5).post_batch(records(1))
+    assert sleeps == [0.5, 1.0]
+    assert server.received['clubs'] == records(1)
+
+
+def test_post_batch_stops_after_retry_limit(start_server, sleeps):
+    server = start_server(failures=10, failure_status=503)
+    with pytest.raises(UploadError):
+        Uploader(f'{server.url}/clubs', 'clubs', retries=2, backoff=0.5).post_batch(records(1))
+    assert server.requests == 3
+    assert sleeps == [0.5, 1.0]
+    assert 'clubs' not in server.received
+
+
+def test_post_batch_does_not_retry_bad_payloads(start_server, sleeps):
+    server = start_server()
+    # The server expects a "courses" key, so the batch is rejected with 400
+    with pytest.raises(requests.exceptions.HTTPError):
+        Uploader(f'{server.url}/courses', 'clubs').post_batch(records(1))
+    assert server.requests == 1
+    assert sleeps == []
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_body_is_chunked_and_optionally_gzipped(start_server, bodies, compress):
+    server = start_server()
+    Uploader(f'{server.url}/clubs', 'clubs', compress=compress).post_batch(records(3), ['Old Club'])
+    (headers, payload), = bodies
+    assert headers.get('Transfer-Encoding') == 'chunked'
+    assert (headers.get('Content-Encoding') == 'gzip') == compress
+    assert payload == {'clubs': records(3), 'deleted': ['Old Club']}
+
+
+def test_generate_body_is_gzipped_json():
+    body = b''.join(Uploader('http://localhost/clubs', 'clubs').generate_body(records(2), ['x']))
+    assert json.loads(gzip.decompress(body)) == {'clubs': records(2), 'deleted': ['x']}
+
+
+def test_upload_batches_and_sends_deleted_keys_last(start_server, bodies):
+    server = start_server()
+    sent = Uploader(f'{server.url}/clubs', 'clubs', batch_size=2).upload(iter(records(5)), ['Old Club'])
+    assert sent == 5
+    assert [len(payload['clubs']) for _, payload in bodies] == [2, 2, 1]
+    assert ['deleted' in payload for _, payload in bodies] == [False, False, True]
+    assert server.received['clubs'] == records(5)
+    assert server.deleted['clubs'] == ['Old Club']
+
+
+def test_upload_sends_deleted_keys_without_records(start_server, bodies):
+    server = start_server()
+    assert Uploader(f'{server.url}/clubs', 'clubs').upload([], ['Old Club']) == 0
+    assert [payload for _, payload in bodies] == [{'clubs': [], 'deleted': ['Old Club']}]
+
+
+def test_sync_saves_manifest_only_after_upload(start_server, sleeps, tmp_path):
+    path = tmp_path / 'manifest.json'
+    server = start_server(failures=1)
+    failing = Uploader(f'{server.url}/clubs', 'clubs', retries=0)
+    assert not failing.sync(records(3), key=lambda club: club['NAME'], manifest=Manifest(str(path)))
+    assert not path.exists()
+
+    assert failing.sync(records(3), key=lambda club: club['NAME'], manifest=Manifest(str(path)))
+    assert path.exists()
+    assert server.received['clubs'] == records(3)
+
+    # Only changed and deleted records are sent once the manifest is saved
+    changed = records(2)
+    changed[0]['BOX'] = 'changed'
+    assert failing.sync(changed, key=lambda club: club['NAME'], manifest=Manifest(str(path)))
+    assert server.received['clubs'] == records(3) + [changed[0]]
+    assert server.deleted['clubs'] == ['Club 2']
+
+
+def test_sync_skips_upload_when_nothing_changed(start_server, tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    server = start_server()
+    club_uploader = Uploader(f'{server.url}/clubs', 'clubs')
+    assert club_uploader.sync(records(3), key=lambda club: club['NAME'], manifest=Manifest(path))
+    assert club_uploader.sync(records(3), key=lambda club: club['NAME'], manifest=Manifest(path))
+    assert server.requests == 1